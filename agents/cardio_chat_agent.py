@@ -1,13 +1,26 @@
 # AI Server - agents/cardio_chat_agent.py
-from openai import OpenAI
 import json
+import copy
 import asyncio
-from typing import Dict, List, Any
+import functools
+from typing import Any, AsyncIterator, Callable, Dict, List
 import inspect
-import tiktoken
+import time
+from types import SimpleNamespace
+from bisect import bisect_left
+from itertools import accumulate
 
 from core.agents.base import BaseAgent, AgentInput, AgentOutput
+from core.agents.clients import get_async_openai_client, get_tool_executor
+from core.agents.metrics import configure_metrics_hooks, current_metrics, emit_metrics, track_request
+from core.agents.tokens import count_tokens, get_encoding
+from core.log import Lazy, fields, get_logger
+from agents.template_router import get_template_router
+from agents.response_cache import get_response_cache
+from agents.tool_cache import memoize_tools
+from agents.result_compaction import compact_result, summarize_usage
 from config import get_settings
+from tools.db import collect_query_stats, get_backend
 
 from tools.cardio_tools import (
     # Session Tools
@@ -48,11 +61,27 @@ from tools.cardio_tools import (
     get_cardio_type_frequency,
     compare_cardio_types
 )
+from tools.cohort_tools import (
+    get_volume_leaderboard,
+    get_pace_percentiles,
+    get_declining_frequency,
+)
+
+log = get_logger("CardioAgent")
+
+# Request options that change the answer, so they are part of the response cache key
+ANSWER_OPTIONS = ("temperature", "max_iterations", "parallel_tools", "use_templates")
+
+
+def _preview(value: Any, limit: int = 200) -> str:
+    """First characters of a value's JSON, for debug logs"""
+    return json.dumps(value, default=str)[:limit]
 
 # ==========================================
 # TOOL FUNCTION REGISTRY
 # ==========================================
-TOOL_FUNCTIONS = {
+# Memoized per (arguments, today, client data version); see agents/tool_cache.py
+TOOL_FUNCTIONS = memoize_tools({
     # Session Tools
     'get_recent_cardio_sessions': get_recent_cardio_sessions,
     'get_cardio_by_date': get_cardio_by_date,
@@ -90,7 +119,12 @@ TOOL_FUNCTIONS = {
     'get_cardio_type_distribution': get_cardio_type_distribution,
     'get_cardio_type_frequency': get_cardio_type_frequency,
     'compare_cardio_types': compare_cardio_types,
-}
+
+    # Cohort Tools (all clients at once)
+    'get_volume_leaderboard': get_volume_leaderboard,
+    'get_pace_percentiles': get_pace_percentiles,
+    'get_declining_frequency': get_declining_frequency,
+})
 
 # ==========================================
 # OPENAI TOOL SCHEMAS
@@ -204,11 +238,12 @@ OPENAI_TOOLS = [
     # Splits & Pacing Tools
     {
         "name": "get_split_analysis",
-        "description": "Analyze splits for a specific session",
+        "description": "Analyze per-km or per-mile splits for a specific session",
         "parameters": {
             "type": "object",
             "properties": {
-                "cardio_id": {"type": "integer"}
+                "cardio_id": {"type": "integer"},
+                "unit": {"type": "string", "enum": ["km", "mile"]}
             },
             "required": ["cardio_id"]
         }
@@ -293,8 +328,53 @@ OPENAI_TOOLS = [
             "required": ["cardio_type_1", "cardio_type_2", "client_id"]
         }
     },
+
+    # Cohort Tools
+    {
+        "name": "get_volume_leaderboard",
+        "description": "Rank all of the trainer's clients by distance, duration, elevation or session count over recent weeks",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "weeks": {"type": "integer", "description": "Weeks to include (default: 1)"},
+                "cardio_type": {"type": "string"},
+                "metric": {"type": "string", "enum": ["distance", "duration", "elevation", "sessions"]},
+                "limit": {"type": "integer", "description": "Clients to return (default: 10)"}
+            },
+            "required": []
+        }
+    },
+    {
+        "name": "get_pace_percentiles",
+        "description": "Each client's median pace for a cardio type and its percentile within all clients",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "cardio_type": {"type": "string", "description": "Default: 'Run'"},
+                "weeks_back": {"type": "integer", "description": "Weeks to analyze (default: 12)"},
+                "client_id": {"type": "integer", "description": "Client to highlight"},
+                "min_sessions": {"type": "integer"}
+            },
+            "required": []
+        }
+    },
+    {
+        "name": "get_declining_frequency",
+        "description": "Clients whose sessions per week dropped versus the preceding period",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "weeks": {"type": "integer", "description": "Length of each compared period (default: 4)"},
+                "min_drop_pct": {"type": "number", "description": "Minimum drop to report (default: 25)"}
+            },
+            "required": []
+        }
+    },
 ]
 
+# Same schemas in the tools/tool_calls format used for parallel tool calling
+OPENAI_CHAT_TOOLS = [{"type": "function", "function": schema} for schema in OPENAI_TOOLS]
+
 
 class CardioAgent(BaseAgent):
     """
@@ -302,6 +382,9 @@ class CardioAgent(BaseAgent):
     """
     MAX_HISTORY_MESSAGES = 20  # Hard cap on message count
     MAX_CONTEXT_TOKENS = 6000 
+    MAX_PARALLEL_TOOLS = 4  # Concurrent tool executions per model turn
+    TOOL_TIMEOUT_SECONDS = get_settings().tool_timeout_seconds  # Per-tool limit in parallel mode
+    MODEL = "gpt-4-turbo-preview"
     
     agent_id = "cardio_agent"
     name = "Cardio Coaching Agent"
@@ -342,6 +425,21 @@ class CardioAgent(BaseAgent):
                 "minimum": 0.0,
                 "maximum": 1.0,
                 "description": "GPT temperature for reasoning"
+            },
+            "parallel_tools": {
+                "type": "boolean",
+                "default": True,
+                "description": "Use tools/tool_calls and run all tools requested in a turn concurrently; false uses legacy one-function-per-turn calling"
+            },
+            "use_templates": {
+                "type": "boolean",
+                "default": True,
+                "description": "Answer common first-turn questions from the template router without calling the LLM"
+            },
+            "use_cache": {
+                "type": "boolean",
+                "default": True,
+                "description": "Serve repeat first-turn questions from the response cache"
             }
         },
         "required": ["question", "client_id"]
@@ -379,6 +477,7 @@ class CardioAgent(BaseAgent):
     - Specific session → get_cardio_session_details → get_split_analysis
     - Hills/elevation → get_hill_workouts / get_elevation_gain_trends
     - Pacing → get_negative_splits / get_pacing_consistency
+    - Across all clients (rankings, percentiles, who is slipping) → get_volume_leaderboard / get_pace_percentiles / get_declining_frequency (one call covers every client)
 
     2. **Be analytical and actionable:**
     - Identify pace trends and improvements
@@ -400,7 +499,7 @@ class CardioAgent(BaseAgent):
     - "How is [metric]" → Current status (1-2 tools)
 
     2. **For comprehensive queries ("details", "analysis", "breakdown"):**
-    - Use multiple relevant tools to build complete picture
+    - Use multiple relevant tools to build complete picture (request them together in one turn)
     - Include: session data, splits, pacing, comparisons
     - Response: 4-6 sentences with key insights
     
@@ -417,9 +516,16 @@ class CardioAgent(BaseAgent):
 
     def __init__(self):
         super().__init__(name="Cardio Coaching Agent")
-        settings = get_settings()
-        self.client = OpenAI(api_key=settings.openai_api_key)
-        print("[CardioAgent] Initialized with OpenAI client")
+        # Shared across agents: one HTTP connection pool per process
+        self.client = get_async_openai_client()
+        # Load the encoding and count the fixed system prompt once, at startup
+        get_encoding(self.MODEL)
+        self.system_tokens = count_tokens(self.SYSTEM_PROMPT, self.MODEL)
+        # Build the storage backend now, so a consolidated database imported
+        # before its build steps ran fails here rather than on the first question
+        get_backend()
+        configure_metrics_hooks()
+        log.info("Initialized with async OpenAI client")
 
     async def validate_input(self, input_data: AgentInput) -> bool:
         """Validate required inputs"""
@@ -433,123 +539,685 @@ class CardioAgent(BaseAgent):
         
         return True
 
-    def _prepare_conversation_history(self, conversation_history, model="gpt-4-turbo-preview"):
+    def _prepare_conversation_history(self, conversation_history, model=None):
         """
         Prepare conversation history with token limits.
         Uses hybrid approach: sliding window + token counting
+
+        Keeps the longest run of most recent messages that fits the token
+        budget, found by binary search over suffix sums of per-message
+        counts (memoized by content, so repeated history is not re-encoded).
         """
+        model = model or self.MODEL
         
         # First, apply sliding window
         if len(conversation_history) > self.MAX_HISTORY_MESSAGES:
             conversation_history = conversation_history[-self.MAX_HISTORY_MESSAGES:]
-            print(f"[CardioAgent] Trimmed to last {self.MAX_HISTORY_MESSAGES} messages")
+            log.debug("Trimmed history to last %d messages", self.MAX_HISTORY_MESSAGES)
         
         # Then check tokens
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            # Fallback if model not found
-            encoding = tiktoken.get_encoding("cl100k_base")
-        
-        system_tokens = len(encoding.encode(self.SYSTEM_PROMPT))
+        system_tokens = self.system_tokens if model == self.MODEL else count_tokens(self.SYSTEM_PROMPT, model)
         available_tokens = self.MAX_CONTEXT_TOKENS - system_tokens - 2000  # Reserve 2k for response + tools
         
-        # Add messages until we hit token limit (from most recent backwards)
-        prepared_messages = []
-        current_tokens = 0
-        
-        for msg in reversed(conversation_history):
-            if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
-                msg_tokens = len(encoding.encode(msg['content'])) + 4  # +4 for message formatting
-                
-                if current_tokens + msg_tokens < available_tokens:
-                    prepared_messages.insert(0, {
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
-                    current_tokens += msg_tokens
-                else:
-                    print(f"[CardioAgent] Token limit reached at {len(prepared_messages)} messages ({current_tokens} tokens)")
-                    break
+        messages = [
+            {"role": msg["role"], "content": msg["content"]}
+            for msg in conversation_history
+            if isinstance(msg, dict) and 'role' in msg and isinstance(msg.get('content'), str)
+        ]
+        # +4 per message for message formatting
+        newest_first = [count_tokens(msg["content"], model) + 4 for msg in reversed(messages)]
+        totals = list(accumulate(newest_first))
+
+        # Number of most recent messages whose running total stays under budget
+        keep = bisect_left(totals, available_tokens)
+        prepared_messages = messages[len(messages) - keep:] if keep else []
+        current_tokens = totals[keep - 1] if keep else 0
+
+        if keep < len(messages):
+            log.debug("History token limit reached at %d messages (%d tokens)", keep, current_tokens)
         
-        print(f"[CardioAgent] Using {len(prepared_messages)} messages (~{current_tokens} tokens)")
+        log.debug("Using %d history messages (~%d tokens)", len(prepared_messages), current_tokens)
         return prepared_messages
 
-    async def run(self, input_data: AgentInput) -> AgentOutput:
+    @staticmethod
+    def _inject_client_id(tool_func, function_args: Dict[str, Any], client_id: int) -> None:
+        """Auto-inject client_id if the tool accepts it"""
+        sig = inspect.signature(tool_func)
+        if 'client_id' in sig.parameters and 'client_id' not in function_args:
+            function_args['client_id'] = client_id
+
+    async def _execute_tool(
+        self,
+        function_name: str,
+        tool_func,
+        function_args: Dict[str, Any],
+        timeout: float | None = None
+    ) -> Any:
         """
-        Main agent execution - GPT-4 intelligently routes to appropriate cardio tools
-        
-        Returns:
-            AgentOutput with cardio analysis and recommendations
+        Execute one tool, returning its result or an {'error': ...} dict.
+
+        Sync tools run on the shared tool thread pool so they never block the
+        event loop. On timeout the worker thread finishes in the background
+        and its result is dropped. Latency and, for sync tools, SQL time and
+        rows read go to the request's metrics.
         """
+        started = time.perf_counter()
+        query_stats = None
         try:
-            data = input_data.data or {}
-            question = data["question"]
-            
-            # Handle type conversion
-            def safe_int(val, default):
-                try:
-                    return int(val)
-                except (TypeError, ValueError):
-                    return default
-            
-            def safe_float(val, default):
-                try:
-                    return float(val)
-                except (TypeError, ValueError):
-                    return default
+            if asyncio.iscoroutinefunction(tool_func):
+                call = tool_func(**function_args)
+            else:
+                # Sync tools hit SQLite; keep them off the event loop
+                loop = asyncio.get_running_loop()
+                call = loop.run_in_executor(
+                    get_tool_executor(),
+                    functools.partial(self._call_collecting_sql, tool_func, function_args)
+                )
+            result = await asyncio.wait_for(call, timeout) if timeout else await call
+            if not asyncio.iscoroutinefunction(tool_func):
+                result, query_stats = result
+            log.debug("Tool %s returned %s", function_name, Lazy(_preview, result))
             
-            client_id = safe_int(data["client_id"], None)
-            if client_id is None:
-                raise ValueError("Invalid client_id")
-                
-            max_iterations = safe_int(data.get("max_iterations"), 15)
-            temperature = safe_float(data.get("temperature"), 0.3)
+        except asyncio.TimeoutError:
+            log.warning("Tool %s timed out after %ss", function_name, timeout)
+            result = {'error': f'{function_name} timed out after {timeout}s'}
             
-            # Parse conversation history
-            conversation_history_str = data.get("conversation_history", "[]")
+        except Exception as e:
+            log.exception("Tool %s failed", function_name)
+            result = {'error': str(e)}
+
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.record_tool_call(
+                function_name,
+                time.perf_counter() - started,
+                ok=not (isinstance(result, dict) and 'error' in result),
+                sql=query_stats.as_dict() if query_stats is not None else None,
+            )
+        return result
+
+    @staticmethod
+    def _call_collecting_sql(tool_func, function_args: Dict[str, Any]):
+        """Run a sync tool on the worker thread; returns (result, QueryStats)"""
+        with collect_query_stats() as stats:
+            return tool_func(**function_args), stats
+
+    def _tool_content(self, function_name: str, result: Any, tool_tokens: List[Dict[str, Any]] | None) -> str:
+        """Message content for a tool result, compacted unless disabled in settings"""
+        if not get_settings().tool_result_compaction_enabled:
+            return json.dumps(result)
+        content, stats = compact_result(function_name, result, self.MODEL)
+        if tool_tokens is not None:
+            tool_tokens.append(stats)
+        return content
+
+    @staticmethod
+    def _compact_result(result: Any, max_items: int = 3) -> Any:
+        """Short preview of a tool result for progress events: scalars kept, lists cut to max_items"""
+        if isinstance(result, dict):
+            return {k: CardioAgent._compact_result(v, max_items) for k, v in result.items()}
+        if isinstance(result, list):
+            preview = [CardioAgent._compact_result(v, max_items) for v in result[:max_items]]
+            if len(result) > max_items:
+                preview.append(f"... {len(result) - max_items} more")
+            return preview
+        return result
+
+    async def _run_tool_calls(
+        self,
+        message,
+        messages: List[Dict[str, Any]],
+        client_id: int,
+        on_event: Callable[[Dict[str, Any]], None] | None = None,
+        tool_tokens: List[Dict[str, Any]] | None = None
+    ) -> List[str]:
+        """
+        Execute every tool call from one assistant turn concurrently.
+
+        At most MAX_PARALLEL_TOOLS run at once and each is bounded by
+        TOOL_TIMEOUT_SECONDS. Tool messages are appended in the same order as
+        message.tool_calls, each tagged with its tool_call_id and compacted
+        (token counts go to tool_tokens). on_event, if given, receives
+        tool_start / tool_end events as each call runs.
+        
+        Returns:
+            Names of the tools called, in call order
+        """
+        calls = []
+        for tool_call in message.tool_calls:
+            function_name = tool_call.function.name
             try:
-                conversation_history = json.loads(conversation_history_str)
-            except (json.JSONDecodeError, TypeError):
-                conversation_history = []
+                function_args = json.loads(tool_call.function.arguments or "{}")
+            except json.JSONDecodeError:
+                function_args = {}
+            tool_func = TOOL_FUNCTIONS.get(function_name)
+            if tool_func:
+                self._inject_client_id(tool_func, function_args, client_id)
+            calls.append((tool_call.id, function_name, function_args, tool_func))
+            log.debug("Tool call %s args=%s", function_name, Lazy(_preview, function_args))
 
-            print(f"\n[CardioAgent] Processing question for client {client_id}")
-            print(f"[CardioAgent] Question: '{question[:80]}...'")
-            print(f"[CardioAgent] Raw conversation history: {len(conversation_history)} messages")
+        # Add the assistant turn with every requested call
+        messages.append({
+            "role": "assistant",
+            "content": message.content,
+            "tool_calls": [
+                {
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": function_name, "arguments": json.dumps(function_args)}
+                }
+                for call_id, function_name, function_args, _ in calls
+            ]
+        })
 
-            # Apply token limits to conversation history
-            prepared_history = self._prepare_conversation_history(conversation_history)
+        semaphore = asyncio.Semaphore(self.MAX_PARALLEL_TOOLS)
 
-            # Build messages with prepared conversation history
-            messages = [{"role": "system", "content": self.SYSTEM_PROMPT}]
-            messages.extend(prepared_history)
-            
-            # Add current question
+        async def run_one(call_id, function_name, tool_func, function_args):
+            async with semaphore:
+                started = time.perf_counter()
+                if on_event:
+                    on_event({"type": "tool_start", "call_id": call_id, "tool": function_name, "args": function_args})
+                if not tool_func:
+                    result = {'error': f'Tool {function_name} not found'}
+                else:
+                    result = await self._execute_tool(
+                        function_name, tool_func, function_args, timeout=self.TOOL_TIMEOUT_SECONDS
+                    )
+                if on_event:
+                    on_event({
+                        "type": "tool_end",
+                        "call_id": call_id,
+                        "tool": function_name,
+                        "ok": not (isinstance(result, dict) and 'error' in result),
+                        "result": self._compact_result(result),
+                        "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                    })
+                return result
+
+        results = await asyncio.gather(*(
+            run_one(call_id, function_name, tool_func, function_args)
+            for call_id, function_name, function_args, tool_func in calls
+        ))
+
+        # Results go back in the order the model issued the calls
+        for (call_id, function_name, _, _), result in zip(calls, results):
             messages.append({
-                "role": "user",
-                "content": f"Client ID: {client_id}\n\nQuestion: {question}"
+                "role": "tool",
+                "tool_call_id": call_id,
+                "content": self._tool_content(function_name, result, tool_tokens)
             })
-            
+
+        return [function_name for _, function_name, _, _ in calls]
+
+    async def _answer_from_template(self, question: str, client_id: int) -> AgentOutput | None:
+        """
+        Try to answer from the template router.
+
+        Returns:
+            AgentOutput when a template matched and its tool succeeded,
+            otherwise None (caller runs the LLM loop)
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # First call builds the router (model load + bank embeddings); keep it off the loop
+        router = await loop.run_in_executor(get_tool_executor(), get_template_router)
+        if router is None:
+            return None
+
+        route = await loop.run_in_executor(get_tool_executor(), router.match, question)
+        log.debug(
+            "Template route %s/%s (confidence %.2f, matched=%s, unbound=%s)",
+            route['category'], route['template'], route['confidence'], route['matched'], route['unbound']
+        )
+        if not route['matched']:
+            router.record("llm", time.perf_counter() - started)
+            return None
+
+        template = router.get_template(route['category'], route['template'])
+        tool_func = TOOL_FUNCTIONS[template['tool']]
+        function_args = dict(route['args'])
+        self._inject_client_id(tool_func, function_args, client_id)
+
+        result = await self._execute_tool(
+            template['tool'], tool_func, function_args, timeout=self.TOOL_TIMEOUT_SECONDS
+        )
+        try:
+            if not isinstance(result, dict) or 'error' in result:
+                raise ValueError(result.get('error') if isinstance(result, dict) else 'unexpected result')
+            answer = template['format'](result, route['unit'])
+        except Exception as e:
+            log.warning("Template answer failed, falling back to LLM: %s", e)
+            router.record("llm", time.perf_counter() - started)
+            return None
+
+        elapsed = time.perf_counter() - started
+        router.record("template", elapsed)
+        log.info(
+            "Answered from template",
+            extra=fields(template=f"{route['category']}/{route['template']}", ms=round(elapsed * 1000, 1))
+        )
+        return AgentOutput(
+            success=True,
+            data={
+                "answer": answer,
+                "iterations": 0,
+                "tools_used": [template['tool']]
+            },
+            metadata={
+                "route": {
+                    "path": "template",
+                    "category": route['category'],
+                    "template": route['template'],
+                    "args": route['args'],
+                    "confidence": route['confidence'],
+                    "latency_ms": round(elapsed * 1000, 2),
+                }
+            }
+        )
+
+    @staticmethod
+    def _request_options(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Validated, type-converted request options"""
+        def safe_int(val, default):
+            try:
+                return int(val)
+            except (TypeError, ValueError):
+                return default
+
+        def safe_float(val, default):
+            try:
+                return float(val)
+            except (TypeError, ValueError):
+                return default
+
+        question = data["question"]
+        client_id = safe_int(data["client_id"], None)
+        if client_id is None:
+            raise ValueError("Invalid client_id")
+
+        # Parse conversation history
+        try:
+            conversation_history = json.loads(data.get("conversation_history", "[]"))
+        except (json.JSONDecodeError, TypeError):
+            conversation_history = []
+
+        return {
+            "question": question,
+            "client_id": client_id,
+            "max_iterations": safe_int(data.get("max_iterations"), 15),
+            "temperature": safe_float(data.get("temperature"), 0.3),
+            "parallel_tools": data.get("parallel_tools", True) not in (False, "false", "False", 0),
+            "use_templates": data.get("use_templates", True) not in (False, "false", "False", 0),
+            "conversation_history": conversation_history,
+        }
+
+    @classmethod
+    def _parse_request(cls, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Request options for a request that is about to be answered"""
+        request = cls._request_options(data)
+        log.info("Processing question",
+                 extra=fields(client_id=request["client_id"], history=len(request["conversation_history"])))
+        log.debug("Question: %r", request["question"][:80])
+        return request
+
+    def _initial_messages(self, question: str, client_id: int, conversation_history: List[Any]) -> List[Dict[str, Any]]:
+        """System prompt, token-limited history and the current question"""
+        messages = [{"role": "system", "content": self.SYSTEM_PROMPT}]
+        messages.extend(self._prepare_conversation_history(conversation_history))
+        messages.append({
+            "role": "user",
+            "content": f"Client ID: {client_id}\n\nQuestion: {question}"
+        })
+        return messages
+
+    @classmethod
+    def _cache_key(cls, data: Dict[str, Any]):
+        """Response cache and key for a request, or (None, None) if it can't be cached"""
+        if data.get("use_cache", True) in (False, "false", "False", 0):
+            return None, None
+        try:
+            request = cls._request_options(data)
+        except (KeyError, TypeError, ValueError):
+            return None, None
+        # Follow-up turns depend on the conversation, not just the question
+        if request["conversation_history"]:
+            return None, None
+        cache = get_response_cache()
+        if cache is None:
+            return None, None
+        options = {name: request[name] for name in ANSWER_OPTIONS}
+        return cache, cache.key(request["question"], request["client_id"], options)
+
+    async def run(self, input_data: AgentInput) -> AgentOutput:
+        """
+        Main agent execution - serves repeat questions from the response
+        cache, everything else through _answer()
+        
+        Returns:
+            AgentOutput with cardio analysis and recommendations;
+            metadata["cache"]["hit"] marks cached answers and
+            metadata["metrics"] has the request's timings and token counts
+        """
+        with track_request(self.name) as metrics:
+            output = await self._respond(input_data)
+        return self._finish_metrics(metrics, output)
+
+    @staticmethod
+    def _finish_metrics(metrics, output: AgentOutput) -> AgentOutput:
+        """Attach the request's metrics to its output and pass them to the metrics hooks"""
+        if output.metadata.get("cache", {}).get("hit"):
+            route = "cache"
+        else:
+            route = output.metadata.get("route", {}).get("path", "llm")
+        record = metrics.record(route, output.success)
+        output.metadata = {**output.metadata, "metrics": {k: v for k, v in record.items() if k != "timestamp"}}
+        emit_metrics(record)
+        return output
+
+    async def _respond(self, input_data: AgentInput) -> AgentOutput:
+        """run() without metrics: response cache in front of _answer()"""
+        data = input_data.data or {}
+        cache, key = self._cache_key(data)
+        if cache is None:
+            return await self._answer(input_data)
+
+        cached = cache.get(key)
+        if cached is not None:
+            return self._from_cache(cached)
+
+        output = await self._answer(input_data)
+        self._store(cache, key, output)
+        return output
+
+    @staticmethod
+    def _from_cache(cached: Dict[str, Any]) -> AgentOutput:
+        """AgentOutput for a response cache hit"""
+        log.info("Served from response cache", extra=fields(age_s=round(cached['age_s'])))
+        return AgentOutput(
+            success=True,
+            data=copy.deepcopy(cached["data"]),
+            metadata={**copy.deepcopy(cached["metadata"]), "cache": {"hit": True, "age_s": cached["age_s"]}}
+        )
+
+    @staticmethod
+    def _store(cache, key, output: AgentOutput) -> None:
+        """Cache a successful answer and mark the output as a cache miss"""
+        if output.success:
+            cache.set(key, copy.deepcopy(output.data), copy.deepcopy(output.metadata))
+        output.metadata = {**output.metadata, "cache": {"hit": False}}
+
+    # ==========================================
+    # STREAMING
+    # ==========================================
+
+    async def stream(self, input_data: AgentInput) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer a question as a stream of events, in the order they happen:
+
+            {"type": "token", "delta", "iteration"}
+            {"type": "retract", "iteration"}    # that iteration's tokens were not the answer
+            {"type": "thinking", "text", "iteration"}   # text written alongside tool calls
+            {"type": "tool_start", "call_id", "tool", "args"}
+            {"type": "tool_end", "call_id", "tool", "ok", "result", "latency_ms"}
+            {"type": "final", "output"}     # AgentOutput as a dict, always last
+
+        Model turns use streaming completions, and text is forwarded as token
+        events chunk by chunk until a tool call fragment appears in the turn.
+        Whether a turn is the answer is only known then: if it ends in tool
+        calls, a retract event withdraws the tokens already sent for that
+        iteration and its whole text follows as one thinking event. The
+        answer is therefore the token events of iterations never retracted;
+        tool_end carries a compact preview of the result.
+        Cached and template answers arrive as a single token event, and the
+        legacy function-calling mode (parallel_tools off) is not streamed.
+        output.metadata["stream"] has time to first token event and total time,
+        output.metadata["metrics"] the same metrics as run().
+        """
+        started = time.perf_counter()
+        first_token_ms = None
+        with track_request(self.name) as metrics:
+            async for event in self._stream_answer(input_data):
+                if event["type"] == "token" and first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - started) * 1000, 2)
+                if event["type"] == "final":
+                    output = event["output"]
+                    output.metadata = {
+                        **output.metadata,
+                        "stream": {
+                            "first_token_ms": first_token_ms,
+                            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+                        }
+                    }
+                    event = {"type": "final", "output": self._finish_metrics(metrics, output).model_dump()}
+                yield event
+
+    async def _stream_answer(self, input_data: AgentInput) -> AsyncIterator[Dict[str, Any]]:
+        """Events for stream(); the final event carries the AgentOutput object"""
+        data = input_data.data or {}
+        cache, key = self._cache_key(data)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            output = self._from_cache(cached)
+            yield {"type": "token", "delta": output.data["answer"], "iteration": 0}
+            yield {"type": "final", "output": output}
+            return
+
+        output = None
+        try:
+            request = self._parse_request(data)
+            if not request["parallel_tools"]:
+                output = await self._answer(input_data)
+            elif request["use_templates"] and not request["conversation_history"]:
+                output = await self._answer_from_template(request["question"], request["client_id"])
+            if output is not None:
+                if output.data.get("answer"):
+                    yield {"type": "token", "delta": output.data["answer"], "iteration": output.data["iterations"]}
+            else:
+                async for event in self._stream_llm(request):
+                    if event["type"] == "final":
+                        output = event["output"]
+                    else:
+                        yield event
+
+        except Exception as e:
+            log.exception("Streamed answer failed")
+            output = AgentOutput(
+                success=False,
+                data={"answer": "", "iterations": 0, "tools_used": []},
+                error=str(e)
+            )
+
+        if cache is not None:
+            self._store(cache, key, output)
+        yield {"type": "final", "output": output}
+
+    async def _stream_llm(self, request: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """The parallel tool-calling loop with every model turn streamed"""
+        client_id = request["client_id"]
+        messages = self._initial_messages(request["question"], client_id, request["conversation_history"])
+        tools_used = []
+        tool_tokens = []
+
+        for iteration in range(request["max_iterations"]):
+            log.debug("Streaming iteration %d", iteration + 1)
+            llm_started = time.perf_counter()
+            response = await self.client.chat.completions.create(
+                model=self.MODEL,
+                messages=messages,
+                tools=OPENAI_CHAT_TOOLS,
+                tool_choice="auto",
+                parallel_tool_calls=True,
+                temperature=request["temperature"],
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+
+            # Forward text until a tool call shows up; tool calls come in fragments keyed by index
+            content, calls, streamed = [], {}, False
+            usage, first_chunk = None, None
+            async for chunk in response:
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - llm_started
+                # With include_usage the last chunk has the usage and no choices
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                for call in delta.tool_calls or []:
+                    entry = calls.setdefault(call.index, {"id": None, "name": "", "arguments": ""})
+                    if call.id:
+                        entry["id"] = call.id
+                    if call.function is not None:
+                        entry["name"] += call.function.name or ""
+                        entry["arguments"] += call.function.arguments or ""
+                if delta.content:
+                    content.append(delta.content)
+                    if not calls:
+                        streamed = True
+                        yield {"type": "token", "delta": delta.content, "iteration": iteration + 1}
+            self._record_llm_call(iteration + 1, time.perf_counter() - llm_started, usage, first_chunk)
+
+            if calls:
+                if streamed:
+                    yield {"type": "retract", "iteration": iteration + 1}
+                if content:
+                    yield {"type": "thinking", "text": "".join(content), "iteration": iteration + 1}
+                message = SimpleNamespace(
+                    content="".join(content) or None,
+                    tool_calls=[
+                        SimpleNamespace(
+                            id=entry["id"],
+                            type="function",
+                            function=SimpleNamespace(name=entry["name"], arguments=entry["arguments"])
+                        )
+                        for _, entry in sorted(calls.items())
+                    ]
+                )
+                events: asyncio.Queue = asyncio.Queue()
+                task = asyncio.create_task(
+                    self._run_tool_calls(
+                        message, messages, client_id, on_event=events.put_nowait, tool_tokens=tool_tokens
+                    )
+                )
+                async for event in self._drain(task, events):
+                    yield event
+                tools_used.extend(task.result())
+                continue
+
+            final_answer = "".join(content)
+            log.info("Streamed answer", extra=fields(iterations=iteration + 1, tools=",".join(tools_used)))
+            yield {
+                "type": "final",
+                "output": AgentOutput(
+                    success=True,
+                    data={
+                        "answer": final_answer,
+                        "iterations": iteration + 1,
+                        "tools_used": tools_used
+                    },
+                    metadata={"route": {"path": "llm"}, "tool_tokens": summarize_usage(tool_tokens)}
+                )
+            }
+            return
+
+        yield {
+            "type": "final",
+            "output": AgentOutput(
+                success=False,
+                data={
+                    "answer": "Analysis incomplete - max iterations reached",
+                    "iterations": request["max_iterations"],
+                    "tools_used": tools_used
+                },
+                error="Max iterations reached",
+                metadata={"tool_tokens": summarize_usage(tool_tokens)}
+            )
+        }
+
+    @staticmethod
+    def _record_llm_call(iteration: int, seconds: float, usage, first_token_seconds: float | None = None) -> None:
+        """Add one model call to the request's metrics, if a request is being tracked"""
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.record_llm_call(iteration, seconds, usage, first_token_seconds)
+
+    @staticmethod
+    async def _drain(task: asyncio.Task, events: asyncio.Queue) -> AsyncIterator[Dict[str, Any]]:
+        """Yield events queued by task as they arrive, until it finishes"""
+        try:
+            while True:
+                getter = asyncio.ensure_future(events.get())
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                while not events.empty():
+                    yield events.get_nowait()
+                return
+        finally:
+            # Consumer went away mid-stream
+            if not task.done():
+                task.cancel()
+
+    async def _answer(self, input_data: AgentInput) -> AgentOutput:
+        """
+        Answer a question - GPT-4 intelligently routes to appropriate cardio tools
+        
+        Returns:
+            AgentOutput with cardio analysis and recommendations
+        """
+        try:
+            request = self._parse_request(input_data.data or {})
+            question = request["question"]
+            client_id = request["client_id"]
+            max_iterations = request["max_iterations"]
+            temperature = request["temperature"]
+            parallel_tools = request["parallel_tools"]
+            conversation_history = request["conversation_history"]
+
+            # Common first-turn questions skip the LLM; follow-ups need the history
+            if request["use_templates"] and not conversation_history:
+                templated = await self._answer_from_template(question, client_id)
+                if templated is not None:
+                    return templated
+
+            messages = self._initial_messages(question, client_id, conversation_history)
             tools_used = []
+            tool_tokens = []
             
             for iteration in range(max_iterations):
-                print(f"\n{'='*60}")
-                print(f"[CardioAgent] ITERATION {iteration + 1}")
-                print(f"{'='*60}")
+                log.debug("Iteration %d", iteration + 1)
                 
-                # Call GPT-4 with function calling
-                response = self.client.chat.completions.create(
-                    model="gpt-4-turbo-preview",
-                    messages=messages,
-                    functions=OPENAI_TOOLS,
-                    function_call="auto",
-                    temperature=temperature
-                )
+                # Call GPT-4 with tool calling
+                llm_started = time.perf_counter()
+                if parallel_tools:
+                    response = await self.client.chat.completions.create(
+                        model=self.MODEL,
+                        messages=messages,
+                        tools=OPENAI_CHAT_TOOLS,
+                        tool_choice="auto",
+                        parallel_tool_calls=True,
+                        temperature=temperature
+                    )
+                else:
+                    response = await self.client.chat.completions.create(
+                        model=self.MODEL,
+                        messages=messages,
+                        functions=OPENAI_TOOLS,
+                        function_call="auto",
+                        temperature=temperature
+                    )
+                self._record_llm_call(iteration + 1, time.perf_counter() - llm_started, getattr(response, "usage", None))
                 
                 message = response.choices[0].message
                 
-                # GPT wants to call a function
-                if message.function_call:
+                # GPT wants one or more tools, run them concurrently
+                if parallel_tools and message.tool_calls:
+                    tools_used.extend(await self._run_tool_calls(message, messages, client_id, tool_tokens=tool_tokens))
+
+                # GPT wants to call a function (legacy, one per round trip)
+                elif not parallel_tools and message.function_call:
                     function_name = message.function_call.name
                     function_args = json.loads(message.function_call.arguments)
                     
@@ -558,13 +1226,9 @@ class CardioAgent(BaseAgent):
                     if not tool_func:
                         raise ValueError(f"Tool {function_name} not found")
                     
-                    # Auto-inject client_id if function accepts it
-                    sig = inspect.signature(tool_func)
-                    if 'client_id' in sig.parameters and 'client_id' not in function_args:
-                        function_args['client_id'] = client_id
+                    self._inject_client_id(tool_func, function_args, client_id)
                     
-                    print(f"\n[CardioAgent] 🔧 Tool: {function_name}")
-                    print(f"[CardioAgent]    Args: {json.dumps(function_args, indent=2)}")
+                    log.debug("Tool call %s args=%s", function_name, Lazy(_preview, function_args))
                     
                     tools_used.append(function_name)
                     
@@ -578,37 +1242,20 @@ class CardioAgent(BaseAgent):
                         }
                     })
                     
-                    try:
-                        # Execute tool
-                        if asyncio.iscoroutinefunction(tool_func):
-                            result = await tool_func(**function_args)
-                        else:
-                            result = tool_func(**function_args)
-                        
-                        result_preview = json.dumps(result, indent=2)[:200]
-                        print(f"[CardioAgent]    ✓ Result: {result_preview}...")
-                        
-                    except Exception as e:
-                        import traceback
-                        traceback.print_exc()
-                        print(f"[CardioAgent]    ✗ Error: {str(e)}")
-                        result = {'error': str(e)}
+                    result = await self._execute_tool(function_name, tool_func, function_args)
                     
                     # Add result to messages
                     messages.append({
                         "role": "function",
                         "name": function_name,
-                        "content": json.dumps(result)
+                        "content": self._tool_content(function_name, result, tool_tokens)
                     })
                 
                 # GPT has final answer
                 else:
                     final_answer = message.content
-                    print(f"\n{'='*60}")
-                    print(f"[CardioAgent] ✅ COMPLETED IN {iteration + 1} ITERATIONS")
-                    print(f"[CardioAgent] Tools used: {', '.join(tools_used)}")
-                    print(f"{'='*60}")
-                    print(f"\n{final_answer[:200]}...")
+                    log.info("Answered", extra=fields(iterations=iteration + 1, tools=",".join(tools_used)))
+                    log.debug("Answer: %s", Lazy(_preview, final_answer))
                     
                     return AgentOutput(
                         success=True,
@@ -616,7 +1263,8 @@ class CardioAgent(BaseAgent):
                             "answer": final_answer,
                             "iterations": iteration + 1,
                             "tools_used": tools_used
-                        }
+                        },
+                        metadata={"route": {"path": "llm"}, "tool_tokens": summarize_usage(tool_tokens)}
                     )
             
             # Max iterations reached
@@ -627,13 +1275,12 @@ class CardioAgent(BaseAgent):
                     "iterations": max_iterations,
                     "tools_used": tools_used
                 },
-                error="Max iterations reached"
+                error="Max iterations reached",
+                metadata={"tool_tokens": summarize_usage(tool_tokens)}
             )
 
         except Exception as e:
-            print(f"[CardioAgent] ❌ Exception: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Answer failed")
             
             return AgentOutput(
                 success=False,
@@ -0,0 +1,263 @@
+# AI Server - agents/prompt_classifier.py
+
+"""
+    k-NN prompt classifier over the example bank from
+    notebooks/embedding_model.ipynb.
+
+    classify_batch() encodes prompts in batches and runs one vectorized
+    k-NN search for the whole batch against the stored example embeddings
+    (flat, IVF or HNSW index, see core.vector_index); each prompt gets the
+    majority category of its k nearest examples, confidence = votes / k. classify_jsonl() streams a
+    JSONL file through it chunk by chunk, so memory stays bounded by the
+    batch size rather than the file size.
+
+    Usage:
+        python -m agents.prompt_classifier requests.jsonl out.jsonl --field body
+"""
+
+import argparse
+import json
+import threading
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from config import get_settings
+from core.embedding_store import EmbeddingStore
+from core.embeddings import ENCODE_BATCH_SIZE, encode, get_encoder
+from core.vector_index import index_for_store
+
+DEFAULT_K = 3
+STORE_NAME = "prompt_examples"
+
+PROMPT_CATEGORIES: Dict[str, List[str]] = {
+    "volume_consistency": [
+        "How many runs per week?",
+        "What's the workout frequency?",
+        "How consistent is the training?",
+        "Show me workouts per week",
+        "Training volume analysis",
+    ],
+    "distance_progression": [
+        "Total distance covered",
+        "Weekly mileage trends",
+        "How far did they run?",
+        "Distance over time",
+        "Progression in distance",
+    ],
+    "pace_trends": [
+        "How fast are they running?",
+        "Pace improvement over time",
+        "Average running speed",
+        "Is pace getting better?",
+        "Speed trends",
+    ],
+    "heart_rate_analysis": [
+        "Heart rate zones",
+        "Average heart rate trends",
+        "Cardiovascular intensity",
+        "HR during workouts",
+        "Training intensity",
+    ],
+    "workout_type": [
+        "What types of cardio?",
+        "Running vs cycling preference",
+        "Cardio activity breakdown",
+        "Exercise type distribution",
+    ],
+    "recovery_patterns": [
+        "Rest days between workouts",
+        "Recovery time analysis",
+        "How often do they rest?",
+        "Training frequency gaps",
+    ],
+    "performance_metrics": [
+        "Calories burned",
+        "Elevation gain",
+        "Overall performance",
+        "Training effectiveness",
+    ],
+}
+
+
+class PromptClassifier:
+    """Majority vote over the k nearest example prompts"""
+
+    def __init__(
+        self,
+        encoder: Any,
+        categories: Optional[Dict[str, List[str]]] = None,
+        store: Optional[EmbeddingStore] = None,
+        index_type: str = "flat",
+    ):
+        self.encoder = encoder
+        categories = categories or PROMPT_CATEGORIES
+
+        self.category_names: List[str] = list(categories)
+        self.examples: List[str] = []
+        labels: List[int] = []
+        for label, (category, examples) in enumerate(categories.items()):
+            self.examples.extend(examples)
+            labels.extend([label] * len(examples))
+        self.labels = np.array(labels, dtype=np.int64)
+
+        self.store = store or EmbeddingStore(STORE_NAME)
+        self.store.sync(
+            {f"{self.category_names[label]}/{i}": text
+             for i, (label, text) in enumerate(zip(labels, self.examples))},
+            encoder,
+        )
+        self.index = index_for_store(self.store, index_type)
+
+    def classify(self, prompt: str, k: int = DEFAULT_K) -> Dict[str, Any]:
+        """Classify one prompt"""
+        return self.classify_batch([prompt], k=k)[0]
+
+    def classify_batch(
+        self,
+        prompts: List[str],
+        k: int = DEFAULT_K,
+        batch_size: int = ENCODE_BATCH_SIZE,
+        with_matches: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Classify many prompts with one k-NN search.
+
+        Args:
+            prompts: Prompt texts
+            k: Neighbours per prompt
+            batch_size: Encoder batch size
+            with_matches: Include the nearest examples in each result
+
+        Returns:
+            One dict per prompt, in input order, with predicted_category,
+            confidence and (optionally) nearest_matches
+        """
+        if not prompts:
+            return []
+        k = min(k, len(self.examples))
+        queries = encode(self.encoder, prompts, batch_size=batch_size)
+        similarities, top = self.index.search(queries, k)            # (n, k), nearest first
+        found = top >= 0
+        top_labels = self.labels[np.where(found, top, 0)]
+        rows = np.arange(len(prompts))[:, None]
+
+        # Vote counts per category; ties go to the category with the nearer
+        # neighbour, as Counter.most_common did in the notebook
+        votes = np.zeros((len(prompts), len(self.category_names)), dtype=np.float64)
+        np.add.at(votes, (np.repeat(rows, k, axis=1), top_labels), found.astype(np.float64))
+        tie_break = np.zeros_like(votes)
+        ranks = np.broadcast_to(np.arange(k, 0, -1), top_labels.shape) * found
+        np.maximum.at(tie_break, (np.repeat(rows, k, axis=1), top_labels), ranks / (k + 1))
+        winners = np.argmax(votes + tie_break, axis=1)
+
+        results = []
+        for i, winner in enumerate(winners):
+            result = {
+                'predicted_category': self.category_names[winner],
+                'confidence': float(votes[i, winner] / k),
+            }
+            if with_matches:
+                result['nearest_matches'] = [
+                    {
+                        'example': self.examples[j],
+                        'category': self.category_names[self.labels[j]],
+                        'similarity': round(float(similarity), 4),
+                    }
+                    for j, similarity in zip(top[i], similarities[i])
+                    if j >= 0
+                ]
+            results.append(result)
+        return results
+
+    def classify_jsonl(
+        self,
+        input_path: str,
+        output_path: str,
+        field: str = "question",
+        k: int = DEFAULT_K,
+        batch_size: int = 256,
+    ) -> int:
+        """
+        Classify every record of a JSONL file, writing one result line per
+        input line as each batch completes.
+
+        Args:
+            input_path: JSONL with the prompt text under `field`
+            output_path: JSONL written with line number, any id field from
+                the record, predicted_category and confidence
+            field: Record key holding the prompt text
+            k: Neighbours per prompt
+            batch_size: Records read, encoded and written per step
+
+        Returns:
+            Number of records classified
+        """
+        count = 0
+        with open(input_path, encoding="utf-8") as src, open(output_path, "w", encoding="utf-8") as out:
+            for chunk in _chunks(_read_records(src), batch_size):
+                prompts = [str(record.get(field) or "") for _, record in chunk]
+                results = self.classify_batch(prompts, k=k, batch_size=batch_size, with_matches=False)
+                for (line_no, record), result in zip(chunk, results):
+                    row = {'line': line_no}
+                    for id_field in ('id', 'request_id'):
+                        if id_field in record:
+                            row[id_field] = record[id_field]
+                    row.update(result)
+                    out.write(json.dumps(row) + "\n")
+                out.flush()
+                count += len(chunk)
+        return count
+
+
+def _read_records(lines: Iterable[str]) -> Iterator[tuple]:
+    """(line number, record) for each non-blank JSONL line"""
+    for line_no, line in enumerate(lines, start=1):
+        if line.strip():
+            yield line_no, json.loads(line)
+
+
+def _chunks(items: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+_classifier: Optional[PromptClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_prompt_classifier() -> Optional[PromptClassifier]:
+    """Get the process-wide classifier, or None if no encoder is available"""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                encoder = get_encoder()
+                if encoder is None:
+                    return None
+                _classifier = PromptClassifier(encoder, index_type=get_settings().embedding_index_type)
+    return _classifier
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Classify prompts from a JSONL file")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--field", default="question", help="Record key holding the prompt text")
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    classifier = get_prompt_classifier()
+    if classifier is None:
+        raise SystemExit("sentence-transformers is required for prompt classification")
+    count = classifier.classify_jsonl(args.input, args.output, args.field, args.k, args.batch_size)
+    print(f"[prompt_classifier] classified {count} prompts -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
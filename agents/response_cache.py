@@ -0,0 +1,82 @@
+# AI Server - agents/response_cache.py
+
+"""
+    Answer cache in front of CardioAgent.run.
+
+    Keyed on (client_id, data version of the client's database, today's
+    date, normalized question, answer-affecting request options). The data
+    version changes whenever the database file is written, so cached answers
+    stop matching as soon as new sessions land; the date makes answers about
+    "this week" or "the last 4 weeks" expire at midnight, as tool results do
+    (agents/tool_cache.py); the options keep answers produced at another
+    temperature or iteration limit apart.
+"""
+
+import re
+import threading
+import unicodedata
+from datetime import date
+from typing import Any, Dict, Hashable, Optional
+
+from config import get_settings
+from core.cache import LRUCache
+from tools.db import data_version
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a question"""
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """LRU/TTL cache of successful first-turn answers"""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.cache = LRUCache(max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+
+    def key(self, question: str, client_id: int, options: Optional[Dict[str, Any]] = None) -> Hashable:
+        return (
+            client_id,
+            data_version(client_id),
+            date.today().isoformat(),
+            normalize_question(question),
+            tuple(sorted((options or {}).items())),
+        )
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Cached {'data', 'metadata'} for a key, plus its age in seconds"""
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        return {**entry, "age_s": round(self.cache.age(key) or 0.0, 3)}
+
+    def set(self, key: Hashable, data: Dict[str, Any], metadata: Dict[str, Any]) -> None:
+        self.cache.set(key, {"data": data, "metadata": metadata})
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get the process-wide response cache, or None if disabled"""
+    global _cache
+    settings = get_settings()
+    if not settings.response_cache_enabled:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    max_bytes=settings.response_cache_max_bytes,
+                    ttl_seconds=settings.response_cache_ttl_seconds,
+                )
+    return _cache
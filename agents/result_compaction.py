@@ -0,0 +1,165 @@
+# AI Server - agents/result_compaction.py
+
+"""
+    Compaction of tool results before they are appended to the LLM messages.
+
+    Every later request in the tool loop carries each earlier tool message,
+    so results are shrunk once, on the way in:
+
+        - lists of same-shaped records become {"columns": [...], "rows": [[...]]}
+        - floats are rounded per field (pace to the second, km to 10 m, ...)
+        - None fields are dropped from objects
+        - long lists keep their first and last rows plus min/max/mean of
+          every numeric column, cut further until the result fits the
+          tool's token budget (counted with the agent model's encoding)
+
+    compact_result() returns the message content and the raw and compacted
+    token counts, which the agent reports in AgentOutput.metadata.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.agents.tokens import count_tokens
+
+DEFAULT_TOKEN_BUDGET = 1200     # Tokens per tool message
+
+# Tools whose results are routinely long get tighter budgets
+TOOL_TOKEN_BUDGETS = {
+    'get_cardio_history': 1000,
+    'get_cardio_session_details': 800,
+    'get_split_analysis': 600,
+    'get_fastest_splits': 600,
+}
+
+# Row limits tried in turn until a result fits its budget (None = all rows)
+ROW_LIMITS = (None, 24, 12, 6, 2)
+
+# First matching field-name fragment sets the decimals kept; 0 -> int
+ROUNDING_RULES = (
+    (('latitude', 'longitude'), 5),
+    (('_cv', 'slope'), 3),
+    (('_pct', 'percent'), 1),
+    (('pace', 'heart_rate', 'time_s', 'elevation', 'altitude', 'calories'), 0),
+    (('_km', 'mile', 'kmh', 'speed', '_min', 'per_week'), 2),
+    (('distance', 'duration'), 0),
+)
+DEFAULT_DIGITS = 2
+
+
+def _digits(field: Optional[str]) -> int:
+    if field:
+        name = field.lower()
+        for fragments, digits in ROUNDING_RULES:
+            if any(fragment in name for fragment in fragments):
+                return digits
+    return DEFAULT_DIGITS
+
+
+def round_field(field: Optional[str], value: float) -> Any:
+    """Round a float by its field's rule"""
+    digits = _digits(field)
+    if value != value or value in (float('inf'), float('-inf')):
+        return None
+    return int(round(value)) if digits == 0 else round(value, digits)
+
+
+def _is_table(values: List[Any]) -> bool:
+    """Two or more dicts with the same keys"""
+    if len(values) < 2 or not all(isinstance(v, dict) for v in values):
+        return False
+    keys = values[0].keys()
+    return all(v.keys() == keys for v in values[1:])
+
+
+def _summary(columns: List[str], rows: List[List[Any]]) -> Dict[str, Dict[str, Any]]:
+    """min/max/mean of each numeric column (other than ids) over all rows"""
+    stats = {}
+    for i, column in enumerate(columns):
+        if column.endswith('id'):
+            continue
+        values = [row[i] for row in rows if isinstance(row[i], (int, float)) and not isinstance(row[i], bool)]
+        if values:
+            stats[column] = {
+                'min': round_field(column, min(values)),
+                'max': round_field(column, max(values)),
+                'mean': round_field(column, sum(values) / len(values)),
+            }
+    return stats
+
+
+def _truncate(rows: List[Any], max_rows: Optional[int]) -> Tuple[List[Any], int]:
+    """First and last rows up to max_rows, and how many were left out"""
+    if max_rows is None or len(rows) <= max_rows:
+        return rows, 0
+    head = (max_rows + 1) // 2
+    tail = max_rows - head
+    return rows[:head] + (rows[-tail:] if tail else []), len(rows) - max_rows
+
+
+def compact_value(value: Any, field: Optional[str] = None, max_rows: Optional[int] = None) -> Any:
+    """Compacted copy of a JSON-like value"""
+    if isinstance(value, float):
+        return round_field(field, value)
+    if isinstance(value, dict):
+        return {k: compact_value(v, k, max_rows) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        values = list(value)
+        if _is_table(values):
+            columns = list(values[0].keys())
+            rows = [[compact_value(record[c], c, max_rows) for c in columns] for record in values]
+            kept, omitted = _truncate(rows, max_rows)
+            table = {'columns': columns, 'rows': kept}
+            if omitted:
+                table['omitted_rows'] = omitted
+                table['summary'] = _summary(columns, rows)
+            return table
+        kept, omitted = _truncate(values, max_rows)
+        compacted = [compact_value(v, field, max_rows) for v in kept]
+        if omitted:
+            compacted.append(f"... {omitted} more")
+        return compacted
+    return value
+
+
+def compact_result(
+    tool_name: str,
+    result: Any,
+    model: str,
+    budget: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Tool message content for a result, within the tool's token budget
+    where row truncation can get it there.
+
+    Returns:
+        (content, stats) - stats has raw_tokens, tokens, max_rows and over_budget
+    """
+    budget = budget or TOOL_TOKEN_BUDGETS.get(tool_name, DEFAULT_TOKEN_BUDGET)
+    raw_tokens = count_tokens(json.dumps(result, default=str), model)
+
+    for max_rows in ROW_LIMITS:
+        content = json.dumps(compact_value(result, max_rows=max_rows), separators=(',', ':'), default=str)
+        tokens = count_tokens(content, model)
+        if tokens <= budget:
+            break
+
+    return content, {
+        'tool': tool_name,
+        'raw_tokens': raw_tokens,
+        'tokens': tokens,
+        'max_rows': max_rows,
+        'over_budget': tokens > budget,
+    }
+
+
+def summarize_usage(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Totals of compact_result() stats for AgentOutput.metadata"""
+    raw = sum(c['raw_tokens'] for c in calls)
+    compacted = sum(c['tokens'] for c in calls)
+    return {
+        'raw': raw,
+        'compacted': compacted,
+        'saved_pct': round((raw - compacted) / raw * 100, 1) if raw else 0.0,
+        'calls': calls,
+    }
@@ -0,0 +1,595 @@
+# AI Server - agents/template_router.py
+
+"""
+    Embedding-based template router in front of the CardioAgent tool loop.
+
+    The bank follows notebooks/template_bank.ipynb: 7 categories, each with
+    a description and a few templates with example phrasings. Routing is
+    two-stage, as in notebooks/template.md:
+
+        1. category  - the question is scored against one centroid per
+                       category (its description and examples, averaged)
+        2. template  - only the winning category's examples are scored; the
+                       best one picks the template
+
+    A template answers only when its example clears the confidence
+    threshold and every modifier in the question binds to the tool call:
+    cardio type, trailing window ("last 6 weeks", "past year"), distance
+    unit and comparisons are extracted by extract_slots() and bound by
+    bind_slots() onto the template's arguments. A modifier the template
+    cannot express (a type filter on a tool without one, a calendar window
+    such as "this week", a comparison) sends the question to the LLM loop
+    rather than answering a different question.
+
+    A match runs the template's tool from TOOL_FUNCTIONS directly and
+    formats the answer without calling the LLM. Everything else falls back
+    to the full tool loop.
+
+    Bank embeddings live in a persistent EmbeddingStore (data/embeddings/),
+    so startup only encodes entries whose text changed. Build it ahead of
+    deploys with:
+        python -m agents.template_router
+
+    On by default (template_router_enabled). If sentence-transformers or the
+    model cannot be loaded, get_template_router() returns None and every
+    question takes the LLM loop.
+"""
+
+import re
+import threading
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import get_settings
+from core.embedding_store import EmbeddingStore
+from core.embeddings import encode, get_encoder, normalize
+
+TEMPLATE_THRESHOLD = 0.60    # Minimum question/example similarity to skip the LLM
+STORE_NAME = "template_bank"
+KM_PER_MILE = 1.609344
+
+
+# ==========================================
+# ANSWER FORMATTERS
+# ==========================================
+# Each formatter takes the tool result and the distance unit ('km' or 'mi')
+
+def _pace(sec_per_km: Optional[float], unit: str = 'km') -> str:
+    """Format sec/km as m:ss min/km (or min/mi)"""
+    if not sec_per_km:
+        return "n/a"
+    per_unit = sec_per_km * KM_PER_MILE if unit == 'mi' else sec_per_km
+    minutes, seconds = divmod(int(round(per_unit)), 60)
+    return f"{minutes}:{seconds:02d} min/{unit}"
+
+
+def _distance(km: Optional[float], unit: str = 'km', digits: int = 1) -> str:
+    """Format a distance in km in the requested unit"""
+    value = (km or 0) / KM_PER_MILE if unit == 'mi' else (km or 0)
+    return f"{value:.{digits}f} {unit}"
+
+
+def _only(result: Dict[str, Any]) -> str:
+    """' (Run only)' when the result is filtered to one cardio type"""
+    return f" ({result['cardio_type']} only)" if result.get('cardio_type') else ""
+
+
+def _format_weekly_mileage(result: Dict[str, Any], unit: str = 'km') -> str:
+    weeks = result['weekly']
+    if not weeks:
+        return f"No sessions{_only(result)} logged in the last {result['weeks']} weeks."
+    latest = weeks[-1]
+    return (
+        f"Over the last {result['weeks']} weeks the client covered {_distance(result['total_km'], unit)}{_only(result)} "
+        f"({_distance(result['avg_km_per_week'], unit)}/week on average). The most recent week "
+        f"(starting {latest['week_start']}) was {_distance(latest['distance_km'], unit)} across "
+        f"{latest['sessions']} session(s)."
+    )
+
+
+def _format_monthly_volume(result: Dict[str, Any], unit: str = 'km') -> str:
+    months = result['monthly']
+    if not months:
+        return f"No sessions{_only(result)} logged in the last {result['months']} months."
+    parts = [f"{m['month']}: {m['sessions']} sessions, {_distance(m['distance_km'], unit)}" for m in months]
+    return f"Monthly volume{_only(result)} - " + "; ".join(parts) + "."
+
+
+def _format_frequency(result: Dict[str, Any], unit: str = 'km') -> str:
+    return (
+        f"The client did {result['total_sessions']} cardio sessions in the last {result['weeks']} weeks, "
+        f"about {result['sessions_per_week']} per week, on {result['active_days']} different days."
+    )
+
+
+def _format_rest_days(result: Dict[str, Any], unit: str = 'km') -> str:
+    window_days = result['weeks'] * 7
+    rest_days = window_days - result['active_days']
+    return (
+        f"In the last {result['weeks']} weeks the client trained on {result['active_days']} days "
+        f"and rested on {rest_days} of {window_days} days."
+    )
+
+
+def _format_trend(label: str, value_fmt: Callable[[float, str], str]) -> Callable[[Dict[str, Any], str], str]:
+    """Formatter for the shared _trend() result shape"""
+    def format_result(result: Dict[str, Any], unit: str = 'km') -> str:
+        if not result.get('sessions'):
+            return f"No {label} data{_only(result)} in the last {result['weeks_back']} weeks."
+        weekly = result['weekly']
+        text = (
+            f"{label.capitalize()}{_only(result)} over the last {result['weeks_back']} weeks is {result['direction']}: "
+            f"{value_fmt(weekly[0]['value'], unit)} in the week of {weekly[0]['week_start']} vs "
+            f"{value_fmt(weekly[-1]['value'], unit)} in the week of {weekly[-1]['week_start']}"
+        )
+        if result.get('change_pct') is not None and len(weekly) > 1:
+            text += f" ({result['change_pct']:+.1f}%)"
+        return text + f", from {result['sessions']} sessions."
+    return format_result
+
+
+def _format_last_workout(result: Dict[str, Any], unit: str = 'km') -> str:
+    if not result['sessions']:
+        return "No cardio sessions have been logged yet."
+    s = result['sessions'][0]
+    text = (
+        f"The last session was a {s['cardio_type']} on {s['cardio_date']} ({s['cardio_name']}): "
+        f"{_distance((s['distance'] or 0) / 1000, unit, 2)} in {(s['duration'] or 0) / 60:.0f} min "
+        f"at {_pace(s['pace_sec_per_km'], unit)}"
+    )
+    if s.get('avg_heart_rate'):
+        text += f", average HR {s['avg_heart_rate']:.0f} bpm"
+    return text + "."
+
+
+def _format_personal_bests(result: Dict[str, Any], unit: str = 'km') -> str:
+    bests = result['personal_bests']
+    parts = []
+    if bests.get('longest_distance'):
+        b = bests['longest_distance']
+        parts.append(f"longest distance {_distance(b['distance'] / 1000, unit, 2)} on {b['cardio_date']}")
+    if bests.get('fastest_pace'):
+        b = bests['fastest_pace']
+        parts.append(f"fastest pace {_pace(b['pace_sec_per_km'], unit)} on {b['cardio_date']}")
+    if bests.get('longest_duration'):
+        b = bests['longest_duration']
+        parts.append(f"longest session {b['duration'] / 60:.0f} min on {b['cardio_date']}")
+    if not parts:
+        return f"No personal bests{_only(result)} recorded yet."
+    return f"Personal bests{_only(result)}: " + "; ".join(parts) + "."
+
+
+def _format_type_distribution(result: Dict[str, Any], unit: str = 'km') -> str:
+    if not result['types']:
+        return f"No sessions logged in the last {result['weeks']} weeks."
+    parts = [f"{t['cardio_type']} {t['sessions']} ({t['pct']:.0f}%)" for t in result['types']]
+    return f"Cardio types over the last {result['weeks']} weeks: " + ", ".join(parts) + "."
+
+
+def _format_intensity_zones(result: Dict[str, Any], unit: str = 'km') -> str:
+    if not result.get('zones'):
+        return result.get('message', "No heart rate zone data in this period.")
+    parts = [f"Z{z['zone']} {z['pct']:.0f}%" for z in result['zones']]
+    return (
+        f"Heart rate zone distribution{_only(result)} over the last {result['weeks']} weeks "
+        f"(max HR {result['reference_max_hr']:.0f}): " + ", ".join(parts) + "."
+    )
+
+
+# ==========================================
+# TEMPLATE BANK
+# ==========================================
+# category -> description + templates; each template names a TOOL_FUNCTIONS
+# entry, default arguments, the question slots it can bind (see bind_slots),
+# example phrasings to match, and an answer formatter
+TEMPLATE_BANK: Dict[str, Dict[str, Any]] = {
+    "volume": {
+        "description": "total duration distance calories sessions workouts mileage volume",
+        "templates": {
+            "weekly_mileage": {
+                "tool": "get_weekly_mileage",
+                "args": {"weeks": 4},
+                "binds": {"cardio_type": "cardio_type", "window": "weeks", "unit": True},
+                "examples": ["How many miles per week?", "What's the weekly mileage?",
+                             "How far did they run each week?", "Total distance per week"],
+                "format": _format_weekly_mileage,
+            },
+            "monthly_volume": {
+                "tool": "get_monthly_volume",
+                "args": {"months": 3},
+                "binds": {"cardio_type": "cardio_type", "window": "months", "unit": True},
+                "examples": ["Monthly training volume", "How much did they run per month?",
+                             "Distance by month"],
+                "format": _format_monthly_volume,
+            },
+        },
+    },
+    "frequency": {
+        "description": "how often how many runs per week sessions consistency",
+        "templates": {
+            "sessions_per_week": {
+                "tool": "get_cardio_frequency",
+                "args": {"weeks": 4},
+                "binds": {"window": "weeks"},
+                "examples": ["How many workouts per week?", "How often do they train?",
+                             "How many sessions do they do a week?", "How consistent is their training?"],
+                "format": _format_frequency,
+            },
+        },
+    },
+    "intensity": {
+        "description": "heart rate pace speed effort zones",
+        "templates": {
+            "heart_rate_trend": {
+                "tool": "get_heart_rate_trends",
+                "args": {"weeks_back": 12},
+                "binds": {"cardio_type": "cardio_type", "window": "weeks_back"},
+                "examples": ["What's their average heart rate?", "Is heart rate improving?",
+                             "Heart rate trends", "How high is their HR during runs?"],
+                "format": _format_trend("average heart rate", lambda v, unit: f"{v:.0f} bpm"),
+            },
+            "intensity_zones": {
+                "tool": "get_cardio_intensity_zones",
+                "args": {"weeks": 4},
+                "binds": {"cardio_type": "cardio_type", "window": "weeks"},
+                "examples": ["Heart rate zones", "How much time in each zone?",
+                             "How hard are they training?", "Training intensity distribution"],
+                "format": _format_intensity_zones,
+            },
+        },
+    },
+    "progression": {
+        "description": "improvement over time getting faster better PRs",
+        "templates": {
+            "pace_trend": {
+                "tool": "get_pace_progression",
+                "args": {"weeks_back": 12},
+                "binds": {"cardio_type": "cardio_type", "window": "weeks_back", "unit": True},
+                "examples": ["Are they getting faster?", "How is their pace trending?",
+                             "Pace improvement over time", "Is pace getting better?"],
+                "format": _format_trend("pace", _pace),
+            },
+            "distance_trend": {
+                "tool": "get_distance_trends",
+                "args": {"weeks_back": 12},
+                "binds": {"cardio_type": "cardio_type", "window": "weeks_back", "unit": True},
+                "examples": ["Are they running longer distances?", "Distance progression over time",
+                             "Is weekly distance increasing?"],
+                "format": _format_trend("weekly distance", _distance),
+            },
+        },
+    },
+    "performance": {
+        "description": "last workout fastest times elevation best",
+        "templates": {
+            "last_workout": {
+                "tool": "get_recent_cardio_sessions",
+                "args": {"limit": 1},
+                "binds": {"unit": True},
+                "examples": ["Show me the last workout", "How was the last session?",
+                             "What was their most recent session?", "Latest cardio session"],
+                "format": _format_last_workout,
+            },
+            "personal_bests": {
+                "tool": "get_cardio_personal_bests",
+                "args": {},
+                "binds": {"cardio_type": "cardio_type", "unit": True},
+                "examples": ["What are their personal bests?", "What's their fastest run?",
+                             "Show me their PRs", "Longest run ever"],
+                "format": _format_personal_bests,
+            },
+        },
+    },
+    "distribution": {
+        "description": "cardio types equipment variety breakdown",
+        "templates": {
+            # The breakdown covers every type, so named types and "vs" are already answered
+            "cardio_type_breakdown": {
+                "tool": "get_cardio_type_distribution",
+                "args": {"weeks": 4},
+                "binds": {"cardio_type": True, "compare": True, "window": "weeks"},
+                "examples": ["What types of cardio do they do?", "Running vs cycling breakdown",
+                             "Cardio activity breakdown", "Do they prefer running or biking?"],
+                "format": _format_type_distribution,
+            },
+        },
+    },
+    "recovery": {
+        "description": "rest days time between sessions streaks",
+        "templates": {
+            "rest_days": {
+                "tool": "get_cardio_frequency",
+                "args": {"weeks": 4},
+                "binds": {"window": "weeks"},
+                "examples": ["How many rest days?", "Are they resting enough?",
+                             "Days off between workouts", "Recovery time between sessions"],
+                "format": _format_rest_days,
+            },
+        },
+    },
+}
+
+
+# ==========================================
+# SLOTS
+# ==========================================
+# Words naming a cardio type -> stored cardio_type (as in tools.filters.CARDIO_TYPE_ALIASES;
+# bare "row" is left out, it is usually "in a row")
+TYPE_WORDS = {
+    'run': 'Run', 'runs': 'Run', 'running': 'Run', 'ran': 'Run',
+    'jog': 'Run', 'jogs': 'Run', 'jogging': 'Run',
+    'ride': 'Ride', 'rides': 'Ride', 'riding': 'Ride', 'cycling': 'Ride', 'cycle': 'Ride',
+    'bike': 'Ride', 'bikes': 'Ride', 'biking': 'Ride',
+    'walk': 'Walk', 'walks': 'Walk', 'walking': 'Walk',
+    'hike': 'Hike', 'hikes': 'Hike', 'hiking': 'Hike',
+    'swim': 'Swim', 'swims': 'Swim', 'swimming': 'Swim',
+    'rowing': 'Row',
+}
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+}
+_NUMBER = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+
+# "6 weeks", "two months": a trailing window of N units
+TRAILING_WINDOW = re.compile(rf"\b{_NUMBER}\s+(day|week|month|year)s?\b")
+# "past week": a trailing window of one unit
+PAST_WINDOW = re.compile(r"\bpast\s+(day|week|month|year)\b")
+# "this month", "last week": calendar periods
+CALENDAR_WINDOW = re.compile(r"\b(this|current|last|previous)\s+(week|month|year)\b")
+CALENDAR_WORDS = re.compile(
+    r"\b(today|tonight|yesterday|weekend|since|"
+    r"jan(uary)?|feb(ruary)?|mar(ch)?|apr(il)?|may|june?|july?|aug(ust)?|sep(t(ember)?)?|oct(ober)?|"
+    r"nov(ember)?|dec(ember)?|mondays?|tuesdays?|wednesdays?|thursdays?|fridays?|saturdays?|sundays?|"
+    r"20\d\d)\b"
+)
+MILES = re.compile(r"\b(miles?|mi|mph)\b")
+KILOMETERS = re.compile(r"\b(km|kms|kilometers?|kilometres?|kph)\b")
+COMPARISON = re.compile(r"\b(compare[ds]?|comparing|comparison|vs|versus|than|relative to)\b")
+
+
+def extract_slots(question: str) -> Dict[str, Any]:
+    """
+    Modifiers in a question that change which tool call answers it.
+
+    Returns:
+        dict with cardio_types (set of stored types), window (None, or dict
+        with span, count and calendar), unit ('km', 'mi', 'both' or None)
+        and compare (bool)
+    """
+    text = question.lower()
+    types = {TYPE_WORDS[word] for word in re.findall(r"[a-z]+", text) if word in TYPE_WORDS}
+
+    windows = []
+    for count, span in TRAILING_WINDOW.findall(text):
+        count = int(count) if count.isdigit() else NUMBER_WORDS[count]
+        windows.append({"span": span, "count": count, "calendar": False})
+    for span in PAST_WINDOW.findall(text):
+        windows.append({"span": span, "count": 1, "calendar": False})
+    for which, span in CALENDAR_WINDOW.findall(TRAILING_WINDOW.sub("", text)):
+        # Only "this month" / "this year" have a calendar meaning a tool can take
+        current = which in ("this", "current")
+        windows.append({"span": span if current else None, "count": 1, "calendar": True})
+    if CALENDAR_WORDS.search(text):
+        windows.append({"span": None, "count": 1, "calendar": True})
+
+    if len(windows) > 1:
+        window = {"span": None, "count": 0, "calendar": True}    # Conflicting or compound windows
+    else:
+        window = windows[0] if windows else None
+
+    miles, kilometers = bool(MILES.search(text)), bool(KILOMETERS.search(text))
+    unit = 'both' if miles and kilometers else 'mi' if miles else 'km' if kilometers else None
+
+    return {
+        "cardio_types": types,
+        "window": window,
+        "unit": unit,
+        "compare": bool(COMPARISON.search(text)),
+    }
+
+
+def _window_value(arg: Optional[str], window: Dict[str, Any]) -> Optional[int]:
+    """A window as a value for a weeks / weeks_back / months argument, or None"""
+    span, count = window["span"], window["count"]
+    if arg is None or span is None or count < 1:
+        return None
+    if arg == "months":
+        if window["calendar"]:
+            return {"month": 1, "year": date.today().month}.get(span)
+        return {"month": count, "year": 12 * count}.get(span)
+    # Week-based arguments count trailing weeks from today
+    if window["calendar"]:
+        return None
+    if span == "day":
+        return count // 7 if count % 7 == 0 else None
+    return {"week": count, "month": round(count * 52 / 12), "year": 52 * count}[span]
+
+
+def bind_slots(template: Dict[str, Any], slots: Dict[str, Any]) -> Tuple[Dict[str, Any], str, List[str]]:
+    """
+    Bind extracted slots onto a template's tool arguments.
+
+    Returns:
+        (tool arguments, distance unit for the formatter, names of the
+        slots the template cannot express - non-empty means fall back)
+    """
+    binds = template.get("binds", {})
+    args = dict(template["args"])
+    unbound = []
+
+    types = slots["cardio_types"]
+    if types:
+        target = binds.get("cardio_type")
+        if isinstance(target, str) and len(types) == 1:
+            args[target] = next(iter(types))
+        elif target is not True:
+            unbound.append("cardio_type")
+
+    if slots["window"] is not None:
+        value = _window_value(binds.get("window"), slots["window"])
+        if value is None:
+            unbound.append("window")
+        else:
+            args[binds["window"]] = value
+
+    unit = slots["unit"] or 'km'
+    if slots["unit"] and (unit == 'both' or not binds.get("unit")):
+        unbound.append("unit")
+
+    if slots["compare"] and not binds.get("compare"):
+        unbound.append("compare")
+
+    return args, unit, unbound
+
+
+def bank_entries(bank: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """Store entries for a bank: category descriptions, then every example"""
+    entries = {f"category:{category}": spec["description"] for category, spec in bank.items()}
+    for category, spec in bank.items():
+        for name, template in spec["templates"].items():
+            for i, example in enumerate(template["examples"]):
+                entries[f"example:{category}/{name}/{i}"] = example
+    return entries
+
+
+class TemplateRouter:
+    """
+    Routes common questions straight to a tool + answer template.
+
+    Category and example embeddings come from the persistent store, with
+    category rows first and example rows after them (grouped by category).
+    Stage 1 scores the question against the category centroids; stage 2
+    scores only the winning category's example rows.
+    """
+
+    def __init__(
+        self,
+        encoder: Any,
+        bank: Optional[Dict[str, Dict[str, Any]]] = None,
+        template_threshold: float = TEMPLATE_THRESHOLD,
+        store: Optional[EmbeddingStore] = None,
+    ):
+        self.encoder = encoder
+        self.bank = bank or TEMPLATE_BANK
+        self.template_threshold = template_threshold
+
+        self.categories: List[str] = list(self.bank)
+        # Example rows map back to their (category, template); each
+        # category's examples are one contiguous range of rows
+        self.example_owners: List[tuple] = []
+        self.example_ranges: Dict[str, Tuple[int, int]] = {}
+        for category, spec in self.bank.items():
+            first = len(self.example_owners)
+            for name, template in spec["templates"].items():
+                self.example_owners.extend([(category, name)] * len(template["examples"]))
+            self.example_ranges[category] = (first, len(self.example_owners))
+
+        self.store = store or EmbeddingStore(STORE_NAME)
+        self.store.sync(bank_entries(self.bank), encoder)
+
+        # Stage 1 vectors: description and examples of each category, averaged
+        matrix = np.asarray(self.store.matrix, dtype=np.float32)
+        n_categories = len(self.categories)
+        self.example_matrix = matrix[n_categories:]
+        self.category_matrix = normalize(np.stack([
+            np.vstack([matrix[i:i + 1], self.example_matrix[slice(*self.example_ranges[category])]]).mean(axis=0)
+            for i, category in enumerate(self.categories)
+        ]))
+
+        # Coverage / latency counters
+        self._lock = threading.Lock()
+        self.counters = {"template": 0, "llm": 0, "route_time": 0.0}
+
+    def match(self, question: str) -> Dict[str, Any]:
+        """
+        Route a question: category, then template, then slot binding.
+
+        Returns:
+            dict with category, template, scores, the bound tool args and
+            unit, any unbound slots, and whether the template can answer
+            ("matched": confident and every slot bound)
+        """
+        started = time.perf_counter()
+        query = encode(self.encoder, [question])[0]
+
+        category_scores = self.category_matrix @ query
+        best_category = int(np.argmax(category_scores))
+        category = self.categories[best_category]
+
+        first, last = self.example_ranges[category]
+        example_scores = self.example_matrix[first:last] @ query
+        best_example = int(np.argmax(example_scores))
+        template = self.example_owners[first + best_example][1]
+        confidence = float(example_scores[best_example])
+
+        args, unit, unbound = bind_slots(self.get_template(category, template), extract_slots(question))
+        return {
+            "matched": confidence >= self.template_threshold and not unbound,
+            "category": category,
+            "category_score": round(float(category_scores[best_category]), 4),
+            "template": template,
+            "confidence": round(confidence, 4),
+            "args": args,
+            "unit": unit,
+            "unbound": unbound,
+            "route_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def get_template(self, category: str, template: str) -> Dict[str, Any]:
+        """Template spec by category and name"""
+        return self.bank[category]["templates"][template]
+
+    def record(self, path: str, seconds: float) -> None:
+        """Count which path served a request"""
+        with self._lock:
+            self.counters[path] += 1
+            self.counters["route_time"] += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Coverage and average routing latency"""
+        with self._lock:
+            total = self.counters["template"] + self.counters["llm"]
+            return {
+                "requests": total,
+                "template": self.counters["template"],
+                "llm": self.counters["llm"],
+                "coverage": (self.counters["template"] / total) if total else 0.0,
+                "avg_route_ms": (self.counters["route_time"] / total * 1000) if total else 0.0,
+            }
+
+
+_router: Optional[TemplateRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_template_router() -> Optional[TemplateRouter]:
+    """Get the process-wide router, or None if disabled or no encoder is available"""
+    global _router
+    settings = get_settings()
+    if not settings.template_router_enabled:
+        return None
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                encoder = get_encoder()
+                if encoder is None:
+                    return None
+                _router = TemplateRouter(encoder, template_threshold=settings.template_router_threshold)
+    return _router
+
+
+def main() -> None:
+    """Build or refresh the template bank embedding store"""
+    encoder = get_encoder()
+    if encoder is None:
+        raise SystemExit("sentence-transformers is required to build the embedding store")
+    EmbeddingStore(STORE_NAME).sync(bank_entries(TEMPLATE_BANK), encoder)
+
+
+if __name__ == "__main__":
+    main()
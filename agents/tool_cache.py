@@ -0,0 +1,153 @@
+# AI Server - agents/tool_cache.py
+
+"""
+    Memoized tool results for the CardioAgent tool registry.
+
+    Each wrapped tool call is keyed on the tool name, its arguments bound to
+    the signature (so defaults and argument order don't matter), today's date
+    (tool windows are relative to today) and the data version of the client
+    database(s) it reads. Results live in a byte-budgeted LRU shared across
+    conversations; identical calls that arrive while one is running wait for
+    it instead of querying again, for at most the tool timeout.
+
+    Cached results are shared objects: callers must treat them as read-only.
+"""
+
+import functools
+import inspect
+import json
+import threading
+from datetime import date
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from config import get_settings
+from core.cache import LRUCache
+from tools.db import data_version
+
+
+class _InFlight:
+    """One running call that identical concurrent calls wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ToolResultCache:
+    """LRU of tool results with single-flight execution and per-tool counters"""
+
+    def __init__(self, max_bytes: int, ttl_seconds: Optional[float] = None, wait_timeout: Optional[float] = None):
+        self.cache = LRUCache(max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+        # Longest a caller waits on an identical in-flight call; a hung owner
+        # must not park every follower's executor thread with it
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, _InFlight] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, tool_name: str, outcome: str) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(
+                tool_name, {"hits": 0, "misses": 0, "shared": 0, "wait_timeouts": 0}
+            )
+            counters[outcome] += 1
+
+    @staticmethod
+    def _version(arguments: Dict[str, Any]) -> str:
+        """Data version of the database(s) a call can read"""
+        # Tools like get_cardio_session_details search every client without one
+        return data_version(arguments.get("client_id"))
+
+    def key(self, tool_name: str, signature: inspect.Signature, args: tuple, kwargs: Dict[str, Any]) -> Hashable:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        canonical = json.dumps(arguments, sort_keys=True, default=str)
+        return (tool_name, canonical, date.today().isoformat(), self._version(arguments))
+
+    def call(self, tool_name: str, tool_func: Callable, key: Hashable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        """Cached result for key, running tool_func at most once per key at a time"""
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count(tool_name, "hits")
+            return cached
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._in_flight[key] = _InFlight()
+
+        if not owner:
+            self._count(tool_name, "shared")
+            if not flight.done.wait(self.wait_timeout):
+                self._count(tool_name, "wait_timeouts")
+                raise TimeoutError(f"{tool_name}: identical call still running after {self.wait_timeout}s")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        self._count(tool_name, "misses")
+        try:
+            flight.result = tool_func(*args, **kwargs)
+            # Errors such as "session not found" may resolve once data lands
+            if not (isinstance(flight.result, dict) and 'error' in flight.result):
+                self.cache.set(key, flight.result)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    def wrap(self, tool_name: str, tool_func: Callable) -> Callable:
+        """Memoized version of one tool, keeping its signature"""
+        signature = inspect.signature(tool_func)
+
+        @functools.wraps(tool_func)
+        def cached_tool(*args, **kwargs):
+            return self.call(tool_name, tool_func, self.key(tool_name, signature, args, kwargs), args, kwargs)
+
+        return cached_tool
+
+    def wrap_registry(self, registry: Dict[str, Callable]) -> Dict[str, Callable]:
+        return {name: self.wrap(name, func) for name, func in registry.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        """Overall cache counters plus hit ratio per tool (shared calls count as hits)"""
+        with self._lock:
+            per_tool = {name: dict(c) for name, c in self._counters.items()}
+        for counters in per_tool.values():
+            calls = counters["hits"] + counters["misses"] + counters["shared"]
+            counters["hit_ratio"] = ((counters["hits"] + counters["shared"]) / calls) if calls else 0.0
+        return {**self.cache.stats(), "tools": per_tool}
+
+
+_tool_cache: Optional[ToolResultCache] = None
+_tool_cache_lock = threading.Lock()
+
+
+def get_tool_cache() -> Optional[ToolResultCache]:
+    """Get the process-wide tool result cache, or None if disabled"""
+    global _tool_cache
+    settings = get_settings()
+    if not settings.tool_cache_enabled:
+        return None
+    if _tool_cache is None:
+        with _tool_cache_lock:
+            if _tool_cache is None:
+                _tool_cache = ToolResultCache(
+                    max_bytes=settings.tool_cache_max_bytes,
+                    ttl_seconds=settings.tool_cache_ttl_seconds,
+                    wait_timeout=settings.tool_timeout_seconds,
+                )
+    return _tool_cache
+
+
+def memoize_tools(registry: Dict[str, Callable]) -> Dict[str, Callable]:
+    """Wrap a tool registry with the shared cache (unchanged if caching is disabled)"""
+    cache = get_tool_cache()
+    return cache.wrap_registry(registry) if cache is not None else registry
@@ -0,0 +1,364 @@
+# AI Server - benchmarks/agent_benchmark.py
+
+"""
+    Offline throughput and latency benchmark for CardioAgent.
+
+    The OpenAI client is replaced by ScriptedChatAPI, a local stand-in for
+    chat.completions.create() that replays recorded assistant turns instead
+    of calling the network. Everything else is the real agent: prompt
+    assembly, the tool loop, the tools on the SQLite files, compaction and
+    metrics.
+
+    The corpus is a JSONL file with one request per line:
+
+        {"request_id": "bench-001", "question": "...", "client_id": 1,
+         "responses": [
+             {"tool_calls": [{"name": "get_weekly_mileage", "arguments": {"weeks": 8}}]},
+             {"content": "Weekly mileage is ..."}
+         ]}
+
+    `responses` are the assistant turns in order, as the API returned them;
+    a turn is found from the question and the assistant turns already in the
+    conversation, so concurrent requests never interfere. Each call sleeps
+    for the configured model latency (plus seeded jitter), which is time the
+    event loop is free to serve other requests, as with the real API.
+
+    The corpus is replayed at the given concurrency and the report has
+    latency percentiles, requests per second, iterations per question, LLM
+    vs tool time (from AgentOutput.metadata["metrics"]) and peak memory.
+    The agent's per-request INFO logs are off during the run (set
+    LOG_LEVEL=INFO to see them); without network access token counts use
+    the estimate in core.agents.tokens.
+
+    Usage:
+        python -m benchmarks.agent_benchmark
+        python -m benchmarks.agent_benchmark --requests 500 --concurrency 50 --llm-latency-ms 400
+        python -m benchmarks.agent_benchmark --mode stream --json
+        TOOL_CACHE_ENABLED=false python -m benchmarks.agent_benchmark   # every tool call hits SQLite
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent_corpus.jsonl")
+
+QUESTION_MARKER = "Question: "     # CardioAgent._initial_messages puts the question after this
+
+
+def load_corpus(path: str = DEFAULT_CORPUS) -> List[Dict[str, Any]]:
+    """Benchmark requests from a JSONL file (blank lines skipped)"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+# ==========================================
+# SCRIPTED CHAT API
+# ==========================================
+
+def _estimate_tokens(text: str) -> int:
+    """~4 characters per token; the benchmark must not depend on a tokenizer download"""
+    return max(1, len(text) // 4)
+
+
+class ScriptedChatAPI:
+    """
+    Deterministic stand-in for AsyncOpenAI's chat.completions.
+
+    Assign an instance to agent.client. Every create() call sleeps for
+    latency_ms (+/- jitter_ms, from a seeded RNG) and returns the recorded
+    turn for the conversation's question. Streaming calls yield the turn in
+    chunks stream_chunk_ms apart, with a usage chunk when include_usage is
+    set. Legacy function-calling requests get one call per turn. Questions
+    without a script get a fixed text answer.
+    """
+
+    FALLBACK_ANSWER = "No recorded response for this question."
+
+    def __init__(
+        self,
+        corpus: List[Dict[str, Any]],
+        latency_ms: float = 300.0,
+        jitter_ms: float = 0.0,
+        stream_chunk_ms: float = 5.0,
+        seed: int = 0,
+    ):
+        self.scripts = {record["question"]: record["responses"] for record in corpus}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stream_chunk_ms = stream_chunk_ms
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def _turn(self, messages: List[Dict[str, Any]], legacy: bool) -> Dict[str, Any]:
+        """The recorded turn that follows the conversation so far"""
+        last_user = max(i for i, m in enumerate(messages) if m["role"] == "user")
+        question = messages[last_user]["content"].split(QUESTION_MARKER, 1)[-1]
+        turns = self.scripts.get(question) or [{"content": self.FALLBACK_ANSWER}]
+        if legacy:
+            # One function call per round trip
+            turns = [
+                {"tool_calls": [call]} for turn in turns for call in turn.get("tool_calls", [])
+            ] + [turn for turn in turns if "tool_calls" not in turn]
+        answered = sum(1 for m in messages[last_user + 1:] if m["role"] == "assistant")
+        return turns[min(answered, len(turns) - 1)]
+
+    def _usage(self, messages: List[Dict[str, Any]], turn: Dict[str, Any]) -> SimpleNamespace:
+        prompt = _estimate_tokens(json.dumps(messages, default=str))
+        completion = _estimate_tokens(json.dumps(turn))
+        return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion, total_tokens=prompt + completion)
+
+    @staticmethod
+    def _calls(turn: Dict[str, Any], call_base: int) -> List[SimpleNamespace]:
+        calls = []
+        for i, call in enumerate(turn.get("tool_calls", [])):
+            arguments = call["arguments"]
+            if not isinstance(arguments, str):
+                arguments = json.dumps(arguments)
+            calls.append(SimpleNamespace(
+                id=f"call_{call_base}_{i}",
+                type="function",
+                function=SimpleNamespace(name=call["name"], arguments=arguments),
+            ))
+        return calls
+
+    async def create(self, *, messages: List[Dict[str, Any]], stream: bool = False, **kwargs) -> Any:
+        self.calls += 1
+        call_base = self.calls
+        legacy = "functions" in kwargs
+        turn = self._turn(messages, legacy)
+        delay = self.latency_ms + (self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        await asyncio.sleep(max(delay, 0.0) / 1000)
+
+        usage = self._usage(messages, turn)
+        calls = self._calls(turn, call_base)
+        if stream:
+            include_usage = bool((kwargs.get("stream_options") or {}).get("include_usage"))
+            return self._stream(turn.get("content"), calls, usage if include_usage else None)
+
+        message = SimpleNamespace(
+            role="assistant",
+            content=turn.get("content"),
+            tool_calls=(calls or None) if not legacy else None,
+            function_call=calls[0].function if legacy and calls else None,
+        )
+        return SimpleNamespace(
+            choices=[SimpleNamespace(index=0, message=message, finish_reason="tool_calls" if calls else "stop")],
+            usage=usage,
+        )
+
+    async def _stream(
+        self,
+        content: Optional[str],
+        calls: List[SimpleNamespace],
+        usage: Optional[SimpleNamespace],
+    ) -> AsyncIterator[SimpleNamespace]:
+        def chunk(content: Optional[str] = None, tool_calls: Optional[list] = None) -> SimpleNamespace:
+            delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+            return SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)], usage=None)
+
+        for word in content.split(" ") if content else ():
+            await asyncio.sleep(self.stream_chunk_ms / 1000)
+            yield chunk(content=word + " ")
+        for index, call in enumerate(calls):
+            await asyncio.sleep(self.stream_chunk_ms / 1000)
+            yield chunk(tool_calls=[SimpleNamespace(index=index, id=call.id, function=call.function)])
+        if usage is not None:
+            yield SimpleNamespace(choices=[], usage=usage)
+
+
+# ==========================================
+# RUNNER
+# ==========================================
+
+def _request_data(record: Dict[str, Any], use_templates: bool, use_cache: bool) -> Dict[str, Any]:
+    return {
+        "question": record["question"],
+        "client_id": record["client_id"],
+        "conversation_history": "[]",
+        "use_templates": use_templates,
+        "use_cache": use_cache,
+        "parallel_tools": record.get("parallel_tools", True),
+    }
+
+
+async def _run_one(agent, data: Dict[str, Any], mode: str) -> Dict[str, Any]:
+    """Run one request; returns its latency, time to first token and output"""
+    from core.agents.models import AgentInput
+
+    started = time.perf_counter()
+    first_token = None
+    if mode == "stream":
+        output = None
+        async for event in agent.stream(AgentInput(data=data)):
+            if event["type"] == "token" and first_token is None:
+                first_token = time.perf_counter() - started
+            elif event["type"] == "final":
+                output = event["output"]
+    else:
+        output = (await agent.run(AgentInput(data=data))).model_dump()
+    return {"latency": time.perf_counter() - started, "first_token": first_token, "output": output}
+
+
+async def run_benchmark(
+    agent,
+    corpus: List[Dict[str, Any]],
+    requests: Optional[int] = None,
+    concurrency: int = 10,
+    mode: str = "run",
+    use_templates: bool = False,
+    use_cache: bool = False,
+) -> Dict[str, Any]:
+    """
+    Replay the corpus (cycled to `requests` requests) against agent with at
+    most `concurrency` requests in flight.
+
+    Returns:
+        Report dict (latencies in ms)
+    """
+    requests = requests or len(corpus)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(record):
+        async with semaphore:
+            return await _run_one(agent, _request_data(record, use_templates, use_cache), mode)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(bounded(corpus[i % len(corpus)]) for i in range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies = [r["latency"] * 1000 for r in results]
+    first_tokens = [r["first_token"] * 1000 for r in results if r["first_token"] is not None]
+    outputs = [r["output"] for r in results]
+    iterations = [o["data"].get("iterations", 0) for o in outputs]
+    metrics = [o.get("metadata", {}).get("metrics") or {} for o in outputs]
+    llm_ms = [m.get("llm", {}).get("latency_ms", 0.0) for m in metrics]
+    tool_ms = [m.get("tools", {}).get("latency_ms", 0.0) for m in metrics]
+    sql_ms = [m.get("tools", {}).get("sql_ms", 0.0) for m in metrics]
+
+    report = {
+        "mode": mode,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(1 for o in outputs if not o["success"]),
+        "wall_s": round(wall, 3),
+        "requests_per_s": round(requests / wall, 2) if wall else None,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50), 2),
+            "p95": round(_percentile(latencies, 95), 2),
+            "p99": round(_percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2) if latencies else 0.0,
+        },
+        "iterations": {
+            "mean": round(float(np.mean(iterations)), 2) if iterations else 0.0,
+            "max": max(iterations) if iterations else 0,
+        },
+        "per_request_ms": {
+            "llm": round(float(np.mean(llm_ms)), 2) if llm_ms else 0.0,
+            "tools": round(float(np.mean(tool_ms)), 2) if tool_ms else 0.0,
+            "sql": round(float(np.mean(sql_ms)), 3) if sql_ms else 0.0,
+        },
+    }
+    if first_tokens:
+        report["first_token_ms"] = {
+            "p50": round(_percentile(first_tokens, 50), 2),
+            "p95": round(_percentile(first_tokens, 95), 2),
+        }
+    return report
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency_ms"]
+    per_request = report["per_request_ms"]
+    print(f"\nmode={report['mode']} requests={report['requests']} concurrency={report['concurrency']} "
+          f"errors={report['errors']}")
+    print(f"throughput   {report['requests_per_s']:>10} req/s   (wall {report['wall_s']} s)")
+    print(f"latency ms   p50 {latency['p50']:>9}   p95 {latency['p95']:>9}   p99 {latency['p99']:>9}   "
+          f"max {latency['max']:>9}")
+    if "first_token_ms" in report:
+        print(f"first token  p50 {report['first_token_ms']['p50']:>9}   p95 {report['first_token_ms']['p95']:>9}")
+    print(f"iterations   mean {report['iterations']['mean']:>8}   max {report['iterations']['max']:>9}")
+    print(f"per request  llm {per_request['llm']:>9} ms   tools {per_request['tools']:>9} ms   "
+          f"sql {per_request['sql']:>9} ms")
+    print(f"memory       peak rss {report['peak_rss_mb']} MB"
+          + (f"   python heap peak {report['heap_peak_mb']} MB" if "heap_peak_mb" in report else ""))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline CardioAgent benchmark")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL of benchmark requests")
+    parser.add_argument("--requests", type=int, help="Total requests (default: one pass over the corpus)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--mode", choices=("run", "stream"), default="run")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Simulated latency per model call")
+    parser.add_argument("--llm-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--stream-chunk-ms", type=float, default=5.0, help="Delay between streamed chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed passes over the corpus first")
+    parser.add_argument("--templates", action="store_true",
+                        help="Let the template router answer (needs sentence-transformers)")
+    parser.add_argument("--cache", action="store_true", help="Use the response cache")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also track the Python heap peak (slower)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    # No network is used; Settings only needs a value
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    # Keep per-request INFO records out of the report
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from agents.cardio_chat_agent import CardioAgent
+
+    corpus = load_corpus(args.corpus)
+    agent = CardioAgent()
+    agent.client = ScriptedChatAPI(
+        corpus,
+        latency_ms=args.llm_latency_ms,
+        jitter_ms=args.llm_jitter_ms,
+        stream_chunk_ms=args.stream_chunk_ms,
+        seed=args.seed,
+    )
+
+    async def run() -> Dict[str, Any]:
+        for _ in range(args.warmup):
+            await run_benchmark(agent, corpus, concurrency=args.concurrency, mode=args.mode,
+                                use_templates=args.templates, use_cache=args.cache)
+        if args.tracemalloc:
+            tracemalloc.start()
+        report = await run_benchmark(agent, corpus, requests=args.requests, concurrency=args.concurrency,
+                                     mode=args.mode, use_templates=args.templates, use_cache=args.cache)
+        if args.tracemalloc:
+            report["heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+            tracemalloc.stop()
+        report["peak_rss_mb"] = peak_rss_mb()
+        return report
+
+    report = asyncio.run(run())
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
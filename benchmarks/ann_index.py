@@ -0,0 +1,171 @@
+# AI Server - benchmarks/ann_index.py
+
+"""
+    Recall vs latency of the nearest-neighbour index types on a labelled
+    prompt set.
+
+    Every index is built over the same bank embeddings and queried with the
+    same held-out prompts. Recall@k is measured against exact flat search;
+    accuracy is the k-NN majority vote against the prompt's label.
+
+    The labelled set is a JSONL file of {"prompt": ..., "category": ...}
+    records; every `--holdout`-th record becomes a query and the rest form
+    the bank. Without a file, the bank is PROMPT_CATEGORIES and the queries
+    are the labelled test prompts from notebooks/embedding_model.ipynb.
+
+    Usage:
+        python -m benchmarks.ann_index
+        python -m benchmarks.ann_index --labelled mined_prompts.jsonl --k 5
+"""
+
+import argparse
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agents.prompt_classifier import PROMPT_CATEGORIES
+from core.embeddings import encode, get_encoder
+from core.vector_index import INDEX_TYPES, make_index
+
+# Test prompts from notebooks/embedding_model.ipynb with their expected category
+NOTEBOOK_QUERIES = [
+    ("Show me how many times they ran each week", "volume_consistency"),
+    ("Are they getting faster?", "pace_trends"),
+    ("What's their average heart rate?", "heart_rate_analysis"),
+    ("Do they prefer running or biking?", "workout_type"),
+    ("How many miles per week?", "distance_progression"),
+    ("How many calories do i burn per mile?", "performance_metrics"),
+]
+
+
+def load_labelled(path: str, holdout: int) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """Split a labelled JSONL file into (bank, queries)"""
+    bank, queries = [], []
+    with open(path, encoding="utf-8") as f:
+        for i, line in enumerate(line for line in f if line.strip()):
+            record = json.loads(line)
+            pair = (record["prompt"], record["category"])
+            (queries if i % holdout == 0 else bank).append(pair)
+    return bank, queries
+
+
+def _vote(labels: List[str]) -> str:
+    return Counter(labels).most_common(1)[0][0]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+def run_benchmark(
+    encoder: Any,
+    bank: List[Tuple[str, str]],
+    queries: List[Tuple[str, str]],
+    kinds: Optional[List[str]] = None,
+    k: int = 3,
+    index_params: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Build each index type over the bank and measure recall, accuracy and
+    search latency on the queries.
+
+    Returns:
+        One result dict per index type; types whose dependencies are
+        missing report the error instead
+    """
+    kinds = kinds or list(INDEX_TYPES)
+    index_params = index_params or {}
+    bank_vectors = encode(encoder, [text for text, _ in bank])
+    query_vectors = encode(encoder, [text for text, _ in queries])
+    bank_labels = [label for _, label in bank]
+    query_labels = [label for _, label in queries]
+    k = min(k, len(bank))
+
+    exact_ids = make_index("flat").build(bank_vectors).search(query_vectors, k)[1]
+
+    results = []
+    for kind in kinds:
+        try:
+            started = time.perf_counter()
+            index = make_index(kind, **index_params.get(kind, {})).build(bank_vectors)
+            build_s = time.perf_counter() - started
+        except ImportError as e:
+            results.append({'index': kind, 'error': str(e)})
+            continue
+
+        # Single-query latency, as the router/classifier see it online
+        latencies = []
+        for vector in query_vectors:
+            started = time.perf_counter()
+            index.search(vector[None, :], k)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        # Whole-batch search, as the offline backfill sees it
+        started = time.perf_counter()
+        _, ids = index.search(query_vectors, k)
+        batch_s = time.perf_counter() - started
+
+        recall = np.mean([
+            len(set(found[found >= 0]) & set(exact)) / k for found, exact in zip(ids, exact_ids)
+        ])
+        correct = sum(
+            _vote([bank_labels[j] for j in found if j >= 0] or [""]) == label
+            for found, label in zip(ids, query_labels)
+        )
+        results.append({
+            'index': kind,
+            'params': index.params,
+            'bank_size': len(bank),
+            'queries': len(queries),
+            'build_ms': round(build_s * 1000, 2),
+            f'recall_at_{k}': round(float(recall), 4),
+            'accuracy': round(correct / len(queries), 4) if queries else None,
+            'p50_ms': round(_percentile(latencies, 50), 4),
+            'p95_ms': round(_percentile(latencies, 95), 4),
+            'batch_qps': round(len(queries) / batch_s, 1) if batch_s else None,
+        })
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"\n{'index':<6} {'recall':>8} {'accuracy':>9} {'p50 ms':>9} {'p95 ms':>9} {'batch qps':>11} {'build ms':>10}")
+    for r in results:
+        if 'error' in r:
+            print(f"{r['index']:<6} skipped: {r['error']}")
+            continue
+        recall = next(v for key, v in r.items() if key.startswith('recall_at_'))
+        print(f"{r['index']:<6} {recall:>8.4f} {r['accuracy']:>9.4f} {r['p50_ms']:>9.4f} "
+              f"{r['p95_ms']:>9.4f} {r['batch_qps']:>11} {r['build_ms']:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ANN index recall vs latency")
+    parser.add_argument("--labelled", help="JSONL of {prompt, category} records")
+    parser.add_argument("--holdout", type=int, default=5, help="Every Nth labelled record is a query")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--index", action="append", choices=INDEX_TYPES, help="Index types (default: all)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    encoder = get_encoder()
+    if encoder is None:
+        raise SystemExit("sentence-transformers is required for the benchmark")
+
+    if args.labelled:
+        bank, queries = load_labelled(args.labelled, args.holdout)
+    else:
+        bank = [(text, category) for category, texts in PROMPT_CATEGORIES.items() for text in texts]
+        queries = NOTEBOOK_QUERIES
+
+    results = run_benchmark(encoder, bank, queries, kinds=args.index, k=args.k)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+# AI Server - benchmarks/synthetic_data.py
+
+"""
+    Synthetic client databases at production scale.
+
+    The shipped databases hold a few dozen sessions; real clients have years
+    of history and hundreds of thousands of 10-second buckets. generate()
+    writes a database with the same cardio and aggregated_cardio_session_data
+    schemas at any size:
+
+        sessions             - spread evenly back from today at sessions_per_week
+        buckets_per_session  - mean session length in 10-second buckets (+/- 50%)
+        type_mix             - cardio_type -> share of sessions
+
+    Units follow the shipped files for clients 1 and 2 (meters, seconds,
+    avg_pace in min/mile), and bucket coordinates advance with the bucket's
+    speed, so the rollup and unit-detection steps see realistic data. Output
+    is deterministic for a given seed.
+
+    Usage:
+        python -m benchmarks.synthetic_data /tmp/client_9_cardio.db --sessions 5000
+        python -m benchmarks.synthetic_data big.db --sessions 2000 --buckets 360 --mix Run=0.5,Ride=0.3,Walk=0.2
+"""
+
+import argparse
+import os
+import sqlite3
+from datetime import date, datetime, time, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+CARDIO_DDL = """
+CREATE TABLE "cardio" (
+"id" INTEGER,
+  "cardio_name" TEXT,
+  "cardio_type" TEXT,
+  "duration" INTEGER,
+  "distance" REAL,
+  "avg_pace" REAL,
+  "calories_burned" INTEGER,
+  "notes" TEXT,
+  "created_at" TIMESTAMP,
+  "updated_at" TIMESTAMP,
+  "client_id" INTEGER,
+  "avg_speed" REAL,
+  "avg_heart_rate" REAL,
+  "cardio_date" DATE,
+  "cardio_end_time" TIMESTAMP,
+  "cardio_start_time" TIMESTAMP,
+  "avg_altitude" REAL,
+  "elevation_gain" REAL,
+  "max_heart_rate" REAL,
+  "max_pace" REAL,
+  "max_speed" REAL,
+  "prebuilt" INTEGER,
+  "trainer_id" REAL,
+  "summary" TEXT,
+  "plan_id" REAL,
+  "rating" REAL
+)
+"""
+
+BUCKETS_DDL = """
+CREATE TABLE "aggregated_cardio_session_data" (
+"id" INTEGER,
+  "bucket_start" TIMESTAMP,
+  "avg_heart_rate" REAL,
+  "avg_pace" REAL,
+  "avg_speed" REAL,
+  "avg_altitude" REAL,
+  "count_points" INTEGER,
+  "cardio_id" INTEGER,
+  "avg_latitude" REAL,
+  "avg_longitude" REAL
+)
+"""
+
+BUCKET_SECONDS = 10
+METERS_PER_MILE = 1609.344
+METERS_PER_DEGREE = 111_320.0
+HOME = (37.8659, -122.3021)     # Where every route starts
+
+DEFAULT_TYPE_MIX = {'Run': 0.6, 'Ride': 0.25, 'Walk': 0.15}
+
+# cardio_type -> (mean speed m/s, sd, calories per km)
+TYPE_PROFILES = {
+    'Run': (3.0, 0.35, 65.0),
+    'Ride': (7.0, 1.2, 30.0),
+    'Walk': (1.5, 0.15, 50.0),
+    'Hike': (1.2, 0.2, 70.0),
+    'Swim': (0.8, 0.1, 250.0),
+    'Row': (3.5, 0.4, 55.0),
+}
+
+BATCH_SESSIONS = 500    # Sessions generated and inserted per batch
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'Run=0.6,Ride=0.4' -> {'Run': 0.6, 'Ride': 0.4}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, share = part.partition('=')
+        mix[name.strip()] = float(share)
+    return mix
+
+
+def _timestamps(seconds: np.ndarray) -> np.ndarray:
+    """Epoch seconds -> '2025-07-26 01:55:09+00:00' strings, as stored in the shipped files"""
+    iso = np.datetime_as_string(seconds.astype('datetime64[s]'), unit='s')
+    return np.char.add(np.char.replace(iso, 'T', ' '), '+00:00')
+
+
+def _sessions(rng: np.random.Generator, count: int, sessions_per_week: float, type_mix: Dict[str, float]) -> Dict[str, np.ndarray]:
+    """Session-level columns for `count` sessions, oldest first, the last one today"""
+    span_days = int(np.ceil(count / sessions_per_week * 7))
+    today = datetime.combine(date.today(), time(), tzinfo=timezone.utc).timestamp()
+    days = rng.integers(0, span_days + 1, count)
+    starts = np.sort(today - days * 86400.0 + rng.integers(5 * 3600, 20 * 3600, count))
+
+    types = np.array(list(type_mix))
+    shares = np.array(list(type_mix.values()), dtype=np.float64)
+    cardio_type = rng.choice(types, size=count, p=shares / shares.sum())
+    return {'start': starts, 'cardio_type': cardio_type}
+
+
+def _write_batch(
+    conn: sqlite3.Connection,
+    rng: np.random.Generator,
+    sessions: Dict[str, np.ndarray],
+    first_id: int,
+    first_bucket_id: int,
+    buckets_per_session: int,
+    client_id: int,
+) -> int:
+    """Insert one batch of sessions and their buckets; returns the buckets written"""
+    count = len(sessions['start'])
+    profiles = np.array([TYPE_PROFILES.get(t, TYPE_PROFILES['Run']) for t in sessions['cardio_type']])
+    speed = np.clip(rng.normal(profiles[:, 0], profiles[:, 1]), 0.3, None)               # m/s
+    buckets = np.maximum((buckets_per_session * rng.uniform(0.5, 1.5, count)).astype(np.int64), 2)
+    duration = buckets * BUCKET_SECONDS
+    avg_hr = rng.uniform(115, 165, count)
+
+    # Per-bucket series, all sessions of the batch concatenated
+    session_of = np.repeat(np.arange(count), buckets)
+    first_bucket = np.cumsum(buckets) - buckets
+    offsets = np.arange(len(session_of)) - first_bucket[session_of]
+
+    def per_session_cumsum(values: np.ndarray) -> np.ndarray:
+        total = np.cumsum(values)
+        return total - (total[first_bucket] - values[first_bucket])[session_of]
+
+    bucket_speed = np.clip(speed[session_of] * rng.normal(1.0, 0.06, len(session_of)), 0.2, None)
+    bucket_hr = avg_hr[session_of] + offsets * 0.01 + rng.normal(0, 4, len(session_of))
+    altitude = 20 + per_session_cumsum(rng.normal(0, 0.8, len(session_of)))
+    heading = rng.uniform(0, 2 * np.pi, count)[session_of] + per_session_cumsum(rng.normal(0, 0.05, len(session_of)))
+    step = bucket_speed * BUCKET_SECONDS
+    latitude = HOME[0] + per_session_cumsum(step * np.cos(heading)) / METERS_PER_DEGREE
+    longitude = HOME[1] + per_session_cumsum(step * np.sin(heading)) / (METERS_PER_DEGREE * np.cos(np.radians(HOME[0])))
+
+    # Session totals from the buckets, so the two tables agree
+    rise = np.diff(altitude, prepend=altitude[0])
+    rise[first_bucket] = 0.0
+    distance = np.bincount(session_of, weights=step, minlength=count)
+    gain = np.bincount(session_of, weights=np.clip(rise, 0, None), minlength=count)
+    max_hr = np.maximum.reduceat(bucket_hr, first_bucket)
+    max_speed = np.maximum.reduceat(bucket_speed, first_bucket)
+    mean_altitude = np.bincount(session_of, weights=altitude, minlength=count) / buckets
+    pace_min_per_mile = (duration / 60.0) / (distance / METERS_PER_MILE)
+
+    start = sessions['start']
+    start_text = _timestamps(start)
+    end_text = _timestamps(start + duration)
+    ids = np.arange(first_id, first_id + count)
+    conn.executemany(
+        "INSERT INTO cardio (id, cardio_name, cardio_type, duration, distance, avg_pace, calories_burned, "
+        "notes, created_at, updated_at, client_id, avg_speed, avg_heart_rate, cardio_date, cardio_end_time, "
+        "cardio_start_time, avg_altitude, elevation_gain, max_heart_rate, max_pace, max_speed, prebuilt) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+        zip(
+            ids.tolist(),
+            [f"{t} {d / 1000:.1f} km" for t, d in zip(sessions['cardio_type'], distance)],
+            sessions['cardio_type'].tolist(),
+            duration.tolist(),
+            np.round(distance, 1).tolist(),
+            np.round(pace_min_per_mile, 5).tolist(),
+            np.round(distance / 1000 * profiles[:, 2]).astype(np.int64).tolist(),
+            end_text.tolist(),
+            end_text.tolist(),
+            [client_id] * count,
+            np.round(speed * 3.6, 5).tolist(),
+            np.round(avg_hr, 2).tolist(),
+            [text[:10] for text in start_text.tolist()],
+            end_text.tolist(),
+            start_text.tolist(),
+            np.round(mean_altitude, 3).tolist(),
+            np.round(gain, 2).tolist(),
+            np.round(max_hr).tolist(),
+            np.round(METERS_PER_MILE / max_speed / 60, 3).tolist(),
+            np.round(max_speed * 3.6, 3).tolist(),
+        ),
+    )
+
+    bucket_count = len(session_of)
+    conn.executemany(
+        "INSERT INTO aggregated_cardio_session_data (id, bucket_start, avg_heart_rate, avg_pace, avg_speed, "
+        "avg_altitude, count_points, cardio_id, avg_latitude, avg_longitude) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        zip(
+            range(first_bucket_id, first_bucket_id + bucket_count),
+            _timestamps(start[session_of] + offsets * BUCKET_SECONDS).tolist(),
+            np.round(bucket_hr).tolist(),
+            np.round(METERS_PER_MILE / bucket_speed / 60, 3).tolist(),
+            np.round(bucket_speed * 3.6, 5).tolist(),
+            np.round(altitude, 3).tolist(),
+            [BUCKET_SECONDS] * bucket_count,
+            ids[session_of].tolist(),
+            np.round(latitude, 6).tolist(),
+            np.round(longitude, 6).tolist(),
+        ),
+    )
+    return bucket_count
+
+
+def generate(
+    db_path: str,
+    sessions: int,
+    buckets_per_session: int = 240,
+    type_mix: Optional[Dict[str, float]] = None,
+    sessions_per_week: float = 4.0,
+    client_id: int = 1,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Write a new database at db_path (replacing any file there).
+
+    Returns:
+        Report with the sessions and buckets written and the file size
+    """
+    type_mix = type_mix or DEFAULT_TYPE_MIX
+    rng = np.random.default_rng(seed)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    columns = _sessions(rng, sessions, sessions_per_week, type_mix)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(CARDIO_DDL)
+        conn.execute(BUCKETS_DDL)
+        buckets = 0
+        for first in range(0, sessions, BATCH_SESSIONS):
+            batch = {name: values[first:first + BATCH_SESSIONS] for name, values in columns.items()}
+            buckets += _write_batch(conn, rng, batch, first + 1, buckets + 1, buckets_per_session, client_id)
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        'db_path': db_path,
+        'sessions': sessions,
+        'buckets': buckets,
+        'first_date': str(columns['start'][0].astype('datetime64[s]'))[:10] if sessions else None,
+        'size_mb': round(os.path.getsize(db_path) / (1024 * 1024), 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Write a synthetic client cardio database")
+    parser.add_argument("db_path")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--buckets", type=int, default=240, help="Mean 10-second buckets per session")
+    parser.add_argument("--mix", type=parse_mix, help="cardio_type shares, e.g. Run=0.6,Ride=0.4")
+    parser.add_argument("--per-week", type=float, default=4.0, help="Sessions per week")
+    parser.add_argument("--client-id", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = generate(args.db_path, args.sessions, args.buckets, args.mix, args.per_week, args.client_id, args.seed)
+    print(f"[synthetic_data] {report['db_path']}: {report['sessions']} sessions since {report['first_date']}, "
+          f"{report['buckets']} buckets, {report['size_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# AI Server - benchmarks/tool_benchmark.py
+
+"""
+    Per-tool time and memory as client history grows.
+
+    For each scale (sessions per client) a synthetic database is generated
+    (benchmarks/synthetic_data.py), optionally prepared the way the served
+    files are (indexes, unit columns, session stream, rollups, pyramids,
+    volume aggregates), and every public function in tools/cardio_tools.py
+    is called against it:
+
+        cold_ms   - first call with the column caches cleared
+        warm_ms   - median of the following calls
+        peak_kib  - Python heap peak during a cold call (tracemalloc; SQLite's
+                    own page cache is not included)
+
+    The growth column is the log-log slope of time against sessions across
+    the scales: ~0 means the tool's cost does not depend on history length,
+    ~1 is linear, and anything well above 1 is flagged as superlinear. The
+    tool cache is bypassed; the functions are called directly.
+
+    Usage:
+        python -m benchmarks.tool_benchmark
+        python -m benchmarks.tool_benchmark --scales 500,2000,8000 --buckets 360 --prepare none
+        python -m benchmarks.tool_benchmark --window-weeks 520 --tool get_negative_splits --json
+"""
+
+import argparse
+import inspect
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic_data import generate, parse_mix
+from tools import analytics, units, volume_aggregates
+from tools.db import FilePerClientBackend, set_backend, write_connection
+from tools.migrations import INDEXES, _sample_args, _tool_functions
+from tools.session_pyramid import refresh_pyramid
+from tools.session_rollup import refresh_rollups
+from tools.session_stream import export_stream
+from tools.volume_aggregates import refresh_volume
+
+CLIENT_ID = 1
+SUPERLINEAR_GROWTH = 1.2      # Log-log slope above which a tool is flagged
+
+# Arguments that set a tool's window, overridden by --window-weeks
+WINDOW_ARGS = {'weeks': 1, 'weeks_back': 1, 'months': 12 / 52}
+
+
+def prepare(client_id: int, steps: str) -> None:
+    """Run the build steps the served databases get: 'none', 'indexes' or 'all'"""
+    if steps == "none":
+        return
+    with write_connection(client_id) as conn:
+        for ddl in INDEXES.values():
+            conn.execute(ddl)
+        conn.execute("ANALYZE")
+    if steps == "all":
+        units.normalize(client_id)
+        export_stream(client_id)
+        refresh_rollups(client_id)
+        refresh_pyramid(client_id)
+        refresh_volume(client_id)
+
+
+def _clear_caches() -> None:
+    """Drop the per-client column caches so the next call reads from SQLite"""
+    analytics._columns_cache.clear()
+    analytics._cohort_cache = (None, None)
+    units._column_sql_cache.clear()
+    volume_aggregates._fresh_cache.clear()
+
+
+def _tool_kwargs(func: Callable, sample: Dict[str, Any], window_weeks: Optional[int]) -> Dict[str, Any]:
+    kwargs = {}
+    for name in inspect.signature(func).parameters:
+        if window_weeks and name in WINDOW_ARGS:
+            kwargs[name] = max(1, round(window_weeks * WINDOW_ARGS[name]))
+        elif name in sample:
+            kwargs[name] = sample[name]
+    return kwargs
+
+
+def measure_tool(func: Callable, kwargs: Dict[str, Any], repeats: int) -> Dict[str, Any]:
+    """Cold and warm time and cold heap peak of one tool"""
+    _clear_caches()
+    started = time.perf_counter()
+    func(**kwargs)
+    cold = time.perf_counter() - started
+
+    warm = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func(**kwargs)
+        warm.append(time.perf_counter() - started)
+
+    _clear_caches()
+    tracemalloc.start()
+    try:
+        func(**kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'cold_ms': round(cold * 1000, 3),
+        'warm_ms': round(statistics.median(warm) * 1000, 3) if warm else None,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def benchmark_scale(
+    db_path: str,
+    repeats: int,
+    tools: Optional[List[str]] = None,
+    window_weeks: Optional[int] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Measure every tool (or the named ones) against one database"""
+    backend = FilePerClientBackend(db_map={CLIENT_ID: db_path})
+    previous = set_backend(backend)
+    try:
+        with backend.connection(CLIENT_ID) as conn:
+            sample = _sample_args(conn, CLIENT_ID)
+        results = {}
+        for name, func in _tool_functions().items():
+            if tools and name not in tools:
+                continue
+            try:
+                results[name] = measure_tool(func, _tool_kwargs(func, sample, window_weeks), repeats)
+            except Exception as e:
+                results[name] = {'error': str(e)}
+        return results
+    finally:
+        set_backend(previous)
+        backend.close()
+        _clear_caches()
+
+
+def growth(scales: List[int], times: List[Optional[float]]) -> Optional[float]:
+    """Least-squares slope of log(time) against log(sessions)"""
+    points = [(s, t) for s, t in zip(scales, times) if t]
+    if len(points) < 2:
+        return None
+    x = np.log([s for s, _ in points])
+    y = np.log([t for _, t in points])
+    return round(float(np.polyfit(x, y, 1)[0]), 2)
+
+
+def run(
+    scales: List[int],
+    buckets: int = 240,
+    type_mix: Optional[Dict[str, float]] = None,
+    steps: str = "all",
+    repeats: int = 5,
+    tools: Optional[List[str]] = None,
+    window_weeks: Optional[int] = None,
+    data_dir: Optional[str] = None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Generate, prepare and benchmark each scale.
+
+    Databases go to data_dir (kept, and reused by later runs with the same
+    parameters) or to a temporary directory that is removed afterwards.
+    """
+    work_dir = data_dir or tempfile.mkdtemp(prefix="tool_benchmark_")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        datasets, per_scale = [], {}
+        for sessions in scales:
+            mix = "-".join(f"{k}{v:g}" for k, v in (type_mix or {}).items()) or "default"
+            db_path = os.path.join(work_dir, f"synthetic_s{sessions}_b{buckets}_{mix}_seed{seed}_{steps}.db")
+            if not os.path.exists(db_path):
+                dataset = generate(db_path, sessions, buckets, type_mix, client_id=CLIENT_ID, seed=seed)
+                backend = FilePerClientBackend(db_map={CLIENT_ID: db_path})
+                previous = set_backend(backend)
+                try:
+                    started = time.perf_counter()
+                    prepare(CLIENT_ID, steps)
+                    dataset['prepare_s'] = round(time.perf_counter() - started, 2)
+                finally:
+                    set_backend(previous)
+                    backend.close()
+            else:
+                dataset = {'db_path': db_path, 'sessions': sessions, 'reused': True}
+            datasets.append(dataset)
+            per_scale[sessions] = benchmark_scale(db_path, repeats, tools, window_weeks)
+    finally:
+        if data_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    names = sorted({name for results in per_scale.values() for name in results})
+    report = {'scales': scales, 'datasets': datasets, 'tools': {}}
+    for name in names:
+        rows = [per_scale[s].get(name, {}) for s in scales]
+        report['tools'][name] = {
+            'by_scale': dict(zip(scales, rows)),
+            'growth_cold': growth(scales, [r.get('cold_ms') for r in rows]),
+            'growth_warm': growth(scales, [r.get('warm_ms') for r in rows]),
+        }
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    scales = report['scales']
+    for dataset in report['datasets']:
+        if dataset.get('reused'):
+            print(f"{dataset['sessions']:>7} sessions: reused {dataset['db_path']}")
+        else:
+            print(f"{dataset['sessions']:>7} sessions: {dataset['buckets']} buckets, {dataset['size_mb']} MB, "
+                  f"prepared in {dataset['prepare_s']} s")
+
+    header = "".join(f"{f'{s} cold/warm ms  KiB':>30}" for s in scales)
+    print(f"\n{'tool':<30}{header}{'growth':>16}")
+    for name, entry in report['tools'].items():
+        cells = []
+        for s in scales:
+            r = entry['by_scale'][s]
+            if 'error' in r:
+                cells.append(f"{'error':>30}")
+            else:
+                cells.append(f"{r['cold_ms']:>11.2f}/{r['warm_ms'] or 0:<8.2f}{r['peak_kib']:>10.0f}")
+        cold, warm = entry['growth_cold'], entry['growth_warm']
+        flag = " !" if max(g or 0 for g in (cold, warm)) > SUPERLINEAR_GROWTH else ""
+        print(f"{name:<30}{''.join(cells)}{f'{cold}/{warm}':>14}{flag}")
+    print(f"\ngrowth = log-log slope of cold/warm time vs sessions; ! marks > {SUPERLINEAR_GROWTH}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Per-tool time and memory vs client history size")
+    parser.add_argument("--scales", default="250,1000,4000", help="Comma-separated session counts")
+    parser.add_argument("--buckets", type=int, default=240, help="Mean 10-second buckets per session")
+    parser.add_argument("--mix", type=parse_mix, help="cardio_type shares, e.g. Run=0.6,Ride=0.4")
+    parser.add_argument("--prepare", choices=("none", "indexes", "all"), default="all",
+                        help="Build steps run on each database (default: indexes and every derived table)")
+    parser.add_argument("--repeats", type=int, default=5, help="Warm calls per tool")
+    parser.add_argument("--tool", action="append", help="Only these tools (default: all)")
+    parser.add_argument("--window-weeks", type=int, help="Override the tools' trailing windows")
+    parser.add_argument("--data-dir", help="Keep generated databases here and reuse them")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(
+        [int(s) for s in args.scales.split(",")],
+        buckets=args.buckets,
+        type_mix=args.mix,
+        steps=args.prepare,
+        repeats=args.repeats,
+        tools=args.tool,
+        window_weeks=args.window_weeks,
+        data_dir=args.data_dir,
+        seed=args.seed,
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
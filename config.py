@@ -10,9 +10,48 @@ class Settings(BaseSettings):
     app_version: str = "0.1.0"
     environment: Literal["development", "staging", "production"] = "development"
     debug: bool = False
+
+    # Logging (core/log.py); per-iteration detail is DEBUG and never formatted at INFO
+    log_level: str = "INFO"
+    log_format: Literal["text", "json"] = "text"
+    log_sample_rate: float = 1.0           # Fraction of DEBUG/INFO records kept
     
     # OpenAI
     openai_api_key: str
+    openai_timeout: float = 60.0           # Seconds per request (read/write/pool)
+    openai_connect_timeout: float = 10.0
+    openai_max_retries: int = 3            # SDK retries 408/409/429/5xx with exponential backoff
+    openai_max_connections: int = 200      # Shared HTTP pool across all conversations
+    openai_max_keepalive_connections: int = 50
+
+    # Tool execution
+    tool_max_workers: int = 16             # Thread pool for synchronous tool functions
+    tool_timeout_seconds: float = 20.0     # Per-tool limit in parallel mode, also on waits for an identical call
+
+    # Template router (answers common questions without the LLM loop); without
+    # sentence-transformers or the model it logs a warning and every question
+    # takes the LLM loop
+    template_router_enabled: bool = True
+    template_router_threshold: float = 0.60  # Min cosine similarity to a template example
+
+    # Answer cache in front of CardioAgent.run
+    response_cache_enabled: bool = True
+    response_cache_ttl_seconds: float = 900.0
+    response_cache_max_bytes: int = 32 * 1024 * 1024
+
+    # Tool result cache shared across conversations
+    tool_cache_enabled: bool = True
+    tool_cache_ttl_seconds: float = 3600.0
+    tool_cache_max_bytes: int = 64 * 1024 * 1024
+    tool_result_compaction_enabled: bool = True  # Shrink tool results before they enter the prompt (agents/result_compaction.py)
+
+    # Per-request metrics export (core/agents/metrics.py); empty path = off
+    metrics_jsonl_path: str = ""           # One JSON line per request
+    metrics_prometheus_path: str = ""      # Prometheus textfile, rewritten every metrics_prometheus_interval
+    metrics_prometheus_interval: float = 15.0
+
+    # Nearest-neighbour index over the prompt example bank
+    embedding_index_type: Literal["flat", "ivf", "hnsw"] = "flat"
     
     # GCP (for Vertex AI)
     gcp_project_id: str = ""
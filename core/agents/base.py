@@ -3,8 +3,11 @@ Base agent interface for all agents in the system.
 """
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional
 from .models import AgentInput, AgentOutput
+from core.log import Lazy, get_logger, setup_logging
+
+log = get_logger("BaseAgent")
 
 
 
@@ -24,6 +27,7 @@ class BaseAgent(ABC):
             name: Optional name for the agent
         """
         self.name = name or self.__class__.__name__
+        setup_logging()
     
     @abstractmethod
     async def run(self, input_data: AgentInput) -> AgentOutput:
@@ -49,12 +53,10 @@ class BaseAgent(ABC):
         Returns:
             Output data as dictionary (full AgentOutput)
         """
-        print(f"[BaseAgent.execute] Agent={self.name} raw input_dict keys={list(input_dict.keys())}")
-        print(f"[BaseAgent.execute] Agent={self.name} raw input_dict={input_dict!r}")
+        log.debug("execute agent=%s input keys=%s", self.name, Lazy(list, input_dict))
 
         # Convert dict to AgentInput
         agent_input = AgentInput(data=input_dict)
-        print(f"[BaseAgent.execute] Agent={self.name} AgentInput.data keys={list(agent_input.data.keys())}")
 
         # ✅ Await validation (supports async overrides)
         is_valid = await self.validate_input(agent_input)
@@ -71,6 +73,45 @@ class BaseAgent(ABC):
         # ✅ Return the full AgentOutput as dict so the graph has everything
         return agent_output.model_dump()
     
+    async def stream(self, input_data: AgentInput) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute the agent, yielding progress events as they happen.
+
+        The last event is always {"type": "final", "output": <AgentOutput dict>}.
+        Agents that can report progress override this; the default runs
+        run() and yields only the final event.
+        
+        Args:
+            input_data: Input data and context for the agent
+            
+        Yields:
+            Event dictionaries
+        """
+        output = await self.run(input_data)
+        yield {"type": "final", "output": output.model_dump()}
+
+    async def execute_stream(self, input_dict: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming counterpart of execute(): validates the input, then yields
+        the agent's events. A failed run is reported in the final event's
+        output (success=False) rather than raised, since earlier events have
+        already been delivered.
+        
+        Args:
+            input_dict: Input data as dictionary
+            
+        Yields:
+            Event dictionaries, ending with the "final" event
+        """
+        agent_input = AgentInput(data=input_dict)
+
+        is_valid = await self.validate_input(agent_input)
+        if not is_valid:
+            raise ValueError(f"Invalid input for agent {self.name}")
+
+        async for event in self.stream(agent_input):
+            yield event
+
     async def validate_input(self, input_data: AgentInput) -> bool:
         """
         Validate input data before execution.
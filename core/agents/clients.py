@@ -0,0 +1,51 @@
+"""
+Shared clients for agents.
+
+One AsyncOpenAI client (and its HTTP connection pool) and one tool thread pool
+are shared by every agent in the process, so a single worker can interleave
+many in-flight conversations without opening a connection per request.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from config import get_settings
+
+
+@lru_cache
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Get the process-wide async OpenAI client.
+
+    Timeouts, connection limits and retry policy come from Settings. The SDK
+    retries connection errors, 408/409/429 and 5xx responses with exponential
+    backoff and jitter, honoring Retry-After headers.
+    """
+    settings = get_settings()
+    timeout = httpx.Timeout(settings.openai_timeout, connect=settings.openai_connect_timeout)
+    http_client = DefaultAsyncHttpxClient(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive_connections,
+        ),
+    )
+    return AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        timeout=timeout,
+        max_retries=settings.openai_max_retries,
+        http_client=http_client,
+    )
+
+
+@lru_cache
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Get the bounded thread pool that runs synchronous tool functions"""
+    settings = get_settings()
+    return ThreadPoolExecutor(
+        max_workers=settings.tool_max_workers,
+        thread_name_prefix="agent-tool",
+    )
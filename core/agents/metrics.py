@@ -0,0 +1,325 @@
+"""
+Per-request metrics for agents.
+
+A RequestMetrics follows one request through an agent: every LLM call
+(latency and token usage per iteration), every tool call (latency, SQL time
+and rows read) and the total wall time. Code running for the request -
+including tool tasks spawned with asyncio, which inherit the context - finds
+it through current_metrics().
+
+Finished requests are passed as one record dict to the metrics hooks, so an
+exporter never has to parse the logs. Two hooks are provided:
+
+    JSONLSink      - appends one JSON line per request
+    PrometheusSink - aggregates counters and histograms and renders them in
+                     the Prometheus text format (optionally to a textfile
+                     for node_exporter's textfile collector)
+
+Hooks configured in Settings are installed by configure_metrics_hooks().
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import get_settings
+from core.log import get_logger
+
+log = get_logger("metrics")
+
+MetricsHook = Callable[[Dict[str, Any]], None]
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+class RequestMetrics:
+    """Timings and token counts of one agent request"""
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self.started = time.perf_counter()
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.tool_calls: List[Dict[str, Any]] = []
+
+    def record_llm_call(
+        self,
+        iteration: int,
+        seconds: float,
+        usage: Any = None,
+        first_token_seconds: Optional[float] = None,
+    ) -> None:
+        """One model call; usage is the response's usage object (may be None)"""
+        call = {
+            "iteration": iteration,
+            "latency_ms": _ms(seconds),
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+        }
+        if first_token_seconds is not None:
+            call["first_token_ms"] = _ms(first_token_seconds)
+        self.llm_calls.append(call)
+
+    def record_tool_call(self, tool: str, seconds: float, ok: bool, sql: Optional[Dict[str, Any]] = None) -> None:
+        """One tool execution; sql is QueryStats.as_dict() when it was collected"""
+        call = {"tool": tool, "latency_ms": _ms(seconds), "ok": ok}
+        if sql is not None:
+            call.update(sql)
+        self.tool_calls.append(call)
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals plus the per-call entries, for AgentOutput.metadata["metrics"]"""
+        def total(calls: List[Dict[str, Any]], key: str):
+            return sum(call.get(key) or 0 for call in calls)
+
+        return {
+            "total_ms": _ms(time.perf_counter() - self.started),
+            "llm": {
+                "calls": len(self.llm_calls),
+                "latency_ms": round(total(self.llm_calls, "latency_ms"), 2),
+                "prompt_tokens": total(self.llm_calls, "prompt_tokens"),
+                "completion_tokens": total(self.llm_calls, "completion_tokens"),
+                "per_call": self.llm_calls,
+            },
+            "tools": {
+                "calls": len(self.tool_calls),
+                "latency_ms": round(total(self.tool_calls, "latency_ms"), 2),
+                "sql_ms": round(total(self.tool_calls, "sql_ms"), 3),
+                "queries": total(self.tool_calls, "queries"),
+                "rows_read": total(self.tool_calls, "rows_read"),
+                "per_call": self.tool_calls,
+            },
+        }
+
+    def record(self, route: str, success: bool) -> Dict[str, Any]:
+        """The record passed to metrics hooks"""
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "agent": self.agent,
+            "route": route,
+            "success": success,
+            **self.summary(),
+        }
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def current_metrics() -> Optional[RequestMetrics]:
+    """Metrics of the request being handled, if any"""
+    return _current.get()
+
+
+@contextmanager
+def track_request(agent: str) -> Iterator[RequestMetrics]:
+    """Make a new RequestMetrics current for the duration of the block"""
+    metrics = RequestMetrics(agent)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # An async generator finalized from another context; that context never saw the set
+            pass
+
+
+# ==========================================
+# HOOKS
+# ==========================================
+
+_hooks: List[MetricsHook] = []
+_hooks_lock = threading.Lock()
+
+
+def add_metrics_hook(hook: MetricsHook) -> None:
+    """Call hook(record) for every finished request"""
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks.append(hook)
+
+
+def remove_metrics_hook(hook: MetricsHook) -> None:
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def emit_metrics(record: Dict[str, Any]) -> None:
+    """Pass a finished request's record to every hook; a failing hook is logged and skipped"""
+    with _hooks_lock:
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(record)
+        except Exception:
+            log.exception("Metrics hook %r failed", hook)
+
+
+@lru_cache
+def configure_metrics_hooks() -> None:
+    """Install the sinks enabled in Settings (once per process)"""
+    settings = get_settings()
+    if settings.metrics_jsonl_path:
+        add_metrics_hook(JSONLSink(settings.metrics_jsonl_path))
+    if settings.metrics_prometheus_path:
+        add_metrics_hook(PrometheusSink(
+            path=settings.metrics_prometheus_path,
+            write_interval=settings.metrics_prometheus_interval,
+        ))
+
+
+# ==========================================
+# SINKS
+# ==========================================
+
+class JSONLSink:
+    """Append each request record to a file as one JSON line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def __repr__(self) -> str:
+        return f"JSONLSink({self.path!r})"
+
+
+# Histogram buckets (seconds) for request, LLM and tool latency
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _bucket(bound: Any) -> str:
+    return f'le="{bound:g}"' if isinstance(bound, float) else f'le="{bound}"'
+
+
+class PrometheusSink:
+    """
+    Aggregate request records into Prometheus counters and histograms.
+
+    render() returns the text exposition format for a /metrics endpoint.
+    With a path, the same text is written there (atomically, at most every
+    write_interval seconds) for node_exporter's textfile collector.
+    """
+
+    METRICS = {
+        # name: (type, help)
+        "requests_total": ("counter", "Agent requests by route and outcome"),
+        "request_duration_seconds": ("histogram", "Total request wall time"),
+        "llm_duration_seconds": ("histogram", "Latency of one LLM call"),
+        "llm_tokens_total": ("counter", "Tokens reported by the LLM usage"),
+        "tool_calls_total": ("counter", "Tool executions by outcome"),
+        "tool_duration_seconds": ("histogram", "Latency of one tool execution"),
+        "sql_seconds_total": ("counter", "SQL time inside tool executions"),
+        "sql_queries_total": ("counter", "SQL statements run by tools"),
+        "sql_rows_read_total": ("counter", "Rows read by tool SQL"),
+    }
+
+    def __init__(self, path: Optional[str] = None, prefix: str = "agent", write_interval: float = 15.0):
+        self.path = path
+        self.prefix = prefix
+        self.write_interval = write_interval
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, List[float]]] = {}   # bucket counts..., sum, count
+        self._lock = threading.Lock()
+        self._written = 0.0
+
+    def _inc(self, name: str, labels: Labels, value: float = 1.0) -> None:
+        series = self._counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0.0) + value
+
+    def _observe(self, name: str, labels: Labels, seconds: float) -> None:
+        series = self._histograms.setdefault(name, {})
+        state = series.setdefault(labels, [0.0] * (len(LATENCY_BUCKETS) + 2))
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                state[i] += 1
+        state[-2] += seconds
+        state[-1] += 1
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        agent = (("agent", record["agent"]),)
+        with self._lock:
+            self._inc("requests_total", agent + (("route", record["route"]), ("success", str(record["success"]).lower())))
+            self._observe("request_duration_seconds", agent, record["total_ms"] / 1000)
+
+            llm = record["llm"]
+            for call in llm["per_call"]:
+                self._observe("llm_duration_seconds", agent, call["latency_ms"] / 1000)
+            self._inc("llm_tokens_total", agent + (("kind", "prompt"),), llm["prompt_tokens"])
+            self._inc("llm_tokens_total", agent + (("kind", "completion"),), llm["completion_tokens"])
+
+            for call in record["tools"]["per_call"]:
+                tool = (("tool", call["tool"]),)
+                self._inc("tool_calls_total", tool + (("ok", str(call["ok"]).lower()),))
+                self._observe("tool_duration_seconds", tool, call["latency_ms"] / 1000)
+                if "sql_ms" in call:
+                    self._inc("sql_seconds_total", tool, call["sql_ms"] / 1000)
+                    self._inc("sql_queries_total", tool, call["queries"])
+                    self._inc("sql_rows_read_total", tool, call["rows_read"])
+
+            due = self.path and time.monotonic() - self._written >= self.write_interval
+        if due:
+            self.write()
+
+    def render(self) -> str:
+        """Current values in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in self.METRICS.items():
+                full = f"{self.prefix}_{name}"
+                if kind == "counter":
+                    series = self._counters.get(name, {})
+                else:
+                    series = self._histograms.get(name, {})
+                if not series:
+                    continue
+                lines.append(f"# HELP {full} {help_text}")
+                lines.append(f"# TYPE {full} {kind}")
+                for labels, value in sorted(series.items()):
+                    if kind == "counter":
+                        lines.append(f"{full}{_labels(labels)} {value:g}")
+                        continue
+                    for bound, count in zip(LATENCY_BUCKETS, value):
+                        lines.append(f"{full}_bucket{_labels(labels, _bucket(bound))} {count:g}")
+                    lines.append(f"{full}_bucket{_labels(labels, _bucket('+Inf'))} {value[-1]:g}")
+                    lines.append(f"{full}_sum{_labels(labels)} {value[-2]:.6f}")
+                    lines.append(f"{full}_count{_labels(labels)} {value[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Optional[str] = None) -> None:
+        """Write render() to path (default self.path) via a temp file and rename"""
+        path = path or self.path
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+        self._written = time.monotonic()
+
+    def __repr__(self) -> str:
+        return f"PrometheusSink(path={self.path!r})"
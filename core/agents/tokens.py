@@ -0,0 +1,72 @@
+"""
+Token counting for agent prompts.
+
+One tiktoken encoding per model for the whole process, and per-text token
+counts memoized by content hash, so conversation history that repeats from
+turn to turn is only encoded once.
+
+tiktoken downloads its BPE files on first use. Without network access (and
+no cached copy) counts fall back to an estimate of ~4 characters per token,
+so the agent still starts; budgets are approximate until the file is there.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, List
+
+import tiktoken
+
+from core.log import get_logger
+
+TOKEN_MEMO_SIZE = 10_000   # Distinct texts whose counts are kept
+CHARS_PER_TOKEN = 4        # Estimate used when no BPE file can be loaded
+
+log = get_logger("tokens")
+
+
+class ApproximateEncoding:
+    """Stand-in encoding: one pseudo-token per CHARS_PER_TOKEN characters"""
+
+    name = "approximate"
+
+    def encode(self, text: str) -> List[int]:
+        return [0] * -(-len(text) // CHARS_PER_TOKEN)
+
+
+@lru_cache
+def get_encoding(model: str) -> Any:
+    """Get the process-wide tiktoken encoding for a model (approximate if it cannot be loaded)"""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Fallback if model not found
+            return tiktoken.get_encoding("cl100k_base")
+    except (OSError, ValueError) as e:
+        # BPE file neither cached nor downloadable (requests errors are OSErrors)
+        log.warning("No tiktoken encoding for %s (%s); estimating %d chars per token",
+                    model, type(e).__name__, CHARS_PER_TOKEN)
+        return ApproximateEncoding()
+
+
+_memo: "OrderedDict[tuple, int]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Token count of text under a model's encoding, memoized by content hash"""
+    key = (model, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+    with _memo_lock:
+        count = _memo.get(key)
+        if count is not None:
+            _memo.move_to_end(key)
+            return count
+
+    count = len(get_encoding(model).encode(text))
+    with _memo_lock:
+        _memo[key] = count
+        if len(_memo) > TOKEN_MEMO_SIZE:
+            _memo.popitem(last=False)
+    return count
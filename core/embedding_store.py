@@ -0,0 +1,209 @@
+# AI Server - core/embedding_store.py
+
+"""
+    Persistent embedding store for fixed text banks (router categories,
+    templates, example prompts).
+
+    Each store is two files:
+        {name}.npy   - float16 matrix, one L2-normalized row per entry,
+                       loaded with mmap_mode='r'
+        {name}.json  - manifest: model, dim, content hash and the key and
+                       text hash of every row
+
+    sync() compares entry text hashes to the manifest and re-encodes only
+    the entries that are new or changed; unchanged rows are copied from the
+    existing matrix. Nothing is encoded when the content hash matches.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from core.embeddings import EMBEDDING_MODEL, encode
+from core.log import get_logger
+
+log = get_logger("embedding_store")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+STORE_DIR = PROJECT_ROOT / "data" / "embeddings"
+STORE_DTYPE = np.float16
+
+
+def text_hash(model_name: str, text: str) -> str:
+    """Hash of one entry: changes when the text or the model changes"""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()[:16]
+
+
+def content_hash(keys: List[str], hashes: List[str]) -> str:
+    """Hash of the whole bank, in row order"""
+    digest = hashlib.sha256()
+    for key, entry_hash in zip(keys, hashes):
+        digest.update(f"{key}\0{entry_hash}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Embeddings for a keyed text bank, persisted next to a manifest.
+
+    Rows are kept in the order of the entries passed to sync(), so callers
+    can slice the matrix by key range and score every entry with a single
+    matrix product.
+    """
+
+    def __init__(self, name: str, store_dir: Path = STORE_DIR, model_name: str = EMBEDDING_MODEL):
+        self.name = name
+        self.model_name = model_name
+        self.matrix_path = Path(store_dir) / f"{name}.npy"
+        self.manifest_path = Path(store_dir) / f"{name}.json"
+
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._manifest: Optional[Dict[str, Any]] = None
+        self.keys: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    # ==========================================
+    # LOADING
+    # ==========================================
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        """Manifest from disk, or None if missing, unreadable or for another model"""
+        try:
+            manifest = json.loads(self.manifest_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+        if manifest.get("model") != self.model_name:
+            return None
+        return manifest
+
+    def _load(self) -> bool:
+        """Map the stored matrix; False if there is no usable store on disk"""
+        manifest = self._read_manifest()
+        if manifest is None or not self.matrix_path.exists():
+            return False
+        matrix = np.load(self.matrix_path, mmap_mode="r")
+        if matrix.shape[0] != len(manifest["keys"]):
+            log.warning("%s: matrix/manifest mismatch, ignoring stored embeddings", self.name)
+            return False
+        self._set(matrix, manifest)
+        return True
+
+    def _set(self, matrix: np.ndarray, manifest: Dict[str, Any]) -> None:
+        self._matrix = matrix
+        self._manifest = manifest
+        self.keys = list(manifest["keys"])
+        self.index = {key: row for row, key in enumerate(self.keys)}
+
+    @property
+    def content_hash(self) -> str:
+        """Content hash of the loaded bank"""
+        self.matrix
+        return self._manifest["content_hash"]
+
+    def artifact_path(self, suffix: str) -> Path:
+        """Path for a file derived from this store (e.g. a built index)"""
+        return self.matrix_path.with_name(f"{self.name}.{suffix}")
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Embedding matrix (float16, memory-mapped when loaded from disk)"""
+        if self._matrix is None:
+            with self._lock:
+                if self._matrix is None and not self._load():
+                    raise RuntimeError(f"Embedding store '{self.name}' has not been built")
+        return self._matrix
+
+    # ==========================================
+    # BUILDING
+    # ==========================================
+
+    def sync(self, entries: Dict[str, str], encoder: Any = None) -> Dict[str, int]:
+        """
+        Make the store match `entries` (key -> text), in the given order.
+
+        Only new or changed entries are encoded; the encoder is not touched
+        when everything is up to date (so it may be None in that case).
+
+        Returns:
+            Counts of reused, encoded and dropped rows
+        """
+        keys = list(entries)
+        hashes = [text_hash(self.model_name, entries[key]) for key in keys]
+        target_hash = content_hash(keys, hashes)
+
+        with self._lock:
+            if self._manifest is None:
+                self._load()
+            if self._manifest is not None and self._manifest["content_hash"] == target_hash:
+                return {"reused": len(keys), "encoded": 0, "dropped": 0}
+
+            old_rows: Dict[str, int] = {}
+            old_hashes: Dict[str, str] = {}
+            if self._manifest is not None:
+                old_rows = {key: row for row, key in enumerate(self._manifest["keys"])}
+                old_hashes = dict(zip(self._manifest["keys"], self._manifest["hashes"]))
+
+            stale = [i for i, key in enumerate(keys) if old_hashes.get(key) != hashes[i]]
+            if stale and encoder is None:
+                raise RuntimeError(f"Embedding store '{self.name}' is out of date and no encoder was given")
+
+            fresh = encode(encoder, [entries[keys[i]] for i in stale]) if stale else None
+            if fresh is not None:
+                dim = fresh.shape[1]
+            else:
+                dim = self._matrix.shape[1] if self._matrix is not None else 0
+
+            matrix = np.empty((len(keys), dim), dtype=STORE_DTYPE)
+            stale_rows = {i: n for n, i in enumerate(stale)}
+            for i, key in enumerate(keys):
+                if i in stale_rows:
+                    matrix[i] = fresh[stale_rows[i]]
+                else:
+                    matrix[i] = self._matrix[old_rows[key]]
+
+            manifest = {
+                "model": self.model_name,
+                "dim": dim,
+                "dtype": np.dtype(STORE_DTYPE).name,
+                "content_hash": target_hash,
+                "keys": keys,
+                "hashes": hashes,
+            }
+            self._write(matrix, manifest)
+            dropped = len(set(old_rows) - set(keys))
+            self._set(np.load(self.matrix_path, mmap_mode="r"), manifest)
+
+        log.info("%s: encoded %d, reused %d, dropped %d", self.name, len(stale), len(keys) - len(stale), dropped)
+        return {"reused": len(keys) - len(stale), "encoded": len(stale), "dropped": dropped}
+
+    def _write(self, matrix: np.ndarray, manifest: Dict[str, Any]) -> None:
+        """Write matrix then manifest, each via rename so readers never see a partial file"""
+        self.matrix_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_matrix = self.matrix_path.with_suffix(".npy.tmp")
+        with open(tmp_matrix, "wb") as f:
+            np.save(f, matrix)
+        tmp_manifest = self.manifest_path.with_suffix(".json.tmp")
+        tmp_manifest.write_text(json.dumps(manifest))
+        # Drop the manifest first: a crash before the last rename leaves no
+        # manifest, so the next sync re-encodes instead of trusting the matrix
+        self.manifest_path.unlink(missing_ok=True)
+        os.replace(tmp_matrix, self.matrix_path)
+        os.replace(tmp_manifest, self.manifest_path)
+
+    # ==========================================
+    # SCORING
+    # ==========================================
+
+    def score(self, query: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of every row to a normalized query vector (or a
+        batch of them, shape (n, dim) -> (n, rows)), in one matrix product.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        return np.asarray(query @ self.matrix.T, dtype=np.float32)
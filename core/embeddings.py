@@ -0,0 +1,61 @@
+# AI Server - core/embeddings.py
+
+"""
+    Sentence embedding helpers shared by the template router and prompt classifier.
+
+    sentence-transformers is optional: without it get_encoder() returns None and
+    callers fall back to the LLM path.
+"""
+
+from functools import lru_cache
+from typing import Any, List, Optional
+
+import numpy as np
+
+from core.log import get_logger
+
+log = get_logger("embeddings")
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"   # 384-dim, same model as notebooks/
+ENCODE_BATCH_SIZE = 64
+
+
+@lru_cache
+def get_encoder(model_name: str = EMBEDDING_MODEL) -> Optional[Any]:
+    """
+    Get the process-wide sentence encoder, or None if sentence-transformers
+    is not installed or the model cannot be loaded (e.g. not cached and no
+    network access).
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        log.warning("sentence-transformers not installed; embedding features disabled")
+        return None
+    try:
+        return SentenceTransformer(model_name)
+    except OSError as e:
+        log.warning("Could not load embedding model %s (%s); embedding features disabled", model_name, e)
+        return None
+
+
+def encode(encoder: Any, texts: List[str], batch_size: int = ENCODE_BATCH_SIZE) -> np.ndarray:
+    """
+    Encode texts into L2-normalized float32 vectors, so cosine similarity is
+    a plain dot product.
+    """
+    vectors = encoder.encode(
+        list(texts),
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+    return normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows, leaving zero rows untouched"""
+    vectors = np.atleast_2d(vectors).astype(np.float32, copy=False)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
@@ -0,0 +1,134 @@
+"""
+Leveled, structured logging for the agent server.
+
+Modules log through get_logger(name) with %-style arguments, so a record
+below the configured level is dropped before anything is formatted. Values
+that are expensive to render (tool results, message lists) are wrapped in
+Lazy and only rendered if the record is actually emitted. Structured fields
+go in extra=fields(...) and come out as key=value pairs, or as keys of the
+JSON object with LOG_FORMAT=json.
+
+setup_logging() puts a QueueHandler in front of the real handler, so the
+request path only enqueues records and a background listener thread does
+the formatting and the writes. Records below WARNING can be sampled
+(log_sample_rate) to cap log volume under load.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict
+
+ROOT_LOGGER = "ai_server"
+
+# Standard LogRecord attributes; anything else on a record is a structured field
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "fields"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for one component, e.g. get_logger("CardioAgent")"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def fields(**values: Any) -> Dict[str, Any]:
+    """extra= argument carrying structured fields: log.info("Done", extra=fields(ms=12))"""
+    return {"fields": values}
+
+
+class Lazy:
+    """Log argument rendered by calling func(*args) only when the record is emitted"""
+
+    __slots__ = ("func", "args")
+
+    def __init__(self, func: Callable[..., Any], *args: Any):
+        self.func = func
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args))
+
+
+def _component(record: logging.LogRecord) -> str:
+    return record.name[len(ROOT_LOGGER) + 1:] if record.name.startswith(ROOT_LOGGER + ".") else record.name
+
+
+class TextFormatter(logging.Formatter):
+    """`time LEVEL [component] message key=value ...`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = (
+            f"{self.formatTime(record, '%H:%M:%S')}.{int(record.msecs):03d} "
+            f"{record.levelname:<7} [{_component(record)}] {record.getMessage()}"
+        )
+        values = getattr(record, "fields", None)
+        if values:
+            line += " " + " ".join(f"{key}={value}" for key, value in values.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with the structured fields as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": _component(record),
+            "msg": record.getMessage(),
+            **(getattr(record, "fields", None) or {}),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of the records below WARNING; warnings and errors always pass"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate
+
+
+@lru_cache
+def setup_logging() -> QueueListener:
+    """
+    Configure the ai_server loggers from Settings (once per process).
+
+    Returns:
+        The running QueueListener (stopped at exit, flushing queued records)
+    """
+    # Imported here so modules that only log (tools/, core/embeddings) can be
+    # used without the Settings the server needs
+    from config import get_settings
+
+    settings = get_settings()
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JSONFormatter() if settings.log_format == "json" else TextFormatter())
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = QueueHandler(records)
+    if settings.log_sample_rate < 1.0:
+        handler.addFilter(SamplingFilter(settings.log_sample_rate))
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(settings.log_level.upper())
+    root.addHandler(handler)
+    root.propagate = False
+
+    listener = QueueListener(records, output)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,233 @@
+# AI Server - core/vector_index.py
+
+"""
+    Pluggable nearest-neighbour indexes over L2-normalized embeddings.
+
+    All indexes rank by inner product (= cosine similarity on normalized
+    vectors) and share one interface: build(), search(), save(), load().
+
+        flat  - exact search, one matrix product (NumPy; no extra deps)
+        ivf   - faiss IndexIVFFlat: k-means cells, probes `nprobe` of them
+        hnsw  - faiss IndexHNSWFlat: navigable small-world graph
+
+    faiss is optional; make_index() raises ImportError for ivf/hnsw when it
+    is not installed. Built indexes are saved next to the embedding store
+    they were built from, tagged with its content hash so a stale index is
+    rebuilt instead of loaded.
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from core.log import get_logger
+
+log = get_logger("vector_index")
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+# Defaults sized for banks of thousands to tens of thousands of rows
+IVF_CELLS_PER_SQRT_N = 1     # nlist ~ sqrt(n)
+IVF_NPROBE = 8
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+
+def _faiss():
+    try:
+        import faiss
+    except ImportError:
+        raise ImportError("faiss is required for ivf/hnsw indexes (pip install faiss-cpu)")
+    return faiss
+
+
+def _as_float32(vectors: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(np.atleast_2d(vectors), dtype=np.float32)
+
+
+class VectorIndex:
+    """Base class: inner-product k-NN over a fixed set of vectors"""
+    kind = ""
+
+    def __init__(self, **params):
+        self.params: Dict[str, Any] = params
+        self.size = 0
+
+    def build(self, vectors: np.ndarray) -> "VectorIndex":
+        raise NotImplementedError
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k rows for each query, best first.
+
+        Returns:
+            (scores, ids), both shaped (n_queries, k); ids are -1 where
+            fewer than k results were found
+        """
+        raise NotImplementedError
+
+    def _save_index(self, path: Path) -> None:
+        raise NotImplementedError
+
+    def _load_index(self, path: Path) -> None:
+        raise NotImplementedError
+
+    def save(self, path: Path, content_hash: str = "") -> None:
+        """Write the index to `path` plus a `.json` sidecar with its parameters"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._save_index(path)
+        meta = {"kind": self.kind, "params": self.params, "size": self.size, "content_hash": content_hash}
+        path.with_suffix(path.suffix + ".json").write_text(json.dumps(meta))
+
+    @staticmethod
+    def load(path: Path, content_hash: Optional[str] = None) -> Optional["VectorIndex"]:
+        """
+        Load a saved index, or None if missing or built from different
+        content than `content_hash`.
+        """
+        path = Path(path)
+        try:
+            meta = json.loads(path.with_suffix(path.suffix + ".json").read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+        if content_hash is not None and meta.get("content_hash") != content_hash:
+            return None
+        if not path.exists():
+            return None
+        index = make_index(meta["kind"], **meta["params"])
+        index._load_index(path)
+        index.size = meta["size"]
+        return index
+
+
+class FlatIndex(VectorIndex):
+    """Exact search: one matrix product, then a partial sort"""
+    kind = "flat"
+
+    def build(self, vectors: np.ndarray) -> "FlatIndex":
+        self.vectors = _as_float32(vectors)
+        self.size = len(self.vectors)
+        return self
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = _as_float32(queries) @ self.vectors.T
+        k_found = min(k, self.size)
+        top = np.argpartition(-scores, k_found - 1, axis=1)[:, :k_found]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        ids = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        if k_found < k:
+            pad = k - k_found
+            ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+            top_scores = np.pad(top_scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        return top_scores, ids
+
+    def _save_index(self, path: Path) -> None:
+        with open(path, "wb") as f:
+            np.save(f, self.vectors)
+
+    def _load_index(self, path: Path) -> None:
+        self.vectors = np.load(path, mmap_mode="r")
+
+
+class FaissIndex(VectorIndex):
+    """Shared search/save/load for faiss-backed indexes"""
+
+    def _configure(self) -> None:
+        """Apply search-time parameters (not all survive write_index)"""
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores, ids = self.index.search(_as_float32(queries), k)
+        return scores, ids
+
+    def _save_index(self, path: Path) -> None:
+        _faiss().write_index(self.index, str(path))
+
+    def _load_index(self, path: Path) -> None:
+        self.index = _faiss().read_index(str(path))
+        self._configure()
+
+
+class IVFIndex(FaissIndex):
+    """Inverted file: vectors bucketed by nearest k-means centroid"""
+    kind = "ivf"
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = IVF_NPROBE):
+        super().__init__(nlist=nlist, nprobe=nprobe)
+
+    def build(self, vectors: np.ndarray) -> "IVFIndex":
+        faiss = _faiss()
+        vectors = _as_float32(vectors)
+        n, dim = vectors.shape
+        # faiss wants ~39 training points per cell; small banks get fewer cells
+        nlist = self.params["nlist"] or max(1, int(math.sqrt(n)) * IVF_CELLS_PER_SQRT_N)
+        nlist = max(1, min(nlist, n // 39 or 1))
+        self.params["nlist"] = nlist
+
+        # Keep a reference: the IVF index does not own its quantizer
+        self.quantizer = faiss.IndexFlatIP(dim)
+        self.index = faiss.IndexIVFFlat(self.quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        self.index.train(vectors)
+        self.index.add(vectors)
+        self._configure()
+        self.size = n
+        return self
+
+    def _configure(self) -> None:
+        self.index.nprobe = min(self.params["nprobe"], self.params["nlist"])
+
+
+class HNSWIndex(FaissIndex):
+    """Hierarchical navigable small-world graph"""
+    kind = "hnsw"
+
+    def __init__(self, m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION, ef_search: int = HNSW_EF_SEARCH):
+        super().__init__(m=m, ef_construction=ef_construction, ef_search=ef_search)
+
+    def build(self, vectors: np.ndarray) -> "HNSWIndex":
+        faiss = _faiss()
+        vectors = _as_float32(vectors)
+        self.index = faiss.IndexHNSWFlat(vectors.shape[1], self.params["m"], faiss.METRIC_INNER_PRODUCT)
+        self.index.hnsw.efConstruction = self.params["ef_construction"]
+        self.index.add(vectors)
+        self._configure()
+        self.size = len(vectors)
+        return self
+
+    def _configure(self) -> None:
+        self.index.hnsw.efSearch = self.params["ef_search"]
+
+
+INDEX_CLASSES = {"flat": FlatIndex, "ivf": IVFIndex, "hnsw": HNSWIndex}
+
+
+def make_index(kind: str = "flat", **params) -> VectorIndex:
+    """Create an unbuilt index of the given type"""
+    if kind not in INDEX_CLASSES:
+        raise ValueError(f"Unknown index type '{kind}' (expected one of {', '.join(INDEX_TYPES)})")
+    if kind != "flat":
+        _faiss()
+    return INDEX_CLASSES[kind](**params)
+
+
+def index_for_store(store: Any, kind: str = "flat", **params) -> VectorIndex:
+    """
+    Index over an EmbeddingStore's rows: loaded from next to the store when
+    it was built from the same content, otherwise built and saved there.
+    A flat index searches the store's own matrix and is not saved.
+    """
+    if kind == "flat":
+        return FlatIndex().build(store.matrix)
+    path = store.artifact_path(f"{kind}.index")
+    index = VectorIndex.load(path, content_hash=store.content_hash)
+    if index is None:
+        index = make_index(kind, **params).build(store.matrix)
+        index.save(path, content_hash=store.content_hash)
+        log.info("Built %s index over %d rows of '%s'", kind, index.size, store.name)
+    return index
@@ -0,0 +1,44 @@
+# AI Server - tests/conftest.py
+
+"""
+    Shared fixtures. config.Settings requires an OpenAI key at import time;
+    nothing under tests/ calls the API, so a placeholder is enough.
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import sqlite3
+
+import pytest
+
+from benchmarks.synthetic_data import generate
+from tools.db import FilePerClientBackend, set_backend
+
+CLIENT_ID = 1
+
+
+@pytest.fixture
+def client_db(tmp_path):
+    """A small synthetic client database served through the file backend"""
+    db_path = str(tmp_path / f"client_{CLIENT_ID}_cardio.db")
+    generate(db_path, sessions=60, buckets_per_session=60, client_id=CLIENT_ID, seed=7)
+    backend = FilePerClientBackend(db_map={CLIENT_ID: db_path})
+    previous = set_backend(backend)
+    try:
+        yield db_path
+    finally:
+        set_backend(previous)
+        backend.close()
+
+
+@pytest.fixture
+def db(client_db):
+    """Autocommitting read-write connection to client_db, for mutating it in tests"""
+    conn = sqlite3.connect(client_db, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
@@ -0,0 +1,61 @@
+# AI Server - tests/test_agent_stream.py
+
+import asyncio
+
+from agents.cardio_chat_agent import CardioAgent
+from benchmarks.agent_benchmark import ScriptedChatAPI
+from core.agents.base import AgentInput
+
+CLIENT_ID = 1    # conftest.client_db
+
+QUESTION = "What are my recent sessions?"
+CORPUS = [{
+    "question": QUESTION,
+    "responses": [
+        {
+            "content": "Let me look those up.",
+            "tool_calls": [{"name": "get_recent_cardio_sessions", "arguments": {"limit": 3}}],
+        },
+        {"content": "Your last three sessions were easy runs."},
+    ],
+}]
+
+
+def collect(corpus: list, stream_chunk_ms: float = 0) -> list:
+    agent = CardioAgent()
+    agent.client = ScriptedChatAPI(corpus, latency_ms=0, stream_chunk_ms=stream_chunk_ms)
+
+    async def run():
+        data = {"question": QUESTION, "client_id": CLIENT_ID, "use_cache": False, "use_templates": False}
+        return [event async for event in agent.stream(AgentInput(data=data))]
+    return asyncio.run(run())
+
+
+def answer_text(events: list) -> str:
+    """What a client shows: token events, minus the iterations later retracted"""
+    retracted = {e["iteration"] for e in events if e["type"] == "retract"}
+    return "".join(e["delta"] for e in events if e["type"] == "token" and e["iteration"] not in retracted)
+
+
+def test_tool_turn_text_is_retracted_before_the_tool_calls_run(client_db):
+    events = collect(CORPUS)
+    types = [event["type"] for event in events]
+
+    assert types.index("token") < types.index("retract") < types.index("thinking") < types.index("tool_start")
+    assert [e["iteration"] for e in events if e["type"] == "retract"] == [1]
+    assert [e["text"] for e in events if e["type"] == "thinking"] == ["Let me look those up. "]
+    assert types[types.index("tool_start"):].count("token") == 7    # one per word of the answer
+    answer = answer_text(events)
+    assert answer == "Your last three sessions were easy runs. "
+    assert events[-1]["output"]["data"]["answer"] == answer
+
+
+def test_answer_tokens_are_forwarded_as_they_arrive(client_db):
+    corpus = [{"question": QUESTION, "responses": [{"content": "Three easy runs, all this week."}]}]
+    events = collect(corpus, stream_chunk_ms=40)
+
+    assert "retract" not in [event["type"] for event in events]
+    assert answer_text(events) == "Three easy runs, all this week. "
+    stream = events[-1]["output"]["metadata"]["stream"]
+    # Six chunks 40 ms apart: the first token must not wait for the last
+    assert stream["first_token_ms"] < stream["total_ms"] / 2
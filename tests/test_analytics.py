@@ -0,0 +1,149 @@
+# AI Server - tests/test_analytics.py
+
+"""
+    The columnar trend engine must give the same answers as the per-row
+    implementation it replaced (reproduced here as baseline_trend), up to
+    the rounding of intermediates the old code did.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from tools import analytics, cardio_tools
+from tools.db import get_connection
+
+CLIENT_ID = 1    # conftest.client_db
+
+# tool -> (value SQL the per-row version used, weekly aggregate, lower_is_better)
+TREND_TOOLS = {
+    cardio_tools.get_pace_progression: ("duration * 1000.0 / NULLIF(distance, 0)", 'avg', True),
+    cardio_tools.get_heart_rate_trends: ("NULLIF(avg_heart_rate, 0)", 'avg', True),
+    cardio_tools.get_speed_progression: ("distance * 3.6 / NULLIF(duration, 0)", 'avg', False),
+    cardio_tools.get_distance_trends: ("distance / 1000.0", 'sum', False),
+    cardio_tools.get_duration_trends: ("duration / 60.0", 'sum', False),
+    cardio_tools.get_elevation_gain_trends: ("elevation_gain", 'sum', False),
+}
+
+
+def _week_start(day):
+    d = date.fromisoformat(day[:10])
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+def _linear_slope(xs, ys):
+    n = len(xs)
+    if n < 2:
+        return None
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    denom = sum((x - mean_x) ** 2 for x in xs)
+    if denom == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / denom
+
+
+def baseline_trend(value_sql, cardio_type, weeks_back, weekly, lower_is_better):
+    """The per-row _trend() from before the columnar engine"""
+    since = (date.today() - timedelta(weeks=weeks_back)).isoformat()
+    type_clause, params = ("AND cardio_type = ?", [since, cardio_type]) if cardio_type else ("", [since])
+    with get_connection(CLIENT_ID) as conn:
+        rows = conn.execute(f"""
+            SELECT id AS cardio_id, cardio_date, {value_sql} AS value
+            FROM cardio
+            WHERE ({value_sql}) IS NOT NULL AND cardio_date >= ? {type_clause}
+            ORDER BY cardio_date, cardio_start_time
+        """, params).fetchall()
+    if not rows:
+        return {'sessions': 0}
+
+    weeks = {}
+    for row in rows:
+        weeks.setdefault(_week_start(row['cardio_date']), []).append(row['value'])
+    weekly_values = [
+        {'week_start': week, 'value': round(sum(vals) if weekly == 'sum' else sum(vals) / len(vals), 2),
+         'sessions': len(vals)}
+        for week, vals in sorted(weeks.items())
+    ]
+    first_day = date.fromisoformat(rows[0]['cardio_date'][:10])
+    xs = [(date.fromisoformat(r['cardio_date'][:10]) - first_day).days / 7 for r in rows]
+    ys = [r['value'] for r in rows]
+    slope = _linear_slope(xs, ys)
+    rolling = [round(sum(ys[max(0, i - 2):i + 1]) / len(ys[max(0, i - 2):i + 1]), 2) for i in range(len(ys))]
+    first_week, last_week = weekly_values[0]['value'], weekly_values[-1]['value']
+    change_pct = (last_week - first_week) / first_week * 100 if first_week else None
+
+    if slope is None or abs(slope) < 1e-9:
+        direction = 'flat'
+    elif (slope < 0) == lower_is_better:
+        direction = 'improving'
+    else:
+        direction = 'declining'
+    return {
+        'sessions': len(rows),
+        'per_session': [
+            {'cardio_id': r['cardio_id'], 'date': r['cardio_date'], 'value': r['value'], 'rolling_avg_3': avg}
+            for r, avg in zip(rows, rolling)
+        ],
+        'weekly': weekly_values,
+        'slope_per_week': round(slope, 3) if slope is not None else None,
+        'direction': direction,
+        'change_pct': round(change_pct, 1) if change_pct is not None else None,
+    }
+
+
+@pytest.mark.parametrize("tool", list(TREND_TOOLS), ids=lambda tool: tool.__name__)
+@pytest.mark.parametrize("cardio_type, weeks_back", [(None, 12), ("Run", 12), ("Ride", 52), (None, 2)])
+def test_trend_matches_per_row_implementation(client_db, tool, cardio_type, weeks_back):
+    value_sql, weekly, lower_is_better = TREND_TOOLS[tool]
+    expected = baseline_trend(value_sql, cardio_type, weeks_back, weekly, lower_is_better)
+    result = tool(CLIENT_ID, cardio_type=cardio_type, weeks_back=weeks_back)
+
+    assert result['sessions'] == expected['sessions']
+    if not expected['sessions']:
+        return
+    assert result['direction'] == expected['direction']
+    assert result['slope_per_week'] == pytest.approx(expected['slope_per_week'], abs=1e-3)
+    # The old change_pct came from weekly values already rounded to 2 decimals;
+    # allow the error that rounding each of them by up to 0.005 introduces
+    first, last = expected['weekly'][0]['value'], expected['weekly'][-1]['value']
+    if expected['change_pct'] is not None:
+        rounding = 0.005 * 100 * (abs(first) + abs(last)) / (abs(first) - 0.005) ** 2
+        assert result['change_pct'] == pytest.approx(expected['change_pct'], abs=rounding + 0.1)
+
+    assert [(s['cardio_id'], s['date']) for s in result['per_session']] == \
+        [(s['cardio_id'], s['date']) for s in expected['per_session']]
+    for got, want in zip(result['per_session'], expected['per_session']):
+        assert got['value'] == pytest.approx(want['value'], abs=0.005)
+        assert got['rolling_avg_3'] == pytest.approx(want['rolling_avg_3'], abs=0.01)
+
+    assert [(w['week_start'], w['sessions']) for w in result['weekly']] == \
+        [(w['week_start'], w['sessions']) for w in expected['weekly']]
+    for got, want in zip(result['weekly'], expected['weekly']):
+        assert got['value'] == pytest.approx(want['value'], abs=0.01)
+
+
+def test_kernels_match_plain_python():
+    rng = np.random.default_rng(3)
+    days = np.sort(np.datetime64('2026-01-01') + rng.integers(0, 120, 50).astype('timedelta64[D]'))
+    values = rng.uniform(1, 20, 50)
+
+    assert [str(w) for w in analytics.week_starts(days)] == [_week_start(str(d)) for d in days]
+
+    weeks, sums, counts = analytics.weekly_aggregate(days, values, 'sum')
+    grouped = {}
+    for day, value in zip(days, values):
+        grouped.setdefault(_week_start(str(day)), []).append(value)
+    assert [str(w) for w in weeks] == sorted(grouped)
+    assert list(counts) == [len(grouped[w]) for w in sorted(grouped)]
+    assert sums == pytest.approx([sum(grouped[w]) for w in sorted(grouped)])
+
+    xs = (days - days[0]).astype(np.float64) / 7
+    assert analytics.least_squares_slope(xs, values) == pytest.approx(_linear_slope(list(xs), list(values)))
+    assert analytics.least_squares_slope(np.zeros(3), values[:3]) is None
+
+    expected = [sum(values[max(0, i - 2):i + 1]) / len(values[max(0, i - 2):i + 1]) for i in range(50)]
+    assert analytics.rolling_mean(values, 3) == pytest.approx(expected)
+
+    assert analytics.percent_change(4.0, 5.0) == pytest.approx(25.0)
+    assert analytics.percent_change(0.0, 5.0) is None
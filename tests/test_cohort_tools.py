@@ -0,0 +1,146 @@
+# AI Server - tests/test_cohort_tools.py
+
+"""
+    The cohort tools' vectorized passes must agree with the same numbers
+    worked out client by client from each client's cardio table.
+"""
+
+import sqlite3
+import statistics
+from datetime import date, timedelta
+
+import pytest
+
+from benchmarks.synthetic_data import generate
+from tools.cohort_tools import get_declining_frequency, get_pace_percentiles, get_volume_leaderboard
+from tools.db import FilePerClientBackend, get_connection, set_backend
+from tools.filters import window_start
+
+# client_id -> sessions per week
+CLIENTS = {1: 4.0, 2: 2.5, 3: 6.0}
+
+
+@pytest.fixture
+def cohort(tmp_path):
+    """Three synthetic clients; client 2 has stopped training for the last three weeks"""
+    db_map = {}
+    for client_id, per_week in CLIENTS.items():
+        db_map[client_id] = str(tmp_path / f"client_{client_id}_cardio.db")
+        generate(db_map[client_id], sessions=40, buckets_per_session=10, sessions_per_week=per_week,
+                 client_id=client_id, seed=client_id)
+    with sqlite3.connect(db_map[2]) as conn:
+        conn.execute("DELETE FROM cardio WHERE cardio_date >= ?", (window_start(weeks=3),))
+    conn.close()
+
+    backend = FilePerClientBackend(db_map=db_map)
+    previous = set_backend(backend)
+    try:
+        yield db_map
+    finally:
+        set_backend(previous)
+        backend.close()
+
+
+def per_client(sql, params=()):
+    """client_id -> rows of sql run against that client's database"""
+    results = {}
+    for client_id in CLIENTS:
+        with get_connection(client_id) as conn:
+            results[client_id] = [tuple(row) for row in conn.execute(sql, params)]
+    return results
+
+
+@pytest.mark.parametrize("cardio_type", [None, "running"])
+@pytest.mark.parametrize("metric", ["distance", "duration", "elevation", "sessions"])
+def test_leaderboard_matches_per_client_totals(cohort, metric, cardio_type):
+    weeks = 6
+    type_clause, params = ("AND cardio_type = 'Run'", ()) if cardio_type else ("", ())
+    totals = {
+        client_id: dict(zip(('sessions', 'distance', 'duration', 'elevation'), rows[0]))
+        for client_id, rows in per_client(f"""
+            SELECT COUNT(*), TOTAL(distance) / 1000.0, TOTAL(duration) / 60.0, TOTAL(elevation_gain)
+            FROM cardio
+            WHERE cardio_date >= ? {type_clause}
+        """, (window_start(weeks=weeks),) + params).items()
+        if rows[0][0]
+    }
+
+    result = get_volume_leaderboard(weeks=weeks, cardio_type=cardio_type, metric=metric, limit=2)
+    assert result['active_clients'] == len(totals)
+    assert result['total_clients'] == len(CLIENTS)
+    expected_order = sorted(totals, key=lambda client_id: (-totals[client_id][metric], client_id))[:2]
+    assert [row['client_id'] for row in result['leaderboard']] == expected_order
+    for rank, row in enumerate(result['leaderboard'], start=1):
+        expected = totals[row['client_id']]
+        assert row['rank'] == rank
+        assert row['sessions'] == expected['sessions']
+        assert row['distance_km'] == pytest.approx(expected['distance'], abs=0.01)
+        assert row['duration_min'] == pytest.approx(expected['duration'], abs=0.1)
+        assert row['elevation_gain_m'] == pytest.approx(expected['elevation'], abs=0.1)
+        assert row['distance_km_per_week'] == pytest.approx(expected['distance'] / weeks, abs=0.01)
+
+
+def test_pace_percentiles_match_per_client_medians(cohort):
+    paces = {
+        client_id: [pace for (pace,) in rows]
+        for client_id, rows in per_client("""
+            SELECT duration * 1000.0 / distance
+            FROM cardio
+            WHERE cardio_type = 'Run' AND distance > 0 AND cardio_date >= ?
+        """, (window_start(weeks=12),)).items()
+        if rows
+    }
+    medians = {client_id: statistics.median(values) for client_id, values in paces.items()}
+
+    result = get_pace_percentiles('run', weeks_back=12, client_id=3)
+    assert result['clients'] == len(medians)
+    assert [row['client_id'] for row in result['ranking']] == sorted(medians, key=medians.get)
+    for row in result['ranking']:
+        others = [pace for client_id, pace in medians.items() if client_id != row['client_id']]
+        assert row['median_pace_sec_per_km'] == pytest.approx(medians[row['client_id']], abs=0.05)
+        assert row['sessions'] == len(paces[row['client_id']])
+        slower = sum(pace > medians[row['client_id']] for pace in others)
+        assert row['faster_than_pct'] == pytest.approx(slower / len(others) * 100, abs=0.05)
+
+    cohort_p50 = statistics.median(medians.values())
+    assert result['cohort_pace_sec_per_km']['p50'] == pytest.approx(cohort_p50, abs=0.05)
+    assert result['client'] == next(row for row in result['ranking'] if row['client_id'] == 3)
+
+    # A client below min_sessions drops out of the cohort
+    fewest = min(paces, key=lambda client_id: len(paces[client_id]))
+    result = get_pace_percentiles('Run', weeks_back=12, min_sessions=len(paces[fewest]) + 1)
+    assert fewest not in [row['client_id'] for row in result['ranking']]
+
+
+@pytest.mark.parametrize("weeks, min_drop_pct", [(3, 25), (4, 0), (2, 100)])
+def test_declining_frequency_matches_per_client_counts(cohort, weeks, min_drop_pct):
+    recent_start = window_start(weeks=weeks)
+    previous_start = (date.today() - timedelta(weeks=2 * weeks)).isoformat()
+    counts = {
+        client_id: rows[0]
+        for client_id, rows in per_client("""
+            SELECT SUM(cardio_date >= :recent), SUM(cardio_date >= :previous AND cardio_date < :recent)
+            FROM cardio
+        """, {'recent': recent_start, 'previous': previous_start}).items()
+    }
+    expected = {
+        client_id: (previous - recent) / previous * 100
+        for client_id, (recent, previous) in counts.items()
+        if previous and (previous - recent) / previous * 100 >= min_drop_pct
+    }
+
+    result = get_declining_frequency(weeks=weeks, min_drop_pct=min_drop_pct)
+    assert result['total_clients'] == len(CLIENTS)
+    assert sorted(row['client_id'] for row in result['declining']) == sorted(expected)
+    assert [row['drop_pct'] for row in result['declining']] == \
+        sorted((row['drop_pct'] for row in result['declining']), reverse=True)
+    for row in result['declining']:
+        recent, previous = counts[row['client_id']]
+        assert row['drop_pct'] == pytest.approx(expected[row['client_id']], abs=0.05)
+        assert row['previous_sessions_per_week'] == pytest.approx(previous / weeks, abs=0.005)
+        assert row['recent_sessions_per_week'] == pytest.approx(recent / weeks, abs=0.005)
+    assert result['inactive_both_windows'] == [
+        client_id for client_id, (recent, previous) in counts.items() if not recent and not previous
+    ]
+    if weeks == 3:
+        assert 2 in expected    # stopped training for the whole recent window
@@ -0,0 +1,118 @@
+# AI Server - tests/test_connection_pool.py
+
+import threading
+import time
+
+import pytest
+
+from tools.db import ConnectionPool, PoolTimeoutError
+
+
+def test_idle_connections_are_reused(client_db):
+    pool = ConnectionPool(client_db, max_size=2)
+    try:
+        first = pool.acquire()
+        pool.release(first)
+        assert pool.acquire() is first
+
+        stats = pool.stats()
+        assert (stats["hits"], stats["misses"], stats["open"], stats["idle"]) == (1, 1, 1, 0)
+        assert stats["hit_ratio"] == 0.5
+    finally:
+        pool.close()
+
+
+def test_connections_are_read_only(client_db):
+    pool = ConnectionPool(client_db)
+    try:
+        conn = pool.acquire()
+        with pytest.raises(Exception, match="readonly|read-only|query_only"):
+            conn.execute("DELETE FROM cardio")
+        pool.release(conn)
+    finally:
+        pool.close()
+
+
+def test_acquire_times_out_when_every_connection_is_out(client_db):
+    pool = ConnectionPool(client_db, max_size=1, timeout=0.05)
+    try:
+        held = pool.acquire()
+        with pytest.raises(PoolTimeoutError):
+            pool.acquire()
+        stats = pool.stats()
+        assert (stats["waits"], stats["timeouts"]) == (1, 1)
+        assert stats["wait_time_total"] >= 0.05
+        pool.release(held)
+    finally:
+        pool.close()
+
+
+def test_waiter_gets_the_released_connection(client_db):
+    pool = ConnectionPool(client_db, max_size=1, timeout=5)
+    try:
+        held = pool.acquire()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+        waiter.start()
+        time.sleep(0.05)
+        assert not got
+        pool.release(held)
+        waiter.join(5)
+
+        assert got == [held]
+        stats = pool.stats()
+        assert (stats["waits"], stats["timeouts"], stats["hits"], stats["misses"]) == (1, 0, 1, 1)
+        pool.release(got[0])
+    finally:
+        pool.close()
+
+
+def test_concurrent_use_never_exceeds_max_size(client_db):
+    pool = ConnectionPool(client_db, max_size=3, timeout=10)
+    in_use, peak, lock = set(), [0], threading.Lock()
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(20):
+                conn = pool.acquire()
+                with lock:
+                    assert conn not in in_use
+                    in_use.add(conn)
+                    peak[0] = max(peak[0], len(in_use))
+                conn.execute("SELECT COUNT(*) FROM cardio").fetchone()
+                with lock:
+                    in_use.discard(conn)
+                pool.release(conn)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert peak[0] <= 3
+        stats = pool.stats()
+        assert stats["hits"] + stats["misses"] == 160
+        assert stats["open"] == stats["idle"] <= 3
+    finally:
+        pool.close()
+
+
+def test_release_after_close_closes_the_connection(client_db):
+    pool = ConnectionPool(client_db, max_size=2)
+    idle, held = pool.acquire(), pool.acquire()
+    pool.release(idle)
+    pool.close()
+    assert pool.stats()["open"] == 1
+
+    pool.release(held)
+    assert pool.stats()["open"] == 0
+    with pytest.raises(Exception, match="closed"):
+        held.execute("SELECT 1")
+    with pytest.raises(RuntimeError, match="closed"):
+        pool.acquire()
@@ -0,0 +1,48 @@
+# AI Server - tests/test_consolidate.py
+
+import pytest
+
+from tools import consolidate
+from tools.db import ConsolidatedBackend
+from tools.session_pyramid import refresh_pyramid
+from tools.session_rollup import refresh_rollups
+from tools.units import normalize
+from tools.volume_aggregates import refresh_volume
+
+CLIENT_ID = 1    # conftest.client_db
+
+
+@pytest.fixture
+def target(client_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(consolidate, "DB_MAP", {CLIENT_ID: client_db})
+    return str(tmp_path / "cardio.db")
+
+
+def test_import_before_build_steps_fails_verification(target):
+    consolidate.consolidate(target, [CLIENT_ID])
+
+    backend = ConsolidatedBackend(target)
+    try:
+        with pytest.raises(RuntimeError, match="cardio_session_rollup is missing"):
+            backend.verify()
+    finally:
+        backend.close()
+
+
+def test_import_after_build_steps_serves_derived_tables(target):
+    normalize(CLIENT_ID)
+    refresh_rollups(CLIENT_ID)
+    refresh_pyramid(CLIENT_ID)
+    refresh_volume(CLIENT_ID)
+    consolidate.consolidate(target, [CLIENT_ID])
+
+    backend = ConsolidatedBackend(target)
+    try:
+        backend.verify()
+        with backend.connection(CLIENT_ID) as conn:
+            rollups = conn.execute("SELECT COUNT(*) FROM cardio_session_rollup").fetchone()[0]
+            sessions = conn.execute("SELECT COUNT(*) FROM cardio").fetchone()[0]
+        assert rollups == sessions == 60
+    finally:
+        backend.close()
+
@@ -0,0 +1,80 @@
+# AI Server - tests/test_response_cache.py
+
+"""
+    Response cache keys: an answer must not be reused across days, data
+    versions or request options that change it.
+"""
+
+import datetime
+
+import pytest
+
+from agents import response_cache
+from agents.cardio_chat_agent import CardioAgent
+from agents.response_cache import ResponseCache
+
+
+class FixedDate(datetime.date):
+    current = datetime.date(2025, 6, 2)
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    """Per-client data versions the test can bump"""
+    current = {1: "v1", 2: "v1"}
+    monkeypatch.setattr(response_cache, "data_version", lambda client_id: current[client_id])
+    monkeypatch.setattr(response_cache, "date", FixedDate)
+    FixedDate.current = datetime.date(2025, 6, 2)
+    return current
+
+
+def test_key_normalizes_the_question(versions):
+    cache = ResponseCache(max_bytes=1 << 20, ttl_seconds=None)
+    assert cache.key("Weekly mileage?", 1) == cache.key("  weekly   MILEAGE ", 1)
+
+
+def test_answer_expires_at_midnight(versions):
+    cache = ResponseCache(max_bytes=1 << 20, ttl_seconds=900)
+    cache.set(cache.key("How far this week?", 1), {"answer": "12 km"}, {})
+    assert cache.get(cache.key("How far this week?", 1))["data"] == {"answer": "12 km"}
+
+    FixedDate.current = datetime.date(2025, 6, 3)
+    assert cache.get(cache.key("How far this week?", 1)) is None
+
+
+def test_new_data_version_misses(versions):
+    cache = ResponseCache(max_bytes=1 << 20, ttl_seconds=None)
+    cache.set(cache.key("Weekly mileage", 1), {"answer": "old"}, {})
+    versions[1] = "v2"
+    assert cache.get(cache.key("Weekly mileage", 1)) is None
+
+
+def test_keys_are_per_client(versions):
+    cache = ResponseCache(max_bytes=1 << 20, ttl_seconds=None)
+    assert cache.key("Weekly mileage", 1) != cache.key("Weekly mileage", 2)
+
+
+def request(**overrides):
+    return {"question": "Weekly mileage?", "client_id": 1, **overrides}
+
+
+def test_agent_key_separates_answer_options(versions):
+    _, default = CardioAgent._cache_key(request())
+    assert CardioAgent._cache_key(request(temperature="0.3", max_iterations=15))[1] == default
+    assert CardioAgent._cache_key(request(temperature=0.9))[1] != default
+    assert CardioAgent._cache_key(request(max_iterations=3))[1] != default
+    assert CardioAgent._cache_key(request(use_templates=False))[1] != default
+
+
+@pytest.mark.parametrize("data", [
+    request(conversation_history='[{"role": "user", "content": "hi"}]'),
+    request(use_cache=False),
+    request(client_id="not a number"),
+    {"client_id": 1},
+])
+def test_uncacheable_requests(versions, data):
+    assert CardioAgent._cache_key(data) == (None, None)
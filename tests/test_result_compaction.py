@@ -0,0 +1,121 @@
+# AI Server - tests/test_result_compaction.py
+
+"""
+    A compacted tool result must say the same thing as the full one: with
+    the tables expanded back into records, every value is the original,
+    rounded by its field's rule, and truncated tables keep their first and
+    last rows and summarize the rest exactly.
+"""
+
+import inspect
+import json
+
+import pytest
+
+from agents.result_compaction import compact_result, compact_value, round_field
+from core.agents.tokens import count_tokens
+from tools import cardio_tools
+
+CLIENT_ID = 1    # conftest.client_db
+
+MODEL = "gpt-4o-mini"
+
+TOOLS = {
+    name: func
+    for name, func in inspect.getmembers(cardio_tools, inspect.isfunction)
+    if func.__module__ == cardio_tools.__name__ and not name.startswith('_')
+}
+
+
+@pytest.fixture
+def results(db):
+    """Every cardio tool's full result for the client, keyed by tool name"""
+    latest, previous = [row[0] for row in db.execute("SELECT id FROM cardio ORDER BY cardio_date DESC LIMIT 2")]
+    args = {
+        'client_id': CLIENT_ID, 'cardio_id': latest, 'cardio_id_1': latest, 'cardio_id_2': previous,
+        'date': db.execute("SELECT MAX(cardio_date) FROM cardio").fetchone()[0],
+        'cardio_type': 'Run', 'cardio_type_1': 'Run', 'cardio_type_2': 'Ride',
+        'weeks': 16, 'weeks_back': 16,
+    }
+    return {
+        name: func(**{p: args[p] for p in inspect.signature(func).parameters if p in args})
+        for name, func in TOOLS.items()
+    }
+
+
+def expand(value):
+    """Undo the table encoding: {"columns", "rows"} back to a list of records"""
+    if isinstance(value, dict) and 'columns' in value and 'rows' in value:
+        return [
+            {column: expand(cell) for column, cell in zip(value['columns'], row) if cell is not None}
+            for row in value['rows']
+        ]
+    if isinstance(value, dict):
+        return {key: expand(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand(item) for item in value]
+    return value
+
+
+def assert_equivalent(full, compact, field=None, path="result"):
+    if isinstance(full, float):
+        assert compact == round_field(field, full), path
+        if compact is not None:
+            assert abs(compact - full) <= 0.5, path
+    elif isinstance(full, dict):
+        present = {key for key, value in full.items() if value is not None and value == value}
+        assert set(compact) == present, path
+        for key in present:
+            assert_equivalent(full[key], compact[key], key, f"{path}.{key}")
+    elif isinstance(full, (list, tuple)):
+        assert len(compact) == len(full), path
+        for i, (full_item, compact_item) in enumerate(zip(full, compact)):
+            assert_equivalent(full_item, compact_item, field, f"{path}[{i}]")
+    else:
+        assert compact == full, path
+
+
+def test_every_tool_result_survives_compaction(results):
+    for name, result in results.items():
+        assert_equivalent(result, expand(compact_value(result)), path=name)
+
+
+def test_compact_result_is_the_compacted_value_within_budget(results):
+    shrunk = 0
+    for name, result in results.items():
+        content, stats = compact_result(name, result, MODEL)
+        assert stats['raw_tokens'] == count_tokens(json.dumps(result, default=str), MODEL)
+        assert stats['tokens'] == count_tokens(content, MODEL)
+        assert stats['tokens'] <= stats['raw_tokens'], name
+        assert json.loads(content) == compact_value(result, max_rows=stats['max_rows']), name
+        if stats['max_rows'] is None:
+            assert_equivalent(result, expand(json.loads(content)), path=name)
+        else:
+            shrunk += 1
+            assert not stats['over_budget'] or stats['max_rows'] == 2, name
+    assert shrunk, "no tool result was long enough to need truncation"
+
+
+def test_truncated_table_keeps_ends_and_summarizes_every_row(results):
+    sessions = results['get_cardio_history']['sessions']
+    assert len(sessions) > 6
+
+    table = compact_value(results['get_cardio_history'], max_rows=6)['sessions']
+    assert table['omitted_rows'] == len(sessions) - 6
+    kept = expand({'columns': table['columns'], 'rows': table['rows']})
+    assert_equivalent(sessions[:3] + sessions[-3:], kept, path="sessions")
+
+    for column, stats in table['summary'].items():
+        values = [s[column] for s in sessions if isinstance(s[column], (int, float)) and not isinstance(s[column], bool)]
+        assert stats == {
+            'min': round_field(column, min(values)),
+            'max': round_field(column, max(values)),
+            'mean': round_field(column, sum(values) / len(values)),
+        }, column
+    assert 'cardio_id' not in table['summary']
+    assert {'distance', 'duration', 'pace_sec_per_km'} <= set(table['summary'])
+
+
+def test_truncated_plain_list_keeps_ends_and_counts_the_rest():
+    assert compact_value(list(range(30)), max_rows=4) == [0, 1, 28, 29, "... 26 more"]
+    assert compact_value(list(range(3)), max_rows=4) == [0, 1, 2]
@@ -0,0 +1,93 @@
+# AI Server - tests/test_session_pyramid.py
+
+"""
+    Pyramid freshness: a stored level must not outlive the buckets it was
+    built from, and stored and live levels hold the same float32 columns.
+"""
+
+import numpy as np
+
+from tools.db import get_connection
+from tools.session_pyramid import FIELDS, LEVELS, PYRAMID_TABLE, build_levels, load_levels, refresh_pyramid, unpack
+from tools.session_stream import load_series
+
+CLIENT_ID = 1    # conftest.client_db
+
+
+def stored(cardio_id, level):
+    """The stored row's columns, fresh or not (None when there is no row)"""
+    with get_connection(CLIENT_ID) as conn:
+        row = conn.execute(
+            f"SELECT intervals, data FROM {PYRAMID_TABLE} WHERE cardio_id = ? AND level = ?", (cardio_id, level)
+        ).fetchone()
+    return unpack(row['data'], row['intervals']) if row else None
+
+
+def built(session):
+    """Every level downsampled from the session's current buckets"""
+    with get_connection(CLIENT_ID) as conn:
+        series = load_series(conn, CLIENT_ID, [session['cardio_id']])[session['cardio_id']]
+    return build_levels(series, session['distance'])
+
+
+def assert_columns_equal(got, want):
+    for field in FIELDS:
+        assert got[field].dtype == np.float32, field
+        np.testing.assert_array_equal(got[field], want[field], err_msg=field)
+
+
+def test_buckets_landing_after_the_cardio_row_invalidate_the_pyramid(db):
+    cardio_id = db.execute("SELECT MAX(id) FROM cardio").fetchone()[0]
+    session = {'cardio_id': cardio_id, 'distance': db.execute(
+        "SELECT distance FROM cardio WHERE id = ?", (cardio_id,)).fetchone()[0]}
+    late = db.execute(
+        "SELECT * FROM aggregated_cardio_session_data WHERE cardio_id = ? ORDER BY bucket_start LIMIT -1 OFFSET 5",
+        (cardio_id,),
+    ).fetchall()
+    db.execute(
+        "DELETE FROM aggregated_cardio_session_data WHERE id IN (%s)" % ",".join(str(row["id"]) for row in late)
+    )
+    refresh_pyramid(CLIENT_ID)
+    early = built(session)
+    for level in LEVELS:
+        assert_columns_equal(stored(cardio_id, level), early[level])
+    assert stored(cardio_id, '10s')['buckets'].sum() == 5
+
+    # The rest of the session's buckets arrive; cardio.updated_at is untouched
+    columns = list(late[0].keys())
+    db.executemany(
+        f"INSERT INTO aggregated_cardio_session_data ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [tuple(row) for row in late],
+    )
+    full = built(session)
+    assert full['10s']['buckets'].sum() == 5 + len(late)
+    with get_connection(CLIENT_ID) as conn:
+        for level in LEVELS:
+            # Computed live from every bucket, not the stale stored row
+            assert_columns_equal(load_levels(conn, CLIENT_ID, [session], level)[cardio_id], full[level])
+
+    assert refresh_pyramid(CLIENT_ID)["built"] == 1
+    for level in LEVELS:
+        assert_columns_equal(stored(cardio_id, level), full[level])
+    assert refresh_pyramid(CLIENT_ID)["built"] == 0
+
+
+def test_table_from_before_bucket_count_is_rebuilt(db):
+    db.execute(f"""
+        CREATE TABLE {PYRAMID_TABLE} (
+            cardio_id INTEGER NOT NULL, level TEXT NOT NULL, source_updated_at TIMESTAMP,
+            intervals INTEGER NOT NULL, data BLOB NOT NULL, built_at TIMESTAMP,
+            PRIMARY KEY (cardio_id, level)
+        )
+    """)
+    db.execute(f"""
+        INSERT INTO {PYRAMID_TABLE} (cardio_id, level, source_updated_at, intervals, data)
+        SELECT id, '10s', updated_at, 0, X'' FROM cardio
+    """)
+    with get_connection(CLIENT_ID) as conn:
+        session = conn.execute("SELECT id AS cardio_id, distance FROM cardio LIMIT 1").fetchone()
+        levels = load_levels(conn, CLIENT_ID, [dict(session)], '10s')
+    assert len(levels[session['cardio_id']]['buckets']) > 0
+
+    assert refresh_pyramid(CLIENT_ID)["built"] == 60
+    assert refresh_pyramid(CLIENT_ID)["built"] == 0
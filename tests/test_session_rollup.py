@@ -0,0 +1,44 @@
+# AI Server - tests/test_session_rollup.py
+
+"""
+    Rollup freshness: a row must not outlive the buckets it was built from.
+"""
+
+from tools.db import get_connection
+from tools.session_rollup import load_rollups, refresh_rollups
+
+CLIENT_ID = 1    # conftest.client_db
+
+
+def test_buckets_landing_after_the_cardio_row_invalidate_the_rollup(db):
+    cardio_id = db.execute("SELECT MAX(id) FROM cardio").fetchone()[0]
+    late = db.execute(
+        "SELECT * FROM aggregated_cardio_session_data WHERE cardio_id = ? ORDER BY bucket_start LIMIT -1 OFFSET 5",
+        (cardio_id,),
+    ).fetchall()
+    db.execute(
+        "DELETE FROM aggregated_cardio_session_data WHERE cardio_id = ? AND id IN (%s)"
+        % ",".join(str(row["id"]) for row in late),
+        (cardio_id,),
+    )
+    refresh_rollups(CLIENT_ID)
+    with get_connection(CLIENT_ID) as conn:
+        assert load_rollups(conn, [cardio_id])[cardio_id]["bucket_count"] == 5
+
+    # The rest of the session's buckets arrive; cardio.updated_at is untouched
+    columns = list(late[0].keys())
+    db.executemany(
+        f"INSERT INTO aggregated_cardio_session_data ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [tuple(row) for row in late],
+    )
+    with get_connection(CLIENT_ID) as conn:
+        assert cardio_id not in load_rollups(conn, [cardio_id])
+
+    assert refresh_rollups(CLIENT_ID)["built"] == 1
+    with get_connection(CLIENT_ID) as conn:
+        assert load_rollups(conn, [cardio_id])[cardio_id]["bucket_count"] == 5 + len(late)
+
+
+def test_second_refresh_is_a_no_op(client_db):
+    assert refresh_rollups(CLIENT_ID)["built"] == 60
+    assert refresh_rollups(CLIENT_ID)["built"] == 0
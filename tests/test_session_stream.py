@@ -0,0 +1,68 @@
+# AI Server - tests/test_session_stream.py
+
+"""
+    The exported stream serves a session only while it still matches the
+    database: SessionStream.get() refuses a different bucket count or
+    updated_at stamp, and load_series() then reads SQLite instead.
+"""
+
+import numpy as np
+
+from tools.db import get_connection
+from tools.session_stream import (
+    STREAM_FIELDS, export_stream, load_bucket_rows, load_series, open_stream, rows_to_series,
+)
+
+CLIENT_ID = 1    # conftest.client_db
+
+
+def assert_series_equal(got, want):
+    for field, dtype in STREAM_FIELDS:
+        assert got[field].dtype == np.dtype(dtype), field
+        np.testing.assert_array_equal(got[field], want[field], err_msg=field)
+
+
+def from_sqlite(cardio_id):
+    with get_connection(CLIENT_ID) as conn:
+        return rows_to_series(load_bucket_rows(conn, [cardio_id]))
+
+
+def is_mapped(series, stream):
+    """Whether every field is a view into the mapped stream file"""
+    return all(np.shares_memory(series[field], stream.columns[field]) for field, _ in STREAM_FIELDS)
+
+
+def test_get_refuses_a_session_whose_buckets_changed(db):
+    cardio_id, other = [row[0] for row in db.execute("SELECT id FROM cardio ORDER BY id DESC LIMIT 2")]
+    late = db.execute(
+        "SELECT * FROM aggregated_cardio_session_data WHERE cardio_id = ? ORDER BY bucket_start LIMIT -1 OFFSET 5",
+        (cardio_id,),
+    ).fetchall()
+    db.execute(
+        "DELETE FROM aggregated_cardio_session_data WHERE id IN (%s)" % ",".join(str(row["id"]) for row in late)
+    )
+    export_stream(CLIENT_ID)
+    stream = open_stream(CLIENT_ID)
+
+    exported = stream.get(cardio_id)
+    assert is_mapped(exported, stream)
+    assert_series_equal(exported, from_sqlite(cardio_id))
+    assert stream.get(cardio_id, buckets=5) is not None
+    assert stream.get(cardio_id, buckets=5 + len(late)) is None
+    assert stream.get(cardio_id, stamp=12345, buckets=5) is None
+    assert stream.get(-1) is None
+
+    # The rest of the session's buckets arrive; cardio.updated_at is untouched
+    columns = list(late[0].keys())
+    db.executemany(
+        f"INSERT INTO aggregated_cardio_session_data ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [tuple(row) for row in late],
+    )
+    with get_connection(CLIENT_ID) as conn:
+        series = load_series(conn, CLIENT_ID, [cardio_id, other])
+    assert not is_mapped(series[cardio_id], stream)
+    assert len(series[cardio_id]['bucket_start_ms']) == 5 + len(late)
+    assert_series_equal(series[cardio_id], from_sqlite(cardio_id))
+    # Untouched sessions are still served from the map
+    assert is_mapped(series[other], stream)
+    assert_series_equal(series[other], from_sqlite(other))
@@ -0,0 +1,117 @@
+# AI Server - tests/test_template_router.py
+
+"""
+    Slot extraction and binding, and two-stage routing with a stand-in
+    encoder (bag of hashed words), so no sentence-transformers model is needed.
+"""
+
+import hashlib
+from datetime import date
+
+import numpy as np
+import pytest
+
+from agents import template_router
+from agents.template_router import TEMPLATE_BANK, TemplateRouter, bind_slots, extract_slots
+from config import Settings
+from core.embedding_store import EmbeddingStore
+
+
+def template(category, name):
+    return TEMPLATE_BANK[category]["templates"][name]
+
+
+WEEKLY = template("volume", "weekly_mileage")
+MONTHLY = template("volume", "monthly_volume")
+FREQUENCY = template("frequency", "sessions_per_week")
+BREAKDOWN = template("distribution", "cardio_type_breakdown")
+
+
+class WordEncoder:
+    """Hashed bag-of-words vectors: shared words mean higher similarity"""
+
+    def encode(self, texts, **kwargs):
+        vectors = np.zeros((len(texts), 256), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().replace("?", "").split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % 256] += 1
+        return vectors
+
+
+@pytest.fixture
+def router(tmp_path):
+    return TemplateRouter(WordEncoder(), store=EmbeddingStore("bank", store_dir=tmp_path))
+
+
+def test_binds_type_window_and_unit():
+    args, unit, unbound = bind_slots(WEEKLY, extract_slots("Miles per week cycling over the last 2 weeks"))
+    assert args == {"weeks": 2, "cardio_type": "Ride"}
+    assert unit == "mi"
+    assert unbound == []
+
+
+def test_defaults_without_modifiers():
+    assert bind_slots(WEEKLY, extract_slots("What's the weekly mileage?")) == ({"weeks": 4}, "km", [])
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Distance by month over the past year", 12),
+    ("Monthly volume for the last 6 months", 6),
+    ("Monthly volume this month", 1),
+    ("Monthly volume this year", date.today().month),
+])
+def test_month_windows(question, expected):
+    args, _, unbound = bind_slots(MONTHLY, extract_slots(question))
+    assert unbound == []
+    assert args["months"] == expected
+
+
+@pytest.mark.parametrize("question, slot", [
+    ("Total distance this month", "window"),             # Calendar month on a trailing-weeks tool
+    ("Weekly mileage last week", "window"),
+    ("Weekly mileage over the last 10 days", "window"),  # Not a whole number of weeks
+    ("Weekly mileage since March", "window"),
+    ("Is weekly mileage higher than in spring?", "compare"),
+    ("Weekly mileage in km and miles", "unit"),
+    ("Weekly mileage for running and cycling", "cardio_type"),
+])
+def test_unbindable_modifiers_fall_back(question, slot):
+    assert slot in bind_slots(WEEKLY, extract_slots(question))[2]
+
+
+def test_type_filter_on_untyped_tool_falls_back():
+    assert bind_slots(FREQUENCY, extract_slots("How many runs per week?"))[2] == ["cardio_type"]
+
+
+def test_breakdown_covers_types_and_comparisons():
+    args, _, unbound = bind_slots(BREAKDOWN, extract_slots("Running vs cycling breakdown over 8 weeks"))
+    assert unbound == []
+    assert args == {"weeks": 8}
+
+
+def test_in_a_row_is_not_rowing():
+    assert extract_slots("How many days in a row did they train?")["cardio_types"] == set()
+
+
+def test_routes_category_then_template(router):
+    route = router.match("Heart rate trends for cycling")
+    assert (route["category"], route["template"]) == ("intensity", "heart_rate_trend")
+    assert route["matched"]
+    assert route["args"] == {"weeks_back": 12, "cardio_type": "Ride"}
+
+
+def test_confident_match_with_unbound_slot_is_not_matched(router):
+    route = router.match("Heart rate trends this week")
+    assert route["template"] == "heart_rate_trend"
+    assert route["confidence"] >= router.template_threshold
+    assert route["unbound"] == ["window"]
+    assert not route["matched"]
+
+
+def test_router_is_on_by_default_and_steps_aside_without_an_encoder(monkeypatch):
+    settings = Settings()
+    assert settings.template_router_enabled
+    monkeypatch.setattr(template_router, "get_settings", lambda: settings)
+    monkeypatch.setattr(template_router, "get_encoder", lambda: None)
+    monkeypatch.setattr(template_router, "_router", None)
+    assert template_router.get_template_router() is None
@@ -0,0 +1,186 @@
+# AI Server - tests/test_tool_cache.py
+
+"""
+    Tool result cache: keys must change with the date and the data version,
+    and single-flight must hand every waiter the owner's outcome, errors
+    included, without caching failures.
+"""
+
+import datetime
+import threading
+import time
+
+import pytest
+
+from agents import tool_cache
+from agents.tool_cache import ToolResultCache
+
+
+class FixedDate(datetime.date):
+    current = datetime.date(2025, 6, 2)
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    """Data versions per client (None = every client) that a test can bump"""
+    current = {1: "v1", 2: "v1", None: "all-v1"}
+    monkeypatch.setattr(tool_cache, "data_version", lambda client_id=None: current[client_id])
+    monkeypatch.setattr(tool_cache, "date", FixedDate)
+    FixedDate.current = datetime.date(2025, 6, 2)
+    return current
+
+
+@pytest.fixture
+def cache():
+    return ToolResultCache(max_bytes=1 << 20)
+
+
+class CountingTool:
+    """get_weekly_mileage-shaped tool that counts its calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, client_id: int, cardio_type: str = None, weeks: int = 4):
+        self.calls += 1
+        return {"client_id": client_id, "weeks": weeks, "call": self.calls}
+
+
+def test_defaults_and_argument_order_share_a_key(versions, cache):
+    tool = CountingTool()
+    cached = cache.wrap("get_weekly_mileage", tool)
+    assert cached(1) == cached(client_id=1, weeks=4) == cached(1, None, 4)
+    assert tool.calls == 1
+    assert cached(1, weeks=8)["call"] == 2
+
+
+def test_new_day_misses(versions, cache):
+    tool = CountingTool()
+    cached = cache.wrap("get_weekly_mileage", tool)
+    cached(1)
+    FixedDate.current = datetime.date(2025, 6, 3)
+    assert cached(1)["call"] == 2
+
+
+def test_new_data_version_misses_only_for_that_client(versions, cache):
+    tool = CountingTool()
+    cached = cache.wrap("get_weekly_mileage", tool)
+    cached(1)
+    cached(2)
+    versions[1] = "v2"
+    assert cached(1)["call"] == 3
+    assert cached(2)["call"] == 2
+
+
+def test_client_less_calls_use_the_global_version(versions, cache):
+    calls = []
+
+    def get_cardio_session_details(cardio_id: int, client_id: int = None):
+        calls.append(cardio_id)
+        return {"cardio_id": cardio_id}
+
+    cached = cache.wrap("get_cardio_session_details", get_cardio_session_details)
+    cached(7)
+    versions[None] = "all-v2"
+    cached(7)
+    assert calls == [7, 7]
+
+
+def test_error_results_are_not_cached(versions, cache):
+    results = iter([{"error": "Session not found"}, {"cardio_id": 7}])
+    cached = cache.wrap("get_cardio_session_details", lambda cardio_id, client_id=None: next(results))
+    assert cached(7, 1) == {"error": "Session not found"}
+    assert cached(7, 1) == {"cardio_id": 7}
+
+
+def run_concurrently(cache, tool_name, func, callers):
+    """Call func through the cache from `callers` threads while the first call is held open"""
+    release = threading.Event()
+    outcomes = [None] * callers
+
+    def held(*args, **kwargs):
+        release.wait(5)
+        return func(*args, **kwargs)
+
+    cached = cache.wrap(tool_name, held)
+
+    def call(i):
+        try:
+            outcomes[i] = ("ok", cached(1))
+        except Exception as e:
+            outcomes[i] = ("error", e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    # Wait until every other caller is parked on the in-flight call
+    deadline = time.monotonic() + 5
+    while cache.stats()["tools"].get(tool_name, {}).get("shared", 0) < callers - 1:
+        assert time.monotonic() < deadline, "callers never joined the in-flight call"
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_calls_run_once(versions, cache):
+    tool = CountingTool()
+    outcomes = run_concurrently(cache, "get_weekly_mileage", tool, callers=8)
+    assert tool.calls == 1
+    assert all(outcome == ("ok", outcomes[0][1]) for outcome in outcomes)
+    assert cache.stats()["tools"]["get_weekly_mileage"] == {
+        "hits": 0, "misses": 1, "shared": 7, "wait_timeouts": 0, "hit_ratio": 7 / 8,
+    }
+
+
+def test_failed_call_raises_for_every_waiter_and_is_retried(versions, cache):
+    attempts = []
+
+    def flaky(client_id: int):
+        attempts.append(client_id)
+        raise RuntimeError("database is locked")
+
+    outcomes = run_concurrently(cache, "get_cardio_frequency", flaky, callers=5)
+    assert len(attempts) == 1
+    assert all(kind == "error" and isinstance(e, RuntimeError) for kind, e in outcomes)
+
+    # Nothing was cached and no call is left in flight: the next call runs the tool
+    assert cache._in_flight == {}
+    with pytest.raises(RuntimeError):
+        cache.wrap("get_cardio_frequency", flaky)(1)
+    assert len(attempts) == 2
+
+
+def test_waiters_give_up_on_a_hung_call(versions):
+    cache = ToolResultCache(max_bytes=1 << 20, wait_timeout=0.05)
+    tool = CountingTool()
+    release = threading.Event()
+
+    def hung(client_id: int):
+        release.wait(5)
+        return tool(client_id)
+
+    cached = cache.wrap("get_weekly_mileage", hung)
+    owner = threading.Thread(target=cached, args=(1,))
+    owner.start()
+    deadline = time.monotonic() + 5
+    while not cache._in_flight:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        cached(1)
+    assert time.monotonic() - started < 1
+    assert cache.stats()["tools"]["get_weekly_mileage"]["wait_timeouts"] == 1
+
+    release.set()
+    owner.join(5)
+    # The owner's result is still cached for later calls
+    assert cached(1)["call"] == 1
+    assert tool.calls == 1
@@ -0,0 +1,90 @@
+# AI Server - tests/test_units.py
+
+"""
+    Unit conventions come from the data and from stored declarations, never
+    from a per-client table in code.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from tools import analytics, cardio_tools, units, volume_aggregates
+from tools.units import normalize
+from tools.volume_aggregates import GRAINS, refresh_volume, volume_totals
+
+CLIENT_ID = 1    # conftest.client_db
+
+
+def conventions(report):
+    return {column: (c['unit'], c['source']) for column, c in report['conventions'].items()}
+
+
+def test_declared_unit_persists_and_rescales(db):
+    report = normalize(CLIENT_ID)
+    assert conventions(report)['distance'] == ('m', 'default')
+    assert all(source != 'declared' for _, source in conventions(report).values())
+
+    distance, distance_m = db.execute("SELECT distance, distance_m FROM cardio WHERE id = 1").fetchone()
+    assert distance_m == pytest.approx(distance)
+
+    report = normalize(CLIENT_ID, declare={'distance': 'km'})
+    assert conventions(report)['distance'] == ('km', 'declared')
+    assert report['rows_updated'] == 60
+    assert db.execute("SELECT distance_m FROM cardio WHERE id = 1").fetchone()[0] == pytest.approx(distance * 1000)
+
+    # Later runs keep the declaration without being told again
+    report = normalize(CLIENT_ID)
+    assert conventions(report)['distance'] == ('km', 'declared')
+    assert report['rows_updated'] == 0
+
+
+def test_unknown_unit_is_rejected(client_db):
+    with pytest.raises(ValueError, match="furlong"):
+        normalize(CLIENT_ID, declare={'distance': 'furlong'})
+
+
+@pytest.fixture
+def uncached(monkeypatch):
+    """File size and mtime can repeat across writes this quick, so don't cache per data version"""
+    monkeypatch.setattr(volume_aggregates, "_fresh_cache", {})
+    for module in (units, volume_aggregates, analytics):
+        monkeypatch.setattr(module, "data_version", lambda client_id: object())
+
+
+def test_declared_distance_and_duration_units_reach_the_tools(db, uncached):
+    refresh_volume(CLIENT_ID)    # aggregated from the raw values, read as m and s
+    normalize(CLIENT_ID, declare={'distance': 'km', 'duration': 'min'})
+
+    since = (date.today() - timedelta(weeks=8)).isoformat()
+    stored = {
+        week: (distance, duration)
+        for week, distance, duration in db.execute(f"""
+            SELECT {GRAINS['week']} AS week, SUM(distance), SUM(duration)
+            FROM cardio WHERE cardio_date >= ? GROUP BY week
+        """, (since,))
+    }
+    km, minutes = (sum(values) for values in zip(*stored.values()))
+
+    def check():
+        mileage = cardio_tools.get_weekly_mileage(CLIENT_ID, weeks=8)
+        assert [week['week_start'] for week in mileage['weekly']] == sorted(stored)
+        for week in mileage['weekly']:
+            assert week['distance_km'] == pytest.approx(stored[week['week_start']][0], abs=0.01)
+            assert week['duration_min'] == pytest.approx(stored[week['week_start']][1], abs=0.01)
+
+        totals = volume_totals(CLIENT_ID, 'month', since)
+        assert sum(t['distance'] for t in totals) == pytest.approx(km * 1000)
+        assert sum(t['duration'] for t in totals) == pytest.approx(minutes * 60)
+
+        history = cardio_tools.get_cardio_history(CLIENT_ID, weeks_back=8)
+        assert history['total_distance_km'] == pytest.approx(km, abs=0.01)
+        assert cardio_tools.get_distance_trends(CLIENT_ID, weeks_back=8)['weekly'][-1]['value'] == \
+            pytest.approx(stored[max(stored)][0], abs=0.01)
+
+    # The declaration emptied the aggregates, so this reads cardio...
+    assert db.execute("SELECT COUNT(*) FROM cardio_volume").fetchone()[0] == 0
+    check()
+    # ...and this the rebuilt aggregates
+    refresh_volume(CLIENT_ID)
+    check()
@@ -0,0 +1,127 @@
+# AI Server - tests/test_volume_aggregates.py
+
+"""
+    volume_totals() and active_days() must equal a direct aggregate of the
+    cardio table after every kind of write, whether they are answered from
+    the aggregates (after a refresh) or from cardio (before one).
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from tools import volume_aggregates
+from tools.db import get_connection
+from tools.volume_aggregates import TOTALS, active_days, period_start, refresh_volume, volume_totals
+
+CLIENT_ID = 1    # conftest.client_db
+
+
+def direct(grain, since, by):
+    """The expected volume_totals() rows, summed in Python from cardio"""
+    totals = {}
+    with get_connection(CLIENT_ID) as conn:
+        rows = conn.execute("""
+            SELECT cardio_date, cardio_type, 1 AS sessions, distance, duration,
+                   calories_burned AS calories, elevation_gain
+            FROM cardio
+            WHERE cardio_date >= ?
+        """, (since,)).fetchall()
+    for row in rows:
+        key = period_start(row['cardio_date'], grain) if by == 'period' else row['cardio_type']
+        group = totals.setdefault(key, dict.fromkeys(TOTALS, 0))
+        for name in TOTALS:
+            group[name] += row[name]
+    return totals
+
+
+def assert_matches_cardio(since):
+    for grain in ('day', 'week', 'month'):
+        for by in ('period', 'cardio_type'):
+            expected = direct(grain, since, by)
+            rows = {row[by]: row for row in volume_totals(CLIENT_ID, grain, since, by=by)}
+            assert sorted(rows) == sorted(expected), (grain, by)
+            for key, totals in expected.items():
+                for name in TOTALS:
+                    assert rows[key][name] == pytest.approx(totals[name]), (grain, by, key, name)
+
+    with get_connection(CLIENT_ID) as conn:
+        days = conn.execute(
+            "SELECT COUNT(DISTINCT date(cardio_date)) FROM cardio WHERE cardio_date >= ?", (since,)
+        ).fetchone()[0]
+    assert active_days(CLIENT_ID, since) == days
+
+
+def is_fresh():
+    with get_connection(CLIENT_ID) as conn:
+        return volume_aggregates._is_fresh(conn, CLIENT_ID)
+
+
+@pytest.fixture(autouse=True)
+def check_freshness_every_call(monkeypatch):
+    """File size and mtime can repeat across writes this quick, so don't cache per data version"""
+    monkeypatch.setattr(volume_aggregates, "_fresh_cache", {})
+    monkeypatch.setattr(volume_aggregates, "data_version", lambda client_id: object())
+
+
+@pytest.fixture
+def since(db):
+    """A Wednesday other than the 1st, so week and month windows start mid-period"""
+    day = date.fromisoformat(db.execute("SELECT MIN(cardio_date) FROM cardio").fetchone()[0]) + timedelta(days=30)
+    while day.weekday() != 2 or day.day == 1:
+        day += timedelta(days=1)
+    return day.isoformat()
+
+
+def session(db, offset=0):
+    """The offset-th most recent session"""
+    return db.execute("SELECT id FROM cardio ORDER BY cardio_date DESC, id DESC LIMIT 1 OFFSET ?",
+                      (offset,)).fetchone()[0]
+
+
+def insert_copy(db, cardio_id, **values):
+    columns = [row[1] for row in db.execute("PRAGMA table_info(cardio)")]
+    row = dict(db.execute("SELECT * FROM cardio WHERE id = ?", (cardio_id,)).fetchone())
+    row.update(id=db.execute("SELECT MAX(id) + 1 FROM cardio").fetchone()[0], **values)
+    db.execute(
+        f"INSERT INTO cardio ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [row[column] for column in columns],
+    )
+
+
+def replace_with_older(db):
+    # Keeps the session count and the latest updated_at: only a per-session
+    # comparison sees the change
+    replaced = session(db, offset=1)
+    insert_copy(db, replaced, cardio_type='Swim', distance=123.0, updated_at='2000-01-01 00:00:00+00:00')
+    db.execute("DELETE FROM cardio WHERE id = ?", (replaced,))
+
+
+MUTATIONS = {
+    'new': lambda db: insert_copy(db, session(db), updated_at='2100-01-01 00:00:00+00:00'),
+    'changed_date': lambda db: db.execute(
+        "UPDATE cardio SET cardio_date = date(cardio_date, '-9 days'), updated_at = '2100-01-01' WHERE id = ?",
+        (session(db),),
+    ),
+    'changed_type': lambda db: db.execute(
+        "UPDATE cardio SET cardio_type = 'Swim', distance = distance / 2, updated_at = '2100-01-01' WHERE id = ?",
+        (session(db),),
+    ),
+    'deleted': lambda db: db.execute("DELETE FROM cardio WHERE id = ?", (session(db),)),
+    'replaced_with_older': replace_with_older,
+}
+
+
+@pytest.mark.parametrize("mutation", list(MUTATIONS))
+def test_totals_match_cardio_after_each_write(db, since, mutation):
+    refresh_volume(CLIENT_ID)
+    assert is_fresh()
+    assert_matches_cardio(since)
+
+    MUTATIONS[mutation](db)
+    assert not is_fresh()
+    assert_matches_cardio(since)
+
+    refresh_volume(CLIENT_ID)
+    assert is_fresh()
+    assert_matches_cardio(since)
@@ -0,0 +1,220 @@
+# AI Server - tools/analytics.py
+
+"""
+    Columnar loader and vectorized kernels behind the trend tools.
+
+    load_columns() pulls every session of a client into NumPy arrays with a
+    single query and keeps them until the client's database changes (keyed
+    on tools.db.data_version), so the six trend tools share one read.
+    load_cohort_columns() concatenates every client's columns for the cohort
+    tools. The kernels work on those arrays directly: weekly binning,
+    least-squares slope, rolling means, percent change and per-group sums.
+"""
+
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from tools.db import client_ids, data_version, get_connection
+from tools.units import column_sql
+
+# Epoch day 0 (1970-01-01) was a Thursday; shift so Monday == 0
+_EPOCH_WEEKDAY_OFFSET = 3
+
+# ==========================================
+# COLUMNAR LOADER
+# ==========================================
+
+_columns_cache: Dict[int, Tuple[str, Dict[str, np.ndarray]]] = {}
+_columns_lock = threading.Lock()
+
+
+def _read_columns(client_id: int) -> Dict[str, np.ndarray]:
+    """One query for all sessions, time-ordered, as NumPy columns"""
+    sql = column_sql(client_id)
+    with get_connection(client_id) as conn:
+        rows = conn.execute(f"""
+            SELECT id, cardio_date, cardio_type, {sql['distance']}, {sql['duration']},
+                   {sql['pace_sec_per_km']}, {sql['speed_kmh']},
+                   {sql['avg_pace_sec_per_km']}, {sql['avg_speed_kmh']},
+                   avg_heart_rate, max_heart_rate, elevation_gain, calories_burned
+            FROM cardio
+            ORDER BY cardio_date, cardio_start_time
+        """).fetchall()
+    return _columns_from_rows(rows)
+
+
+def _columns_from_rows(rows: list) -> Dict[str, np.ndarray]:
+    """NumPy columns from _read_columns() result rows"""
+    if rows:
+        ids, dates, types, *numeric = zip(*rows)
+    else:
+        ids, dates, types, numeric = (), (), (), [()] * 10
+    # None -> NaN
+    distance, duration, pace, speed, avg_pace, avg_speed, avg_hr, max_hr, elevation, calories = (
+        np.array(col, dtype=np.float64) for col in numeric
+    )
+    # 0 heart rate means "not recorded"
+    avg_hr[avg_hr == 0] = np.nan
+    max_hr[max_hr == 0] = np.nan
+
+    return {
+        'cardio_id': np.array(ids, dtype=np.int64),
+        'cardio_date': np.array(dates, dtype=object),
+        'day': np.array([d[:10] for d in dates], dtype='datetime64[D]'),
+        'cardio_type': np.array(types, dtype=object),
+        'distance': distance,
+        'duration': duration,
+        'pace_sec_per_km': pace,
+        'speed_kmh': speed,
+        'avg_pace_sec_per_km': avg_pace,
+        'avg_speed_kmh': avg_speed,
+        'avg_heart_rate': avg_hr,
+        'max_heart_rate': max_hr,
+        'distance_km': distance / 1000.0,
+        'duration_min': duration / 60.0,
+        'elevation_gain_m': elevation,
+        'calories_burned': calories,
+    }
+
+
+def load_columns(client_id: int) -> Dict[str, np.ndarray]:
+    """
+    All of a client's sessions as NumPy columns (read-only, shared).
+
+    Reloaded only when the database's data version changes.
+    """
+    version = data_version(client_id)
+    cached = _columns_cache.get(client_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    columns = _read_columns(client_id)
+    for array in columns.values():
+        array.flags.writeable = False
+    with _columns_lock:
+        _columns_cache[client_id] = (version, columns)
+    return columns
+
+
+_cohort_cache: Tuple[Optional[str], Optional[Dict[str, np.ndarray]]] = (None, None)
+
+
+def load_cohort_columns() -> Dict[str, np.ndarray]:
+    """
+    Every client's sessions as one set of columns, plus a client_id column.
+
+    Built from the per-client cached columns and rebuilt when any client's
+    data version changes.
+    """
+    global _cohort_cache
+    version = data_version()
+    cached_version, cohort = _cohort_cache
+    if cohort is not None and cached_version == version:
+        return cohort
+
+    ids = client_ids()
+    parts = [load_columns(client_id) for client_id in ids]
+    if parts:
+        cohort = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    else:
+        cohort = _columns_from_rows([])
+    cohort['client_id'] = np.repeat(np.array(ids, dtype=np.int64), [len(part['cardio_id']) for part in parts])
+    for array in cohort.values():
+        array.flags.writeable = False
+    with _columns_lock:
+        _cohort_cache = (version, cohort)
+    return cohort
+
+
+def select(
+    columns: Dict[str, np.ndarray],
+    metric: str,
+    since: Optional[str] = None,
+    cardio_type: Optional[str] = None,
+) -> np.ndarray:
+    """Boolean mask of sessions in the window with a value for metric"""
+    mask = ~np.isnan(columns[metric])
+    if since:
+        mask &= columns['day'] >= np.datetime64(since[:10], 'D')
+    if cardio_type:
+        mask &= columns['cardio_type'] == cardio_type
+    return mask
+
+
+# ==========================================
+# KERNELS
+# ==========================================
+
+def week_starts(days: np.ndarray) -> np.ndarray:
+    """Monday of each date's week (datetime64[D] in, datetime64[D] out)"""
+    day_numbers = days.astype(np.int64)
+    return (day_numbers - (day_numbers + _EPOCH_WEEKDAY_OFFSET) % 7).astype('datetime64[D]')
+
+
+def weekly_aggregate(days: np.ndarray, values: np.ndarray, how: str = 'avg') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Bin values by calendar week (Monday start).
+
+    Returns:
+        (week_start, value, sessions) arrays, one entry per non-empty week,
+        in week order; value is the sum or mean of the week's values
+    """
+    weeks, inverse = np.unique(week_starts(days), return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(weeks))
+    sums = np.bincount(inverse, weights=values, minlength=len(weeks))
+    return weeks, (sums if how == 'sum' else sums / counts), counts
+
+
+def least_squares_slope(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    """Least-squares slope of y over x, or None if undefined"""
+    if len(x) < 2:
+        return None
+    dx = x - x.mean()
+    denom = np.dot(dx, dx)
+    if denom == 0:
+        return None
+    return float(np.dot(dx, y - y.mean()) / denom)
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over up to `window` values (shorter at the start)"""
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (csum[ends] - csum[starts]) / (ends - starts)
+
+
+def percent_change(first: float, last: float) -> Optional[float]:
+    """Change from first to last in percent, None when first is 0"""
+    return float((last - first) / first * 100) if first else None
+
+
+def group_sums(groups: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(group, sum, count) arrays, one entry per distinct group, in group order"""
+    keys, inverse = np.unique(groups, return_inverse=True)
+    sums = np.bincount(inverse, weights=values, minlength=len(keys))
+    return keys, sums, np.bincount(inverse, minlength=len(keys))
+
+
+def group_medians(groups: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(group, median, count) arrays, one entry per distinct group, in group order"""
+    order = np.lexsort((values, groups))
+    values = values[order]
+    keys, starts, counts = np.unique(groups[order], return_index=True, return_counts=True)
+    medians = (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2
+    return keys, medians, counts
+
+
+def percentile_rank(values: np.ndarray, lower_is_better: bool = False) -> np.ndarray:
+    """Percent of the other values each value beats (100 = best; 100 for a lone value)"""
+    n = len(values)
+    if n < 2:
+        return np.full(n, 100.0)
+    ordered = np.sort(values)
+    if lower_is_better:
+        beaten = n - np.searchsorted(ordered, values, side='right')
+    else:
+        beaten = np.searchsorted(ordered, values, side='left')
+    return beaten / (n - 1) * 100
@@ -1,15 +1,188 @@
 # AI Server - tools/cardio_tools.py
 
 """
-    Task: Need to have these functions run on the databases from /data
+    Cardio tools - run against the per-client SQLite databases in /data.
+
+    Every tool borrows a pooled, read-only connection from tools.db instead of
+    opening its own, so the 3-6 tool calls behind one question reuse warm
+    connections. The storage backend scopes each connection to one client
+    (its own database file, or client_id-filtered views over the consolidated
+    database), so queries do not filter on the (unreliable) client_id column.
 """
 
-# Database paths
-DB_MAP = {
-    1: 'data/client_1_cardio.db',
-    2: 'data/client_2_cardio.db',
-    3: 'data/client_3_cardio.db'
-}
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tools import analytics
+from tools.db import client_ids, get_connection
+from tools.filters import stored_cardio_type, window_start
+from tools.units import column_sql
+from tools.session_rollup import SPLIT_METERS, compute_session_stats, load_rollups
+from tools.session_stream import load_series
+from tools.session_pyramid import choose_level, load_levels
+from tools.volume_aggregates import active_days, volume_totals
+
+# ==========================================
+# CONSTANTS
+# ==========================================
+# Split units accepted by get_split_analysis -> split length in meters
+SPLIT_UNITS = {'km': 1000.0, 'mile': 1609.344}
+
+ALTITUDE_BANDS = ('low', 'mid', 'high')
+
+
+def _session_columns(client_id: int) -> str:
+    """
+    Select list shared by the session-level tools. Distance (m), duration
+    (s), pace and speed come from the canonical columns written by
+    tools.units (or the raw columns until the database has been normalized).
+    """
+    sql = column_sql(client_id)
+    return f"""
+        id AS cardio_id, cardio_name, cardio_type, cardio_date, cardio_start_time,
+        {sql['duration']} AS duration, {sql['distance']} AS distance,
+        {sql['pace_sec_per_km']} AS pace_sec_per_km, {sql['speed_kmh']} AS speed_kmh,
+        {sql['avg_pace_sec_per_km']} AS avg_pace_sec_per_km, {sql['avg_speed_kmh']} AS avg_speed_kmh,
+        NULLIF(avg_heart_rate, 0) AS avg_heart_rate,
+        NULLIF(max_heart_rate, 0) AS max_heart_rate,
+        elevation_gain, calories_burned, notes
+    """
+
+# ==========================================
+# HELPERS
+# ==========================================
+
+def _query(client_id: int, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+    """Run a read-only query against a client's database"""
+    with get_connection(client_id) as conn:
+        return [_round_row(dict(row)) for row in conn.execute(sql, params)]
+
+
+def _round_row(row: Dict[str, Any], digits: int = 2) -> Dict[str, Any]:
+    """Round float columns so results stay compact"""
+    return {k: round(v, digits) if isinstance(v, float) else v for k, v in row.items()}
+
+
+def _session_filter(
+    cardio_type: Optional[str] = None,
+    since: Optional[str] = None,
+    extra: Optional[List[str]] = None,
+) -> Tuple[str, tuple]:
+    """Build the WHERE clause shared by the session-level tools"""
+    clauses, params = list(extra or []), []
+    cardio_type = stored_cardio_type(cardio_type)
+    if cardio_type:
+        clauses.append("cardio_type = ?")
+        params.append(cardio_type)
+    if since:
+        clauses.append("cardio_date >= ?")
+        params.append(since)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, tuple(params)
+
+
+def _resolve_session_client(cardio_id: int, client_id: Optional[int] = None) -> Optional[int]:
+    """Find which client database holds a cardio session"""
+    candidates = [client_id] if client_id is not None else client_ids()
+    for candidate in candidates:
+        rows = _query(candidate, "SELECT 1 FROM cardio WHERE id = ? LIMIT 1", (cardio_id,))
+        if rows:
+            return candidate
+    return None
+
+
+def _get_session(cardio_id: int, client_id: Optional[int] = None) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+    """Load a session row and the client it belongs to"""
+    client_id = _resolve_session_client(cardio_id, client_id)
+    if client_id is None:
+        return None, None
+    rows = _query(client_id, f"SELECT {_session_columns(client_id)} FROM cardio WHERE id = ?", (cardio_id,))
+    return client_id, rows[0]
+
+
+def _session_split_stats(client_id: int, session: Dict[str, Any]) -> Dict[str, Any]:
+    """Derived split and pacing stats for one session"""
+    return _sessions_split_stats(client_id, [session])[session['cardio_id']]
+
+
+def _sessions_split_stats(client_id: int, sessions: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """
+    Split and pacing stats for many sessions, keyed by cardio_id.
+
+    Reads one cardio_session_rollup row per session; only sessions without
+    a fresh rollup row fall back to their bucket series (tools.session_stream).
+    """
+    with get_connection(client_id) as conn:
+        stats = load_rollups(conn, [s['cardio_id'] for s in sessions])
+        missing = [s for s in sessions if s['cardio_id'] not in stats]
+        series = load_series(conn, client_id, [s['cardio_id'] for s in missing])
+        for session in missing:
+            stats[session['cardio_id']] = compute_session_stats(series[session['cardio_id']], session['distance'])
+    return stats
+
+
+def _trend(
+    client_id: int,
+    metric: str,
+    cardio_type: Optional[str],
+    weeks_back: int,
+    weekly: str = 'avg',
+    lower_is_better: bool = False,
+) -> Dict[str, Any]:
+    """
+    Shared engine for the trend tools: per-session values, weekly
+    aggregates, a least-squares slope per week and a 3-session rolling average.
+
+    Works on the client's cached columns (tools.analytics), so the trend
+    tools share one query per database version.
+    """
+    columns = analytics.load_columns(client_id)
+    mask = analytics.select(columns, metric, window_start(weeks=weeks_back), stored_cardio_type(cardio_type))
+    values = columns[metric][mask]
+    days = columns['day'][mask]
+
+    result = {
+        'client_id': client_id,
+        'metric': metric,
+        'cardio_type': stored_cardio_type(cardio_type),
+        'weeks_back': weeks_back,
+        'sessions': int(mask.sum()),
+    }
+    if not len(values):
+        result['message'] = 'No sessions in this period'
+        return result
+
+    weeks, weekly_values, counts = analytics.weekly_aggregate(days, values, weekly)
+    slope = analytics.least_squares_slope((days - days[0]).astype(np.float64) / 7, values)
+    rolling = analytics.rolling_mean(values, 3)
+    change_pct = analytics.percent_change(weekly_values[0], weekly_values[-1])
+
+    if slope is None or abs(slope) < 1e-9:
+        direction = 'flat'
+    elif (slope < 0) == lower_is_better:
+        direction = 'improving'
+    else:
+        direction = 'declining'
+
+    result.update({
+        'per_session': [
+            {'cardio_id': int(cardio_id), 'date': day, 'value': round(float(value), 2), 'rolling_avg_3': round(float(avg), 2)}
+            for cardio_id, day, value, avg in zip(
+                columns['cardio_id'][mask], columns['cardio_date'][mask], values, rolling
+            )
+        ],
+        'weekly': [
+            {'week_start': str(week), 'value': round(float(value), 2), 'sessions': int(count)}
+            for week, value, count in zip(weeks, weekly_values, counts)
+        ],
+        'slope_per_week': round(slope, 3) if slope is not None else None,
+        'direction': direction,
+        'change_pct': round(change_pct, 1) if change_pct is not None else None,
+    })
+    return result
+
 
 # ==========================================
 # SESSION TOOLS
@@ -17,22 +190,82 @@ DB_MAP = {
 
 def get_recent_cardio_sessions(client_id: int, limit: int = 10):
     """Get client's recent cardio sessions"""
+    rows = _query(client_id, f"""
+        SELECT {_session_columns(client_id)}
+        FROM cardio
+        ORDER BY cardio_date DESC, cardio_start_time DESC
+        LIMIT ?
+    """, (limit,))
+    return {'client_id': client_id, 'count': len(rows), 'sessions': rows}
 
 
 def get_cardio_by_date(client_id: int, date: str):
     """Get cardio sessions on a specific date"""
+    rows = _query(client_id, f"""
+        SELECT {_session_columns(client_id)}
+        FROM cardio
+        WHERE cardio_date = ?
+        ORDER BY cardio_start_time
+    """, (date[:10],))
+    return {'client_id': client_id, 'date': date[:10], 'count': len(rows), 'sessions': rows}
 
 
 def get_cardio_history(client_id: int, weeks_back: int = 12):
     """Get full cardio training history"""
-
-
-def get_cardio_session_details(cardio_id: int):
+    rows = _query(client_id, f"""
+        SELECT {_session_columns(client_id)}
+        FROM cardio
+        WHERE cardio_date >= ?
+        ORDER BY cardio_date, cardio_start_time
+    """, (window_start(weeks=weeks_back),))
+    return {
+        'client_id': client_id,
+        'weeks_back': weeks_back,
+        'count': len(rows),
+        'total_distance_km': round(sum(r['distance'] or 0 for r in rows) / 1000, 2),
+        'total_duration_min': round(sum(r['duration'] or 0 for r in rows) / 60, 1),
+        'sessions': rows,
+    }
+
+
+def get_cardio_session_details(cardio_id: int, client_id: int = None):
     """Get detailed info for specific cardio session"""
+    client_id, session = _get_session(cardio_id, client_id)
+    if session is None:
+        return {'error': f'Cardio session {cardio_id} not found'}
+
+    bucket_summary = _query(client_id, """
+        SELECT COUNT(*) AS bucket_count,
+               MIN(NULLIF(avg_heart_rate, 0)) AS min_heart_rate,
+               MAX(avg_heart_rate) AS peak_heart_rate,
+               MIN(avg_altitude) AS min_altitude,
+               MAX(avg_altitude) AS max_altitude
+        FROM aggregated_cardio_session_data
+        WHERE cardio_id = ?
+    """, (cardio_id,))[0]
+
+    stats = _session_split_stats(client_id, session)
+    return {
+        'client_id': client_id,
+        'session': session,
+        'buckets': bucket_summary,
+        'splits': stats['splits'],
+    }
 
 
 def get_cardio_frequency(client_id: int, weeks: int = 4):
     """How often client does cardio per week"""
+    since = window_start(weeks=weeks)
+    weekly = volume_totals(client_id, 'week', since)
+    total = sum(w['sessions'] for w in weekly)
+    return {
+        'client_id': client_id,
+        'weeks': weeks,
+        'total_sessions': total,
+        'sessions_per_week': round(total / weeks, 2) if weeks else None,
+        'active_days': active_days(client_id, since),
+        'weekly': [{'week_start': w['period'], 'sessions': w['sessions']} for w in weekly],
+    }
 
 # ==========================================
 # PERFORMANCE TOOLS
@@ -40,24 +273,93 @@ def get_cardio_frequency(client_id: int, weeks: int = 4):
 
 def get_pace_progression(client_id: int, cardio_type: str = None, weeks_back: int = 12):
     """Track pace improvement over time"""
+    return _trend(client_id, 'pace_sec_per_km', cardio_type, weeks_back, lower_is_better=True)
 
 def get_heart_rate_trends(client_id: int, cardio_type: str = None, weeks_back: int = 12):
     """Track heart rate trends"""
+    return _trend(client_id, 'avg_heart_rate', cardio_type, weeks_back, lower_is_better=True)
 
 def get_speed_progression(client_id: int, cardio_type: str = None, weeks_back: int = 12):
     """Track speed improvement over time"""
+    return _trend(client_id, 'speed_kmh', cardio_type, weeks_back)
 
 
 def get_cardio_personal_bests(client_id: int, cardio_type: str = None):
     """Get personal records for distance, pace, duration"""
+    sql = column_sql(client_id)
+    records = {
+        'longest_distance': (f"{sql['distance']} IS NOT NULL", "distance DESC"),
+        'longest_duration': (f"{sql['duration']} IS NOT NULL", "duration DESC"),
+        'fastest_pace': (f"{sql['distance']} >= {SPLIT_METERS} AND ({sql['pace_sec_per_km']}) IS NOT NULL",
+                         "pace_sec_per_km ASC"),
+        'most_elevation_gain': ("elevation_gain IS NOT NULL", "elevation_gain DESC"),
+    }
+    bests = {}
+    for record, (condition, order) in records.items():
+        where, params = _session_filter(cardio_type, extra=[condition])
+        rows = _query(client_id, f"""
+            SELECT {_session_columns(client_id)}
+            FROM cardio
+            {where}
+            ORDER BY {order}
+            LIMIT 1
+        """, params)
+        bests[record] = rows[0] if rows else None
+    return {'client_id': client_id, 'cardio_type': stored_cardio_type(cardio_type), 'personal_bests': bests}
 
 
 def get_cardio_intensity_zones(client_id: int, cardio_type: str = None, weeks: int = 4):
     """Analyze heart rate zones and training intensity"""
-
-
-def compare_cardio_sessions(cardio_id_1: int, cardio_id_2: int):
+    max_hr = _query(client_id, "SELECT MAX(NULLIF(max_heart_rate, 0)) AS max_hr FROM cardio")[0]['max_hr']
+    if not max_hr:
+        return {'client_id': client_id, 'message': 'No heart rate data recorded'}
+
+    where, params = _session_filter(cardio_type, window_start(weeks=weeks))
+    rows = _query(client_id, f"""
+        SELECT CASE
+                 WHEN b.avg_heart_rate < ? * 0.6 THEN 1
+                 WHEN b.avg_heart_rate < ? * 0.7 THEN 2
+                 WHEN b.avg_heart_rate < ? * 0.8 THEN 3
+                 WHEN b.avg_heart_rate < ? * 0.9 THEN 4
+                 ELSE 5
+               END AS zone,
+               COUNT(*) AS buckets
+        FROM aggregated_cardio_session_data b
+        WHERE b.avg_heart_rate > 0
+          AND b.cardio_id IN (SELECT id FROM cardio {where})
+        GROUP BY zone
+        ORDER BY zone
+    """, (max_hr, max_hr, max_hr, max_hr) + params)
+
+    total = sum(r['buckets'] for r in rows)
+    return {
+        'client_id': client_id,
+        'cardio_type': stored_cardio_type(cardio_type),
+        'weeks': weeks,
+        'reference_max_hr': max_hr,
+        'zones': [
+            {'zone': r['zone'], 'buckets': r['buckets'], 'pct': round(r['buckets'] / total * 100, 1)}
+            for r in rows
+        ],
+    }
+
+
+def compare_cardio_sessions(cardio_id_1: int, cardio_id_2: int, client_id: int = None):
     """Compare two cardio sessions"""
+    _, first = _get_session(cardio_id_1, client_id)
+    _, second = _get_session(cardio_id_2, client_id)
+    missing = [cid for cid, s in ((cardio_id_1, first), (cardio_id_2, second)) if s is None]
+    if missing:
+        return {'error': f'Cardio session(s) not found: {missing}'}
+
+    metrics = ['distance', 'duration', 'pace_sec_per_km', 'speed_kmh', 'avg_heart_rate',
+               'max_heart_rate', 'elevation_gain', 'calories_burned']
+    differences = {
+        m: round(second[m] - first[m], 2)
+        for m in metrics
+        if first[m] is not None and second[m] is not None
+    }
+    return {'session_1': first, 'session_2': second, 'difference_2_minus_1': differences}
 
 
 # ==========================================
@@ -66,41 +368,200 @@ def compare_cardio_sessions(cardio_id_1: int, cardio_id_2: int):
 
 def get_distance_trends(client_id: int, cardio_type: str = None, weeks_back: int = 12):
     """Track distance trends over time"""
+    return _trend(client_id, 'distance_km', cardio_type, weeks_back, weekly='sum')
 
 
 def get_duration_trends(client_id: int, cardio_type: str = None, weeks_back: int = 12):
     """Track duration trends over time"""
+    return _trend(client_id, 'duration_min', cardio_type, weeks_back, weekly='sum')
 
 
 def get_weekly_mileage(client_id: int, cardio_type: str = None, weeks: int = 4):
     """Get weekly distance totals"""
+    rows = [
+        _round_row({
+            'week_start': w['period'],
+            'sessions': w['sessions'],
+            'distance_km': w['distance'] / 1000.0 if w['distance'] is not None else None,
+            'distance_miles': w['distance'] / 1609.34 if w['distance'] is not None else None,
+            'duration_min': w['duration'] / 60.0 if w['duration'] is not None else None,
+        })
+        for w in volume_totals(client_id, 'week', window_start(weeks=weeks), stored_cardio_type(cardio_type))
+    ]
+    total_km = sum(r['distance_km'] or 0 for r in rows)
+    return {
+        'client_id': client_id,
+        'cardio_type': stored_cardio_type(cardio_type),
+        'weeks': weeks,
+        'weekly': rows,
+        'total_km': round(total_km, 2),
+        'avg_km_per_week': round(total_km / weeks, 2) if weeks else None,
+    }
 
 
 def get_monthly_volume(client_id: int, cardio_type: str = None, months: int = 3):
     """Get monthly cardio volume"""
+    today = date.today()
+    first_month = today.year * 12 + today.month - 1 - (months - 1)
+    since = date(first_month // 12, first_month % 12 + 1, 1).isoformat()
+
+    rows = [
+        _round_row({
+            'month': m['period'][:7],
+            'sessions': m['sessions'],
+            'distance_km': m['distance'] / 1000.0 if m['distance'] is not None else None,
+            'duration_min': m['duration'] / 60.0 if m['duration'] is not None else None,
+            'calories': m['calories'],
+            'elevation_gain': m['elevation_gain'],
+        })
+        for m in volume_totals(client_id, 'month', since, stored_cardio_type(cardio_type))
+    ]
+    return {'client_id': client_id, 'cardio_type': stored_cardio_type(cardio_type), 'months': months, 'monthly': rows}
 
 
 def get_longest_sessions(client_id: int, cardio_type: str = None, limit: int = 5):
     """Get longest cardio sessions by distance or duration"""
+    sql = column_sql(client_id)
+    longest = {}
+    for key, column in (('by_distance', 'distance'), ('by_duration', 'duration')):
+        where, params = _session_filter(cardio_type, extra=[f"{sql[column]} IS NOT NULL"])
+        longest[key] = _query(client_id, f"""
+            SELECT {_session_columns(client_id)}
+            FROM cardio
+            {where}
+            ORDER BY {column} DESC
+            LIMIT ?
+        """, params + (limit,))
+    return {'client_id': client_id, 'cardio_type': stored_cardio_type(cardio_type), **longest}
 
 # ==========================================
 # SPLITS & PACING TOOLS
 # ==========================================
 
-def get_split_analysis(cardio_id: int):
-    """Analyze splits for a specific session"""
-
-
-def get_pacing_consistency(cardio_id: int):
+def get_split_analysis(cardio_id: int, client_id: int = None, unit: str = 'km'):
+    """Analyze per-km or per-mile splits for a specific session"""
+    if unit not in SPLIT_UNITS:
+        return {'error': f"Unknown split unit '{unit}'; use one of {list(SPLIT_UNITS)}"}
+    client_id, session = _get_session(cardio_id, client_id)
+    if session is None:
+        return {'error': f'Cardio session {cardio_id} not found'}
+
+    split_m = SPLIT_UNITS[unit]
+    with get_connection(client_id) as conn:
+        level = load_levels(conn, client_id, [session], choose_level(meters=split_m))[cardio_id]
+    if not len(level['distance_m']):
+        return {'cardio_id': cardio_id, 'message': 'No split data recorded for this session'}
+
+    pace_key = f'pace_sec_per_{unit}'
+    splits = [
+        {
+            'split': i + 1,
+            'distance_m': round(float(distance), 1),
+            'time_s': round(float(seconds), 1),
+            pace_key: round(float(seconds) * split_m / float(distance), 1),
+        }
+        for i, (distance, seconds) in enumerate(zip(level['distance_m'], level['duration_s']))
+    ]
+
+    full = [s for s in splits if s['distance_m'] >= split_m - 1] or splits
+    fastest = min(full, key=lambda s: s[pace_key])
+    slowest = max(full, key=lambda s: s[pace_key])
+    return {
+        'cardio_id': cardio_id,
+        'distance': session['distance'],
+        'duration': session['duration'],
+        'unit': unit,
+        'splits': splits,
+        'fastest_split': fastest['split'],
+        'slowest_split': slowest['split'],
+        f'split_range_sec_per_{unit}': round(slowest[pace_key] - fastest[pace_key], 1),
+    }
+
+
+def get_pacing_consistency(cardio_id: int, client_id: int = None):
     """Measure pacing consistency across splits"""
+    client_id, session = _get_session(cardio_id, client_id)
+    if session is None:
+        return {'error': f'Cardio session {cardio_id} not found'}
+
+    stats = _session_split_stats(client_id, session)
+    cv = stats['pace_cv']
+    if cv is None:
+        rating = 'insufficient data'
+    elif cv < 0.03:
+        rating = 'very consistent'
+    elif cv < 0.06:
+        rating = 'consistent'
+    elif cv < 0.10:
+        rating = 'variable'
+    else:
+        rating = 'highly variable'
+
+    first, second = stats['first_half_pace'], stats['second_half_pace']
+    return {
+        'cardio_id': cardio_id,
+        'pace_cv': round(cv, 4) if cv is not None else None,
+        'rating': rating,
+        'first_half_pace_sec_per_km': round(first, 1) if first else None,
+        'second_half_pace_sec_per_km': round(second, 1) if second else None,
+        'negative_split': bool(first and second and second < first),
+        'hr_drift_pct': round(stats['hr_drift_pct'], 1) if stats['hr_drift_pct'] is not None else None,
+    }
 
 
 def get_negative_splits(client_id: int, cardio_type: str = None, weeks: int = 12):
     """Find sessions with negative splits (faster second half)"""
+    where, params = _session_filter(cardio_type, window_start(weeks=weeks))
+    sessions = _query(client_id, f"""
+        SELECT {_session_columns(client_id)}
+        FROM cardio
+        {where}
+        ORDER BY cardio_date
+    """, params)
+
+    all_stats = _sessions_split_stats(client_id, sessions)
+    analyzed, negative = 0, []
+    for session in sessions:
+        stats = all_stats[session['cardio_id']]
+        first, second = stats['first_half_pace'], stats['second_half_pace']
+        if not first or not second or not stats['bucket_count']:
+            continue
+        analyzed += 1
+        if second < first:
+            negative.append({
+                'cardio_id': session['cardio_id'],
+                'date': session['cardio_date'],
+                'distance': session['distance'],
+                'first_half_pace_sec_per_km': round(first, 1),
+                'second_half_pace_sec_per_km': round(second, 1),
+                'improvement_sec_per_km': round(first - second, 1),
+            })
+
+    return {
+        'client_id': client_id,
+        'cardio_type': stored_cardio_type(cardio_type),
+        'weeks': weeks,
+        'sessions_analyzed': analyzed,
+        'negative_split_count': len(negative),
+        'negative_split_rate': round(len(negative) / analyzed, 2) if analyzed else None,
+        'sessions': negative,
+    }
 
 
 def get_fastest_splits(client_id: int, cardio_type: str = None, limit: int = 10):
     """Get fastest individual splits"""
+    where, params = _session_filter(cardio_type)
+    sessions = _query(client_id, f"SELECT {_session_columns(client_id)} FROM cardio {where}", params)
+
+    all_stats = _sessions_split_stats(client_id, sessions)
+    splits = []
+    for session in sessions:
+        for split in all_stats[session['cardio_id']]['splits']:
+            if split['distance_m'] >= SPLIT_METERS - 1:
+                splits.append({'cardio_id': session['cardio_id'], 'date': session['cardio_date'], **split})
+
+    splits.sort(key=lambda s: s['pace_sec_per_km'])
+    return {'client_id': client_id, 'cardio_type': stored_cardio_type(cardio_type), 'fastest_splits': splits[:limit]}
 
 # ==========================================
 # ELEVATION TOOLS
@@ -108,14 +569,76 @@ def get_fastest_splits(client_id: int, cardio_type: str = None, limit: int = 10)
 
 def get_elevation_gain_trends(client_id: int, cardio_type: str = None, weeks_back: int = 12):
     """Track elevation gain over time"""
+    return _trend(client_id, 'elevation_gain_m', cardio_type, weeks_back, weekly='sum')
 
 
 def get_altitude_performance(client_id: int, cardio_type: str = None):
-    """Compare performance at different altitudes"""
-
-
-def get_hill_workouts(client_id: int, weeks: int = 12):
+    """
+    Compare performance at different altitudes.
+
+    Reads the sessions' one-minute pyramid level: the minutes are ordered by
+    mean altitude and cut into three bands holding equal numbers of
+    10-second buckets, with speed and heart rate averaged per bucket.
+    """
+    where, params = _session_filter(cardio_type)
+    distance_sql = column_sql(client_id)['distance']
+    sessions = _query(client_id, f"SELECT id AS cardio_id, {distance_sql} AS distance FROM cardio {where}", params)
+    with get_connection(client_id) as conn:
+        levels = load_levels(conn, client_id, sessions, choose_level(seconds=60)).values()
+
+    def stacked(field: str) -> np.ndarray:
+        return np.concatenate([level[field] for level in levels] or [np.zeros(0)]).astype(np.float64)
+
+    altitude, speed, heart_rate, weight = (
+        stacked(field) for field in ('altitude_m', 'speed', 'heart_rate', 'buckets')
+    )
+    present = ~np.isnan(altitude)
+    altitude, speed, heart_rate, weight = altitude[present], speed[present], heart_rate[present], weight[present]
+    if not len(altitude):
+        return {'client_id': client_id, 'cardio_type': stored_cardio_type(cardio_type), 'altitude_bands': []}
+
+    order = np.argsort(altitude, kind='stable')
+    # Band of each minute by the bucket-weighted rank of its middle
+    position = (np.cumsum(weight[order]) - weight[order] / 2) / weight.sum()
+    bands = np.minimum((position * len(ALTITUDE_BANDS)).astype(int), len(ALTITUDE_BANDS) - 1)
+
+    def weighted_mean(values: np.ndarray, weights: np.ndarray) -> Optional[float]:
+        ok = ~np.isnan(values)
+        return float(np.average(values[ok], weights=weights[ok])) if weights[ok].sum() else None
+
+    rows = []
+    for band, label in enumerate(ALTITUDE_BANDS):
+        members = order[bands == band]
+        if not len(members):
+            continue
+        rows.append(_round_row({
+            'band': label,
+            'buckets': int(weight[members].sum()),
+            'min_altitude': float(altitude[members].min()),
+            'max_altitude': float(altitude[members].max()),
+            'avg_speed': weighted_mean(speed[members], weight[members]),
+            'avg_heart_rate': weighted_mean(heart_rate[members], weight[members]),
+        }))
+    return {'client_id': client_id, 'cardio_type': stored_cardio_type(cardio_type), 'altitude_bands': rows}
+
+
+def get_hill_workouts(client_id: int, weeks: int = 12, min_elevation: float = 150):
     """Get sessions with significant elevation gain"""
+    where, params = _session_filter(since=window_start(weeks=weeks), extra=["elevation_gain >= ?"])
+    rows = _query(client_id, f"""
+        SELECT {_session_columns(client_id)},
+               elevation_gain * 1000.0 / NULLIF({column_sql(client_id)['distance']}, 0) AS elevation_per_km
+        FROM cardio
+        {where}
+        ORDER BY elevation_gain DESC
+    """, (min_elevation,) + params)
+    return {
+        'client_id': client_id,
+        'weeks': weeks,
+        'min_elevation': min_elevation,
+        'count': len(rows),
+        'sessions': rows,
+    }
 
 
 # ==========================================
@@ -124,11 +647,55 @@ def get_hill_workouts(client_id: int, weeks: int = 12):
 
 def get_cardio_type_distribution(client_id: int, weeks: int = 4):
     """Breakdown of cardio types (running, cycling, etc.)"""
+    totals = volume_totals(client_id, 'month', window_start(weeks=weeks), by='cardio_type')
+    rows = [
+        _round_row({
+            'cardio_type': t['cardio_type'],
+            'sessions': t['sessions'],
+            'distance_km': t['distance'] / 1000.0 if t['distance'] is not None else None,
+            'duration_min': t['duration'] / 60.0 if t['duration'] is not None else None,
+        })
+        for t in totals
+    ]
+    rows.sort(key=lambda r: (-r['sessions'], r['cardio_type'] or ''))
+    total = sum(r['sessions'] for r in rows)
+    for row in rows:
+        row['pct'] = round(row['sessions'] / total * 100, 1)
+    return {'client_id': client_id, 'weeks': weeks, 'total_sessions': total, 'types': rows}
 
 def get_cardio_type_frequency(client_id: int, cardio_type: str, weeks: int = 4):
     """How often client does specific cardio type"""
+    where, params = _session_filter(cardio_type, window_start(weeks=weeks))
+    row = _query(client_id, f"""
+        SELECT COUNT(*) AS sessions,
+               MAX(cardio_date) AS last_session,
+               SUM({column_sql(client_id)['distance']}) / 1000.0 AS distance_km
+        FROM cardio
+        {where}
+    """, params)[0]
+    return {
+        'client_id': client_id,
+        'cardio_type': stored_cardio_type(cardio_type),
+        'weeks': weeks,
+        **row,
+        'sessions_per_week': round(row['sessions'] / weeks, 2) if weeks else None,
+    }
 
 def compare_cardio_types(cardio_type_1: str, cardio_type_2: str, client_id: int, weeks: int = 4):
     """Compare performance between two cardio types"""
-
-
+    since = window_start(weeks=weeks)
+    sql = column_sql(client_id)
+    comparison = {}
+    for cardio_type in (cardio_type_1, cardio_type_2):
+        where, params = _session_filter(cardio_type, since)
+        comparison[stored_cardio_type(cardio_type)] = _query(client_id, f"""
+            SELECT COUNT(*) AS sessions,
+                   SUM({sql['distance']}) / 1000.0 AS distance_km,
+                   AVG({sql['duration']}) / 60.0 AS avg_duration_min,
+                   AVG({sql['pace_sec_per_km']}) AS avg_pace_sec_per_km,
+                   AVG({sql['speed_kmh']}) AS avg_speed_kmh,
+                   AVG(NULLIF(avg_heart_rate, 0)) AS avg_heart_rate
+            FROM cardio
+            {where}
+        """, params)[0]
+    return {'client_id': client_id, 'weeks': weeks, 'comparison': comparison}
@@ -0,0 +1,163 @@
+# AI Server - tools/cohort_tools.py
+
+"""
+    Cohort tools - rankings and comparisons across every client at once.
+
+    A trainer question like "which of my clients ran the most this month"
+    is one tool call here instead of one call per client through the LLM
+    loop. Each tool works on tools.analytics.load_cohort_columns(): every
+    client's cached columns concatenated with a client_id column, so a call
+    is a single vectorized pass and the same code serves the per-client
+    files and the consolidated database.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+
+from tools import analytics
+from tools.filters import stored_cardio_type, window_start
+
+# Volume columns a leaderboard can rank by
+LEADERBOARD_METRICS = {
+    'distance': 'distance_km',
+    'duration': 'duration_min',
+    'elevation': 'elevation_gain_m',
+}
+
+COHORT_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def _window(columns: Dict[str, np.ndarray], start: str, end: Optional[str] = None) -> np.ndarray:
+    """Mask of sessions on or after start (and before end)"""
+    mask = columns['day'] >= np.datetime64(start, 'D')
+    if end:
+        mask &= columns['day'] < np.datetime64(end, 'D')
+    return mask
+
+
+# ==========================================
+# COHORT TOOLS
+# ==========================================
+
+def get_volume_leaderboard(weeks: int = 1, cardio_type: str = None, metric: str = 'distance', limit: int = 10):
+    """Rank all clients by training volume over the last few weeks"""
+    if metric not in LEADERBOARD_METRICS and metric != 'sessions':
+        return {'error': f"Unknown metric '{metric}'; use one of {sorted([*LEADERBOARD_METRICS, 'sessions'])}"}
+
+    columns = analytics.load_cohort_columns()
+    mask = _window(columns, window_start(weeks=weeks))
+    cardio_type = stored_cardio_type(cardio_type)
+    if cardio_type:
+        mask &= columns['cardio_type'] == cardio_type
+
+    groups = columns['client_id'][mask]
+    clients, _, sessions = analytics.group_sums(groups, np.zeros(len(groups)))
+    totals = {
+        name: analytics.group_sums(groups, np.nan_to_num(columns[column][mask]))[1]
+        for name, column in LEADERBOARD_METRICS.items()
+    }
+    totals['sessions'] = sessions
+    distance, duration, elevation = totals['distance'], totals['duration'], totals['elevation']
+    order = np.argsort(-totals[metric], kind='stable')[:limit]
+    return {
+        'metric': metric,
+        'cardio_type': cardio_type,
+        'weeks': weeks,
+        'active_clients': len(clients),
+        'total_clients': len(np.unique(columns['client_id'])),
+        'leaderboard': [
+            {
+                'rank': rank,
+                'client_id': int(clients[i]),
+                'sessions': int(sessions[i]),
+                'distance_km': round(float(distance[i]), 2),
+                'duration_min': round(float(duration[i]), 1),
+                'elevation_gain_m': round(float(elevation[i]), 1),
+                'distance_km_per_week': round(float(distance[i]) / weeks, 2) if weeks else None,
+            }
+            for rank, i in enumerate(order, start=1)
+        ],
+    }
+
+
+def get_pace_percentiles(cardio_type: str = 'Run', weeks_back: int = 12, client_id: int = None, min_sessions: int = 1):
+    """Where each client's typical pace sits within the cohort for one cardio type"""
+    cardio_type = stored_cardio_type(cardio_type)
+    columns = analytics.load_cohort_columns()
+    mask = analytics.select(columns, 'pace_sec_per_km', window_start(weeks=weeks_back), cardio_type)
+
+    clients, medians, counts = analytics.group_medians(columns['client_id'][mask], columns['pace_sec_per_km'][mask])
+    keep = counts >= min_sessions
+    clients, medians, counts = clients[keep], medians[keep], counts[keep]
+
+    result = {
+        'cardio_type': cardio_type,
+        'weeks_back': weeks_back,
+        'clients': len(clients),
+    }
+    if not len(clients):
+        result['message'] = 'No sessions in this period'
+        return result
+
+    ranks = analytics.percentile_rank(medians, lower_is_better=True)
+    ranking = [
+        {
+            'client_id': int(cid),
+            'median_pace_sec_per_km': round(float(pace), 1),
+            'sessions': int(count),
+            'faster_than_pct': round(float(rank), 1),
+        }
+        for cid, pace, count, rank in sorted(zip(clients, medians, counts, ranks), key=lambda r: r[1])
+    ]
+    result.update({
+        'cohort_pace_sec_per_km': {
+            f'p{p}': round(float(v), 1) for p, v in zip(COHORT_PERCENTILES, np.percentile(medians, COHORT_PERCENTILES))
+        },
+        'ranking': ranking,
+    })
+    if client_id is not None:
+        result['client'] = next((r for r in ranking if r['client_id'] == client_id), None)
+    return result
+
+
+def get_declining_frequency(weeks: int = 4, min_drop_pct: float = 25):
+    """Clients training less often in the last few weeks than in the weeks before"""
+    columns = analytics.load_cohort_columns()
+    recent_start = window_start(weeks=weeks)
+    previous_start = (date.today() - timedelta(weeks=2 * weeks)).isoformat()
+
+    all_clients = np.unique(columns['client_id'])
+    recent = dict.fromkeys(all_clients.tolist(), 0)
+    previous = dict(recent)
+    for counts, mask in (
+        (recent, _window(columns, recent_start)),
+        (previous, _window(columns, previous_start, recent_start)),
+    ):
+        clients, _, sessions = analytics.group_sums(columns['client_id'][mask], np.zeros(int(mask.sum())))
+        counts.update(zip(clients.tolist(), sessions.tolist()))
+
+    declining = []
+    for cid in all_clients.tolist():
+        if not previous[cid]:
+            continue
+        drop_pct = (previous[cid] - recent[cid]) / previous[cid] * 100
+        if drop_pct >= min_drop_pct:
+            declining.append({
+                'client_id': cid,
+                'previous_sessions_per_week': round(previous[cid] / weeks, 2),
+                'recent_sessions_per_week': round(recent[cid] / weeks, 2),
+                'drop_pct': round(drop_pct, 1),
+            })
+    declining.sort(key=lambda r: -r['drop_pct'])
+
+    return {
+        'weeks': weeks,
+        'recent_window_start': recent_start,
+        'previous_window_start': previous_start,
+        'min_drop_pct': min_drop_pct,
+        'total_clients': len(all_clients),
+        'declining': declining,
+        'inactive_both_windows': [cid for cid in all_clients.tolist() if not previous[cid] and not recent[cid]],
+    }
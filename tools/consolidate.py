@@ -0,0 +1,174 @@
+# AI Server - tools/consolidate.py
+
+"""
+    Import the per-client database files into one consolidated database.
+
+    Each client's rows are copied into tables of the same names with a
+    client_id column set to the real client (the stored client_id is not
+    reliable), along with the derived tables (rollups, pyramids, volume
+    aggregates, unit conventions) where the client's file has them.
+    Importing a client again replaces its rows, so build steps keep running
+    on the files and are re-imported. The clients table records what was
+    imported and from where.
+
+    Serve from the result with CARDIO_STORAGE_BACKEND=consolidated. That
+    backend is read-only and refuses to start unless every imported client
+    has its derived tables, so run the build steps on the files first.
+
+    Usage:
+        python -m tools.consolidate                      # every client file in DATA_DIR
+        python -m tools.consolidate 1 3                  # specific clients
+        python -m tools.consolidate --target other.db 2
+"""
+
+import argparse
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from tools.db import (
+    CLIENTS_TABLE,
+    CONSOLIDATED_DB,
+    DB_MAP,
+    PARTITIONED_TABLES,
+    resolve_db_path,
+)
+
+CLIENTS_DDL = f"""
+CREATE TABLE IF NOT EXISTS {CLIENTS_TABLE} (
+    client_id INTEGER PRIMARY KEY,
+    source_path TEXT NOT NULL,
+    sessions INTEGER NOT NULL,
+    imported_at TIMESTAMP
+)
+"""
+
+# The per-file indexes from tools.migrations, led by client_id so every
+# client-scoped query is a range scan of its own partition
+INDEXES = {
+    "idx_cardio_client_id": ("cardio", "(client_id, id, updated_at)"),
+    "idx_cardio_client_date": ("cardio", "(client_id, cardio_date, cardio_start_time)"),
+    "idx_cardio_client_date_type_volume": (
+        "cardio",
+        "(client_id, cardio_date, cardio_type, distance, duration, elevation_gain, calories_burned)",
+    ),
+    "idx_cardio_client_type_date_volume": (
+        "cardio",
+        "(client_id, cardio_type, cardio_date, distance, duration, elevation_gain, calories_burned)",
+    ),
+    "idx_buckets_client_cardio_start": ("aggregated_cardio_session_data", "(client_id, cardio_id, bucket_start)"),
+    "idx_rollup_client_cardio": ("cardio_session_rollup", "(client_id, cardio_id)"),
+    "idx_pyramid_client_cardio_level": ("cardio_session_pyramid", "(client_id, cardio_id, level)"),
+    "idx_volume_client_grain_period": ("cardio_volume", "(client_id, grain, period, cardio_type)"),
+    "idx_volume_sessions_client_cardio": ("cardio_volume_sessions", "(client_id, cardio_id)"),
+    "idx_units_client_column": ("unit_conventions", "(client_id, column_name)"),
+}
+
+
+def _tables(conn: sqlite3.Connection, schema: str) -> set:
+    return {row[0] for row in conn.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")}
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> Dict[str, str]:
+    """Column name -> declared type"""
+    return {row[1]: row[2] for row in conn.execute(f'PRAGMA {schema}.table_info("{table}")')}
+
+
+def _ensure_table(conn: sqlite3.Connection, table: str, source: Dict[str, str]) -> None:
+    """Create the partitioned table, or add columns the source has and it lacks"""
+    target = _columns(conn, "main", table)
+    if not target:
+        columns = ['"client_id" INTEGER NOT NULL'] + [
+            f'"{name}" {decl}' for name, decl in source.items() if name != "client_id"
+        ]
+        conn.execute(f'CREATE TABLE main."{table}" ({", ".join(columns)})')
+        return
+    for name, decl in source.items():
+        if name not in target:
+            conn.execute(f'ALTER TABLE main."{table}" ADD COLUMN "{name}" {decl}')
+
+
+def import_client(conn: sqlite3.Connection, client_id: int, db_path: str) -> Dict[str, Any]:
+    """
+    Replace one client's partition with the contents of its database file.
+
+    Returns:
+        Rows copied per table
+    """
+    conn.execute("ATTACH DATABASE ? AS src", (resolve_db_path(db_path),))
+    try:
+        source_tables = _tables(conn, "src")
+        if "cardio" not in source_tables:
+            raise ValueError(f"{db_path} has no cardio table")
+
+        copied = {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            target_tables = _tables(conn, "main")
+            for table in PARTITIONED_TABLES:
+                if table in target_tables:
+                    conn.execute(f'DELETE FROM main."{table}" WHERE client_id = ?', (client_id,))
+                if table not in source_tables:
+                    continue
+                source = _columns(conn, "src", table)
+                _ensure_table(conn, table, source)
+                names = ", ".join(f'"{name}"' for name in source if name != "client_id")
+                copied[table] = conn.execute(
+                    f'INSERT INTO main."{table}" ("client_id", {names}) SELECT ?, {names} FROM src."{table}"',
+                    (client_id,),
+                ).rowcount
+
+            conn.execute(CLIENTS_DDL)
+            conn.execute(
+                f"INSERT OR REPLACE INTO {CLIENTS_TABLE} (client_id, source_path, sessions, imported_at) "
+                "VALUES (?, ?, ?, ?)",
+                (client_id, db_path, copied["cardio"], datetime.now(timezone.utc).isoformat()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.execute("DETACH DATABASE src")
+
+    return {'client_id': client_id, 'source': db_path, 'rows': copied}
+
+
+def consolidate(target: str = CONSOLIDATED_DB, client_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """
+    Import client files (default: every file in DB_MAP) into target, then
+    index and ANALYZE it.
+
+    Returns:
+        One import report per client
+    """
+    client_ids = client_ids or list(DB_MAP)
+    conn = sqlite3.connect(resolve_db_path(target), timeout=30, isolation_level=None)
+    try:
+        # Readers keep serving the previous snapshot while an import runs
+        conn.execute("PRAGMA journal_mode = WAL")
+        reports = [import_client(conn, client_id, DB_MAP[client_id]) for client_id in client_ids]
+
+        tables = _tables(conn, "main")
+        for name, (table, columns) in INDEXES.items():
+            if table in tables:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" {columns}')
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return reports
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Merge per-client cardio databases into one")
+    parser.add_argument("client_ids", nargs="*", type=int, help="Clients to import (default: all)")
+    parser.add_argument("--target", default=CONSOLIDATED_DB, help="Consolidated database path")
+    args = parser.parse_args(argv)
+
+    for report in consolidate(args.target, args.client_ids):
+        rows = ', '.join(f"{table}={count}" for table, count in report['rows'].items())
+        print(f"[consolidate] client {report['client_id']} from {report['source']}: {rows}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,754 @@
+# AI Server - tools/db.py
+
+"""
+    Pooled, read-only SQLite connections for the cardio data.
+
+    Every tool call goes through get_connection(client_id), which hands out an
+    already-open connection instead of paying the open / schema-parse /
+    page-cache warmup cost on every call. Where the rows live is up to the
+    storage backend:
+
+        FilePerClientBackend - one database file per client, discovered in DATA_DIR
+        ConsolidatedBackend  - one database partitioned by client_id
+                               (built with python -m tools.consolidate)
+
+    Either way the connection sees only that client's rows under the usual
+    table names, so the tools' SQL is the same for both.
+
+    Inside collect_query_stats() the pooled connections also count the SQL
+    time and rows read by the calling thread, for per-tool metrics.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+# Project root, used to resolve relative database paths
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# STORAGE SETTINGS
+# ==========================================
+STORAGE_BACKEND = os.environ.get("CARDIO_STORAGE_BACKEND", "files")    # "files" or "consolidated"
+DATA_DIR = os.environ.get("CARDIO_DATA_DIR", "data")                   # Per-client files
+CONSOLIDATED_DB = os.environ.get("CARDIO_CONSOLIDATED_DB", "data/cardio.db")
+
+CLIENT_FILE_PATTERN = re.compile(r"^client_(\d+)_cardio\.db$")
+
+# Tables holding per-client rows; in the consolidated database each carries client_id
+PARTITIONED_TABLES = (
+    "cardio",
+    "aggregated_cardio_session_data",
+    "cardio_session_rollup",
+    "cardio_session_pyramid",
+    "cardio_volume",
+    "cardio_volume_sessions",
+    "unit_conventions",
+)
+CLIENTS_TABLE = "clients"
+
+# Partitioned tables written only by the build steps; a consolidated database
+# must have them for every client, or the tools fall back to live queries
+DERIVED_TABLES = (
+    "cardio_session_rollup",
+    "cardio_session_pyramid",
+    "cardio_volume_sessions",
+    "unit_conventions",
+)
+
+# ==========================================
+# POOL SETTINGS
+# ==========================================
+POOL_MAX_SIZE = 4                    # Connections per database file
+POOL_ACQUIRE_TIMEOUT = 10.0          # Seconds to wait for a free connection
+MMAP_SIZE = 256 * 1024 * 1024        # Bytes of the file to memory-map
+CACHE_SIZE_KIB = 16 * 1024           # Page cache per connection (KiB)
+
+# immutable=1 skips all locking and change detection. Only safe for snapshot
+# files that nothing writes to while the process is running (the migration and
+# rollup steps do write), so it is off by default.
+DB_IMMUTABLE = False
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the timeout"""
+
+
+# ==========================================
+# QUERY STATS
+# ==========================================
+
+class QueryStats:
+    """SQL time and rows read on pooled connections"""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"queries": self.queries, "rows_read": self.rows, "sql_ms": round(self.seconds * 1000, 3)}
+
+
+_collecting = threading.local()
+
+
+@contextmanager
+def collect_query_stats() -> Iterator[QueryStats]:
+    """Count the SQL run on pooled connections by this thread inside the block"""
+    stats = QueryStats()
+    previous = getattr(_collecting, "stats", None)
+    _collecting.stats = stats
+    try:
+        yield stats
+    finally:
+        _collecting.stats = previous
+
+
+class FetchedRows:
+    """Already-fetched result rows with the cursor methods the tools use"""
+
+    def __init__(self, rows: list):
+        self._rows = rows
+        self._next = 0
+
+    def fetchone(self):
+        if self._next >= len(self._rows):
+            return None
+        self._next += 1
+        return self._rows[self._next - 1]
+
+    def fetchall(self) -> list:
+        rows, self._next = self._rows[self._next:], len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class _StatsConnection(sqlite3.Connection):
+    """
+    Connection whose execute() is timed while collect_query_stats() is active.
+
+    The statement is stepped to completion so the time includes reading the
+    rows, not just preparing the statement; outside a collector execute()
+    is the plain cursor-returning call.
+    """
+
+    def execute(self, sql, parameters=(), /):
+        stats = getattr(_collecting, "stats", None)
+        if stats is None:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            rows = super().execute(sql, parameters).fetchall()
+        finally:
+            stats.seconds += time.perf_counter() - started
+            stats.queries += 1
+        stats.rows += len(rows)
+        return FetchedRows(rows)
+
+
+def resolve_db_path(db_path: str) -> str:
+    """Resolve a database path against the project root"""
+    if os.path.isabs(db_path):
+        return db_path
+    return os.path.join(PROJECT_ROOT, db_path)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of read-only connections to one SQLite file.
+
+    Connections are opened lazily up to max_size; callers beyond that block
+    until a connection is released or the acquire timeout expires.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = POOL_MAX_SIZE,
+        timeout: float = POOL_ACQUIRE_TIMEOUT,
+        immutable: bool = DB_IMMUTABLE,
+        mmap_size: int = MMAP_SIZE,
+        cache_size_kib: int = CACHE_SIZE_KIB,
+        connection_hook: Optional[Callable[[sqlite3.Connection], None]] = None,
+    ):
+        self.db_path = resolve_db_path(db_path)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.immutable = immutable
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.connection_hook = connection_hook  # Called on every newly opened connection
+
+        self._idle: list[sqlite3.Connection] = []
+        self._opened = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+        # Counters
+        self.hits = 0           # Served by an idle connection
+        self.misses = 0         # Had to open a new connection
+        self.waits = 0          # Had to wait for a connection to be released
+        self.timeouts = 0
+        self.wait_time = 0.0    # Total seconds spent waiting
+
+    def _open(self) -> sqlite3.Connection:
+        """Open a new read-only connection with the pool's pragmas"""
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"Database not found: {self.db_path}")
+
+        uri = f"file:{self.db_path}?mode=ro"
+        if self.immutable:
+            uri += "&immutable=1"
+
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=_StatsConnection)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kib)}")
+        conn.execute("PRAGMA query_only = ON")
+        if self.connection_hook is not None:
+            self.connection_hook(conn)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Check out a connection, opening or waiting for one as needed"""
+        started = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"Pool for {self.db_path} is closed")
+
+                if self._idle:
+                    self.hits += 1
+                    conn = self._idle.pop()
+                    break
+
+                if self._opened < self.max_size:
+                    self._opened += 1
+                    self.misses += 1
+                    conn = None
+                    break
+
+                if started is None:
+                    self.waits += 1
+                    started = time.perf_counter()
+
+                remaining = started + self.timeout - time.perf_counter()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    self.wait_time += time.perf_counter() - started
+                    raise PoolTimeoutError(
+                        f"No connection to {self.db_path} available after {self.timeout}s"
+                    )
+                self._cond.wait(remaining)
+
+            if started is not None:
+                self.wait_time += time.perf_counter() - started
+
+        if conn is not None:
+            return conn
+
+        # Open outside the lock so a slow open doesn't block other callers
+        try:
+            return self._open()
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection to the pool"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            if self._closed:
+                self._opened -= 1
+                conn.close()
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close(self) -> None:
+        """Close idle connections; checked-out ones close on release"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+                self._opened -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool counters"""
+        with self._cond:
+            requests = self.hits + self.misses
+            return {
+                "db_path": self.db_path,
+                "max_size": self.max_size,
+                "open": self._opened,
+                "idle": len(self._idle),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / requests) if requests else 0.0,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "wait_time_total": self.wait_time,
+                "wait_time_avg": (self.wait_time / self.waits) if self.waits else 0.0,
+            }
+
+
+def _file_version(path: str) -> str:
+    """Size and mtime of a database file and its WAL"""
+    parts = []
+    for file_path in (path, path + "-wal"):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            continue
+        parts.append(f"{stat.st_mtime_ns:x}.{stat.st_size:x}")
+    return "-".join(parts)
+
+
+# ==========================================
+# CLIENT FILE DISCOVERY
+# ==========================================
+
+class ClientFiles(MutableMapping):
+    """
+    client_id -> database path for files named client_{id}_cardio.db in a
+    data directory.
+
+    A lookup checks for that one file, so a new client's database is picked
+    up without a code change; iteration re-lists the directory only when its
+    mtime changes. Assigned entries override discovery.
+    """
+
+    def __init__(self, data_dir: str, overrides: Optional[Dict[int, str]] = None):
+        self.data_dir = data_dir
+        self._overrides = dict(overrides or {})
+        self._listing: Tuple[Optional[int], Dict[int, str]] = (None, {})
+        self._lock = threading.Lock()
+
+    def _discovered(self) -> Dict[int, str]:
+        directory = resolve_db_path(self.data_dir)
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if self._listing[0] != mtime:
+                found = {}
+                for name in os.listdir(directory):
+                    match = CLIENT_FILE_PATTERN.match(name)
+                    if match:
+                        found[int(match.group(1))] = os.path.join(self.data_dir, name)
+                self._listing = (mtime, found)
+            return self._listing[1]
+
+    def __getitem__(self, client_id: int) -> str:
+        path = self._overrides.get(client_id)
+        if path is not None:
+            return path
+        if isinstance(client_id, int):
+            path = os.path.join(self.data_dir, f"client_{client_id}_cardio.db")
+            if os.path.exists(resolve_db_path(path)):
+                return path
+        raise KeyError(client_id)
+
+    def __setitem__(self, client_id: int, db_path: str) -> None:
+        self._overrides[client_id] = db_path
+
+    def __delitem__(self, client_id: int) -> None:
+        del self._overrides[client_id]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(sorted({**self._discovered(), **self._overrides}))
+
+    def __len__(self) -> int:
+        return len({**self._discovered(), **self._overrides})
+
+
+# Per-client database paths
+DB_MAP = ClientFiles(DATA_DIR)
+
+
+# ==========================================
+# STORAGE BACKENDS
+# ==========================================
+
+class StorageBackend:
+    """
+    Where client rows are stored.
+
+    connection(client_id) yields a pooled read-only connection on which the
+    PARTITIONED_TABLES hold only that client's rows, so tool SQL never
+    filters on client_id.
+    """
+
+    def client_ids(self) -> List[int]:
+        """Every client with data, in id order"""
+        raise NotImplementedError
+
+    def connection(self, client_id: int):
+        """Borrow a read-only connection scoped to client_id"""
+        raise NotImplementedError
+
+    def write_connection(self, client_id: int):
+        """Short-lived read-write connection for build steps"""
+        raise NotImplementedError
+
+    def data_version(self, client_id: Optional[int] = None) -> str:
+        """Stamp that changes whenever the client's data (or, without one, any data) is written"""
+        raise NotImplementedError
+
+    def sidecar_path(self, client_id: int, suffix: str) -> str:
+        """Path of a derived file kept next to the client's data (e.g. ".stream")"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[Any, Dict[str, Any]]:
+        """Pool counters"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Close every pooled connection"""
+        raise NotImplementedError
+
+
+class FilePerClientBackend(StorageBackend):
+    """
+    One SQLite file per client, with a connection pool per file.
+
+    Pools are created on first use, so clients that are never queried never
+    open their database file.
+    """
+
+    def __init__(self, db_map: Optional[Mapping[int, str]] = None, **pool_kwargs):
+        self.db_map = db_map if db_map is not None else DB_MAP
+        self.pool_kwargs = pool_kwargs
+        self._pools: Dict[int, ConnectionPool] = {}
+        self._lock = threading.Lock()
+
+    def _db_path(self, client_id: int) -> str:
+        db_path = self.db_map.get(client_id)
+        if db_path is None:
+            raise ValueError(f"No database for client_id {client_id}")
+        return db_path
+
+    def client_ids(self) -> List[int]:
+        return sorted(self.db_map)
+
+    def get_pool(self, client_id: int) -> ConnectionPool:
+        """Get (or lazily create) the pool for a client's database"""
+        pool = self._pools.get(client_id)
+        if pool is not None:
+            return pool
+
+        with self._lock:
+            pool = self._pools.get(client_id)
+            if pool is None:
+                pool = ConnectionPool(self._db_path(client_id), **self.pool_kwargs)
+                self._pools[client_id] = pool
+            return pool
+
+    @contextmanager
+    def connection(self, client_id: int) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection for client_id"""
+        pool = self.get_pool(client_id)
+        conn = pool.acquire()
+        try:
+            yield conn
+        finally:
+            pool.release(conn)
+
+    @contextmanager
+    def write_connection(self, client_id: int) -> Iterator[sqlite3.Connection]:
+        """
+        Short-lived read-write connection for build steps (rollups, migrations).
+
+        Not pooled: these run offline or on ingest, never on the tool path.
+        Commits on success and rolls back on error.
+        """
+        conn = sqlite3.connect(resolve_db_path(self._db_path(client_id)), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def data_version(self, client_id: Optional[int] = None) -> str:
+        if client_id is None:
+            return "|".join(self.data_version(cid) for cid in self.client_ids())
+        return _file_version(resolve_db_path(self._db_path(client_id)))
+
+    def sidecar_path(self, client_id: int, suffix: str) -> str:
+        return os.path.splitext(resolve_db_path(self._db_path(client_id)))[0] + suffix
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        """Per-client pool counters"""
+        with self._lock:
+            pools = dict(self._pools)
+        return {client_id: pool.stats() for client_id, pool in pools.items()}
+
+    def close(self) -> None:
+        """Close every pool"""
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+
+class _Scope:
+    """Per-connection state behind the client-scoped views"""
+
+    def __init__(self):
+        self.client_id: Optional[int] = None
+        self.schema_version: Optional[int] = None
+
+
+class ConsolidatedBackend(StorageBackend):
+    """
+    Every client in one SQLite file, partitioned by client_id, behind a
+    single connection pool.
+
+    Each pooled connection gets TEMP views named after the partitioned
+    tables. They shadow the main tables and filter on
+    client_id = scope_client(), a per-connection SQL function, so scoping a
+    borrowed connection to a client is an attribute assignment and the
+    tools' unqualified `FROM cardio` reads one client's rows through the
+    client_id-led indexes.
+
+    The database is read-only here: build steps write the per-client files
+    (see file_backend()) and tools.consolidate imports the results, so
+    make_backend() verifies the derived tables were built before serving.
+    """
+
+    def __init__(self, db_path: str = CONSOLIDATED_DB, **pool_kwargs):
+        self.db_path = resolve_db_path(db_path)
+        self._hook: Optional[Callable[[sqlite3.Connection], None]] = pool_kwargs.pop("connection_hook", None)
+        self._scopes: Dict[sqlite3.Connection, _Scope] = {}
+        self._clients: Tuple[Optional[str], frozenset] = (None, frozenset())
+        self.pool = ConnectionPool(self.db_path, connection_hook=self._prepare, **pool_kwargs)
+
+    def _prepare(self, conn: sqlite3.Connection) -> None:
+        """Register scope_client() on a newly opened connection"""
+        scope = _Scope()
+        conn.create_function("scope_client", 0, lambda: scope.client_id)
+        self._scopes[conn] = scope
+        if self._hook is not None:
+            self._hook(conn)
+
+    @staticmethod
+    def _create_views(conn: sqlite3.Connection, scope: _Scope) -> None:
+        """(Re)create the scoped views to match the current main schema"""
+        tables = {row[0] for row in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")}
+        # Only the TEMP schema is written; main stays read-only (mode=ro)
+        conn.execute("PRAGMA query_only = OFF")
+        try:
+            for table in PARTITIONED_TABLES:
+                conn.execute(f"DROP VIEW IF EXISTS temp.{table}")
+                if table in tables:
+                    conn.execute(
+                        f"CREATE TEMP VIEW {table} AS "
+                        f"SELECT * FROM main.{table} WHERE client_id = scope_client()"
+                    )
+        finally:
+            conn.execute("PRAGMA query_only = ON")
+        scope.schema_version = conn.execute("PRAGMA main.schema_version").fetchone()[0]
+
+    def _known_clients(self) -> frozenset:
+        """Imported client ids, re-read when the database changes"""
+        version = _file_version(self.db_path)
+        if self._clients[0] == version:
+            return self._clients[1]
+        conn = self.pool.acquire()
+        try:
+            has_table = conn.execute(
+                "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (CLIENTS_TABLE,)
+            ).fetchone()
+            ids = frozenset(
+                row[0] for row in conn.execute(f"SELECT client_id FROM main.{CLIENTS_TABLE}")
+            ) if has_table else frozenset()
+        finally:
+            self.pool.release(conn)
+        self._clients = (version, ids)
+        return ids
+
+    def _check_client(self, client_id: int) -> None:
+        if client_id not in self._known_clients():
+            raise ValueError(f"No data for client_id {client_id}")
+
+    def client_ids(self) -> List[int]:
+        return sorted(self._known_clients())
+
+    @contextmanager
+    def connection(self, client_id: int) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection whose views show only client_id's rows"""
+        self._check_client(client_id)
+        conn = self.pool.acquire()
+        scope = self._scopes[conn]
+        try:
+            # An import since the views were built may have added tables or columns
+            if conn.execute("PRAGMA main.schema_version").fetchone()[0] != scope.schema_version:
+                self._create_views(conn, scope)
+            scope.client_id = client_id
+            yield conn
+        finally:
+            scope.client_id = None
+            self.pool.release(conn)
+
+    def write_connection(self, client_id: int):
+        raise NotImplementedError(
+            "Build steps (units, rollups, migrations) run on the per-client files; "
+            "re-run python -m tools.consolidate afterwards"
+        )
+
+    def verify(self) -> None:
+        """
+        Raise unless every imported client has its DERIVED_TABLES rows.
+
+        A client imported before its build steps ran would otherwise be
+        served from the live fallbacks without any sign of it.
+        """
+        if not os.path.exists(self.db_path):
+            raise RuntimeError(f"{self.db_path} does not exist; build it with python -m tools.consolidate")
+        conn = self.pool.acquire()
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")}
+            if CLIENTS_TABLE not in tables:
+                raise RuntimeError(f"{self.db_path} has no imported clients; run python -m tools.consolidate")
+            problems = []
+            for table in DERIVED_TABLES:
+                if table not in tables:
+                    problems.append(f"{table} is missing")
+                    continue
+                missing = [row[0] for row in conn.execute(f"""
+                    SELECT k.client_id FROM main.{CLIENTS_TABLE} k
+                    WHERE k.sessions > 0
+                      AND NOT EXISTS (SELECT 1 FROM main.{table} t WHERE t.client_id = k.client_id)
+                    ORDER BY k.client_id
+                """)]
+                if missing:
+                    problems.append(f"{table} has no rows for clients {missing}")
+        finally:
+            self.pool.release(conn)
+        if problems:
+            raise RuntimeError(
+                f"{self.db_path} was imported before the build steps ran ({'; '.join(problems)}); "
+                "run tools.units, tools.session_rollup, tools.session_pyramid and "
+                "tools.volume_aggregates on the client files, then python -m tools.consolidate"
+            )
+
+    def data_version(self, client_id: Optional[int] = None) -> str:
+        # One file: any client's write invalidates every client's caches
+        if client_id is not None:
+            self._check_client(client_id)
+        return _file_version(self.db_path)
+
+    def sidecar_path(self, client_id: int, suffix: str) -> str:
+        self._check_client(client_id)
+        return f"{os.path.splitext(self.db_path)[0]}.client_{client_id}{suffix}"
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Counters of the shared pool"""
+        return {"consolidated": self.pool.stats()}
+
+    def close(self) -> None:
+        self.pool.close()
+        self._scopes.clear()
+
+
+def make_backend(kind: str = STORAGE_BACKEND) -> StorageBackend:
+    """Build a storage backend by name ("files" or "consolidated")"""
+    if kind == "files":
+        return FilePerClientBackend()
+    if kind == "consolidated":
+        backend = ConsolidatedBackend()
+        backend.verify()
+        return backend
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> StorageBackend:
+    """Get the process-wide storage backend"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = make_backend()
+    return _backend
+
+
+def set_backend(backend: Optional[StorageBackend]) -> Optional[StorageBackend]:
+    """Swap the process-wide storage backend, returning the previous one"""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
+
+
+@contextmanager
+def file_backend() -> Iterator[FilePerClientBackend]:
+    """
+    Point the process at the per-client files for the duration, whatever
+    STORAGE_BACKEND says. The build steps' main()s run under it: they write
+    the files, which tools.consolidate then imports.
+    """
+    backend = FilePerClientBackend()
+    previous = set_backend(backend)
+    try:
+        yield backend
+    finally:
+        set_backend(previous)
+        backend.close()
+
+
+def get_connection(client_id: int):
+    """Shortcut for get_backend().connection(client_id)"""
+    return get_backend().connection(client_id)
+
+
+def write_connection(client_id: int):
+    """
+    Short-lived read-write connection for build steps (rollups, migrations).
+
+    Commits on success and rolls back on error.
+    """
+    return get_backend().write_connection(client_id)
+
+
+def sidecar_path(client_id: int, suffix: str) -> str:
+    """Shortcut for get_backend().sidecar_path(client_id, suffix)"""
+    return get_backend().sidecar_path(client_id, suffix)
+
+
+def client_ids() -> List[int]:
+    """Every client in the current backend"""
+    return get_backend().client_ids()
+
+
+def data_version(client_id: Optional[int] = None) -> str:
+    """
+    Cheap stamp that changes whenever a client's data is written, or any
+    client's data when client_id is None.
+
+    Built from the size and mtime of the database file and its WAL (writes
+    in WAL mode only reach the main file at checkpoint), so it costs two
+    stat() calls and no query. Used to key caches that must invalidate when
+    new sessions land.
+    """
+    return get_backend().data_version(client_id)
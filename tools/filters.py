@@ -0,0 +1,42 @@
+# AI Server - tools/filters.py
+
+"""
+    Argument helpers shared by the per-client tools (tools.cardio_tools) and
+    the cohort tools (tools.cohort_tools): mapping the cardio type the model
+    asks for onto the stored value, and the start of a trailing window.
+"""
+
+from datetime import date, timedelta
+from typing import Optional
+
+# Lowercase names the model tends to use -> values stored in cardio_type
+CARDIO_TYPE_ALIASES = {
+    'run': 'Run',
+    'running': 'Run',
+    'ride': 'Ride',
+    'cycling': 'Ride',
+    'biking': 'Ride',
+    'bike': 'Ride',
+    'walk': 'Walk',
+    'walking': 'Walk',
+    'hike': 'Hike',
+    'hiking': 'Hike',
+    'swim': 'Swim',
+    'swimming': 'Swim',
+    'row': 'Row',
+    'rowing': 'Row',
+}
+
+
+def window_start(weeks: Optional[int] = None, days: Optional[int] = None) -> str:
+    """ISO date for the start of a trailing window"""
+    span = timedelta(weeks=weeks or 0, days=days or 0)
+    return (date.today() - span).isoformat()
+
+
+def stored_cardio_type(cardio_type: Optional[str]) -> Optional[str]:
+    """Map a model-supplied cardio type onto the stored value"""
+    if not cardio_type:
+        return None
+    cardio_type = cardio_type.strip()
+    return CARDIO_TYPE_ALIASES.get(cardio_type.lower(), cardio_type)
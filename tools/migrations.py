@@ -0,0 +1,202 @@
+# AI Server - tools/migrations.py
+
+"""
+    Index migration for the per-client cardio databases.
+
+    The shipped databases have no indexes, so every windowed session query
+    and every per-session bucket lookup is a full table scan. migrate()
+    creates covering indexes matched to the tool queries, runs ANALYZE and
+    reports each tool's query plan before and after. Safe to re-run: every
+    index is created IF NOT EXISTS.
+
+    The tools query one client's file at a time and never filter on the
+    client_id column, so no index leads with client_id here.
+
+    Usage:
+        python -m tools.migrations            # all clients in DB_MAP
+        python -m tools.migrations 1 3        # specific clients
+"""
+
+import inspect
+import sqlite3
+import sys
+from typing import Any, Dict, List
+
+from tools import cardio_tools
+from tools.db import DB_MAP, FilePerClientBackend, file_backend, set_backend, write_connection
+
+# ==========================================
+# INDEXES
+# ==========================================
+INDEXES = {
+    # get_cardio_session_details, compare_cardio_sessions, rollup/bucket joins
+    "idx_cardio_id": "CREATE INDEX IF NOT EXISTS idx_cardio_id ON cardio (id, updated_at)",
+
+    # Recent sessions, history and date windows without a type filter
+    "idx_cardio_date": (
+        "CREATE INDEX IF NOT EXISTS idx_cardio_date "
+        "ON cardio (cardio_date, cardio_start_time)"
+    ),
+
+    # Weekly/monthly volume, trends and type breakdowns: covers the
+    # aggregated columns so grouping never touches the table
+    "idx_cardio_date_type_volume": (
+        "CREATE INDEX IF NOT EXISTS idx_cardio_date_type_volume "
+        "ON cardio (cardio_date, cardio_type, distance, duration, elevation_gain, calories_burned)"
+    ),
+    "idx_cardio_type_date_volume": (
+        "CREATE INDEX IF NOT EXISTS idx_cardio_type_date_volume "
+        "ON cardio (cardio_type, cardio_date, distance, duration, elevation_gain, calories_burned)"
+    ),
+
+    # Per-session bucket lookups, already in bucket order
+    "idx_buckets_cardio_start": (
+        "CREATE INDEX IF NOT EXISTS idx_buckets_cardio_start "
+        "ON aggregated_cardio_session_data (cardio_id, bucket_start)"
+    ),
+}
+
+# ==========================================
+# TOOL SQL CAPTURE
+# ==========================================
+
+def _sample_args(conn: sqlite3.Connection, client_id: int) -> Dict[str, Any]:
+    """Argument values for running every tool against one database"""
+    ids = [row[0] for row in conn.execute("SELECT id FROM cardio ORDER BY cardio_date DESC LIMIT 2")]
+    latest = conn.execute("SELECT MAX(cardio_date), MAX(cardio_type) FROM cardio").fetchone()
+    cardio_id_1 = ids[0] if ids else 0
+    cardio_id_2 = ids[-1] if ids else 0
+    return {
+        'client_id': client_id,
+        'cardio_id': cardio_id_1,
+        'cardio_id_1': cardio_id_1,
+        'cardio_id_2': cardio_id_2,
+        'date': latest[0] or '1970-01-01',
+        'cardio_type': latest[1] or 'Run',
+        'cardio_type_1': latest[1] or 'Run',
+        'cardio_type_2': 'Ride',
+    }
+
+
+def _tool_functions() -> Dict[str, Any]:
+    """Public tool functions defined in tools.cardio_tools"""
+    return {
+        name: func
+        for name, func in inspect.getmembers(cardio_tools, inspect.isfunction)
+        if func.__module__ == cardio_tools.__name__ and not name.startswith('_')
+    }
+
+
+def capture_tool_sql(client_id: int) -> Dict[str, List[str]]:
+    """
+    Run every tool once against a client's database and record the SQL it
+    issues (with bound values inlined), keyed by tool name.
+    """
+    statements: List[str] = []
+    backend = FilePerClientBackend(
+        db_map={client_id: DB_MAP[client_id]},
+        connection_hook=lambda conn: conn.set_trace_callback(statements.append),
+    )
+    previous = set_backend(backend)
+    try:
+        with backend.connection(client_id) as conn:
+            sample = _sample_args(conn, client_id)
+        statements.clear()
+
+        captured = {}
+        for name, func in _tool_functions().items():
+            params = inspect.signature(func).parameters
+            kwargs = {p: sample[p] for p in params if p in sample}
+            statements.clear()
+            try:
+                func(**kwargs)
+            except Exception as e:
+                print(f"[migrations] {name} failed during capture: {e}")
+            captured[name] = _dedupe([
+                sql for sql in statements
+                if sql.lstrip().upper().startswith(('SELECT', 'WITH')) and 'sqlite_master' not in sql
+            ])
+        return captured
+    finally:
+        set_backend(previous)
+        backend.close()
+
+
+def _dedupe(statements: List[str]) -> List[str]:
+    """Drop repeated statements, keeping first-seen order"""
+    seen, unique = set(), []
+    for sql in statements:
+        key = ' '.join(sql.split())
+        if key not in seen:
+            seen.add(key)
+            unique.append(sql)
+    return unique
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """EXPLAIN QUERY PLAN detail lines for one statement"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def _plans(client_id: int, tool_sql: Dict[str, List[str]]) -> Dict[str, List[List[str]]]:
+    """Query plans for every captured statement, keyed by tool name"""
+    with write_connection(client_id) as conn:
+        return {tool: [explain(conn, sql) for sql in sqls] for tool, sqls in tool_sql.items()}
+
+
+# ==========================================
+# MIGRATION
+# ==========================================
+
+def migrate(client_id: int) -> Dict[str, Any]:
+    """
+    Create the indexes and ANALYZE one client's database.
+
+    Returns:
+        Report with the indexes created and per-tool plans before and after
+    """
+    tool_sql = capture_tool_sql(client_id)
+    before = _plans(client_id, tool_sql)
+
+    with write_connection(client_id) as conn:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        for ddl in INDEXES.values():
+            conn.execute(ddl)
+        conn.execute("ANALYZE")
+
+    after = _plans(client_id, tool_sql)
+    return {
+        'client_id': client_id,
+        'created': [name for name in INDEXES if name not in existing],
+        'tools': {
+            tool: [
+                {'sql': ' '.join(sql.split()), 'before': before[tool][i], 'after': after[tool][i]}
+                for i, sql in enumerate(sqls)
+            ]
+            for tool, sqls in tool_sql.items()
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the plan changes from a migrate() report"""
+    print(f"\n[migrations] client {report['client_id']}: created {report['created'] or 'nothing (up to date)'}")
+    for tool, statements in report['tools'].items():
+        print(f"  {tool}")
+        for stmt in statements:
+            changed = stmt['before'] != stmt['after']
+            print(f"    {'*' if changed else ' '} {stmt['sql'][:100]}")
+            print(f"        before: {'; '.join(stmt['before'])}")
+            if changed:
+                print(f"        after:  {'; '.join(stmt['after'])}")
+
+
+def main(argv: List[str]) -> None:
+    client_ids = [int(arg) for arg in argv] or list(DB_MAP)
+    with file_backend():
+        for client_id in client_ids:
+            print_report(migrate(client_id))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
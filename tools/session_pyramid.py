@@ -0,0 +1,296 @@
+# AI Server - tools/session_pyramid.py
+
+"""
+    Multi-resolution pyramid of aggregated_cardio_session_data.
+
+    Most questions do not need a session at 10-second resolution: altitude
+    bands are answered by minute averages, split questions by one row per
+    km or mile. The pyramid stage downsamples each session once into four
+    levels and stores every level as one row of cardio_session_pyramid:
+
+        10s    - one interval per stored bucket
+        1min   - buckets grouped by elapsed minute
+        1km    - splits at every kilometre
+        1mile  - splits at every mile
+
+    Each level is a BLOB of packed little-endian float32 columns (FIELDS,
+    field-major), so a tool reads one row per session instead of every
+    bucket. Tools name the resolution they need and choose_level() picks the
+    coarsest level that still answers it. Rows are rebuilt only for new
+    sessions or sessions whose cardio.updated_at or bucket count changed
+    since they were built; load_levels() computes stale or missing sessions
+    live from their buckets.
+
+    Usage:
+        python -m tools.session_pyramid            # all clients in DB_MAP
+        python -m tools.session_pyramid 1 3        # specific clients
+"""
+
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from tools.db import DB_MAP, file_backend, write_connection
+from tools.session_rollup import BUCKET_SECONDS, session_profile, split_times
+from tools.session_stream import BUCKET_COUNT_SQL, Series, load_series
+from tools.units import unit_sql
+
+PYRAMID_TABLE = "cardio_session_pyramid"
+
+PYRAMID_DDL = f"""
+CREATE TABLE IF NOT EXISTS {PYRAMID_TABLE} (
+    cardio_id INTEGER NOT NULL,
+    level TEXT NOT NULL,
+    source_updated_at TIMESTAMP,
+    bucket_count INTEGER,
+    intervals INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    built_at TIMESTAMP,
+    PRIMARY KEY (cardio_id, level)
+)
+"""
+
+# Per-interval columns stored for every level
+FIELDS = (
+    'start_s',       # Elapsed seconds at the start of the interval
+    'duration_s',    # Seconds covered
+    'distance_m',    # Meters covered
+    'heart_rate',    # Mean of the nonzero bucket heart rates (NaN if none)
+    'altitude_m',    # Mean bucket altitude (NaN if none)
+    'speed',         # Mean bucket avg_speed, in the stored unit (NaN if none)
+    'buckets',       # 10-second buckets in the interval
+)
+
+# level -> interval width; time levels group by elapsed seconds, split levels by distance
+LEVELS = {
+    '10s': {'seconds': BUCKET_SECONDS},
+    '1min': {'seconds': 60},
+    '1km': {'meters': 1000.0},
+    '1mile': {'meters': 1609.344},
+}
+
+Columns = Dict[str, np.ndarray]
+
+
+def choose_level(seconds: Optional[float] = None, meters: Optional[float] = None) -> str:
+    """
+    Coarsest level that answers a question at the given resolution.
+
+    Args:
+        seconds: Widest time interval the caller can work with
+        meters: Split length the caller needs (a level is only used when
+            its splits match exactly)
+
+    Returns:
+        A key of LEVELS ('10s' when nothing coarser fits)
+    """
+    if meters is not None:
+        for level, width in LEVELS.items():
+            if width.get('meters') == meters:
+                return level
+    best, best_width = '10s', BUCKET_SECONDS
+    if seconds is not None:
+        for level, width in LEVELS.items():
+            if best_width < width.get('seconds', 0) <= seconds:
+                best, best_width = level, width['seconds']
+    return best
+
+
+# ==========================================
+# DOWNSAMPLING
+# ==========================================
+
+def _empty() -> Columns:
+    return {field: np.zeros(0, dtype=np.float32) for field in FIELDS}
+
+
+def _group(keys: np.ndarray, count: int, per_bucket: Dict[str, np.ndarray]) -> Columns:
+    """Sum durations and distances and average the bucket readings per group"""
+    columns = {'buckets': np.bincount(keys, minlength=count).astype(np.float64)}
+    for field in ('duration_s', 'distance_m'):
+        columns[field] = np.bincount(keys, weights=per_bucket[field], minlength=count)
+    for field in ('heart_rate', 'altitude_m', 'speed'):
+        values = per_bucket[field]
+        present = ~np.isnan(values)
+        totals = np.bincount(keys[present], weights=values[present], minlength=count)
+        counts = np.bincount(keys[present], minlength=count)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns[field] = np.where(counts > 0, totals / counts, np.nan)
+    return columns
+
+
+def build_levels(series: Series, total_distance: Optional[float]) -> Dict[str, Columns]:
+    """Every level of one session's pyramid, as float32 columns"""
+    if not len(series['bucket_start_ms']):
+        return {level: _empty() for level in LEVELS}
+
+    t, d = session_profile(series, total_distance)
+    heart_rate = series['heart_rate'].astype(np.float64)
+    heart_rate[heart_rate == 0] = np.nan
+    per_bucket = {
+        'duration_s': np.diff(t),
+        'distance_m': np.diff(d),
+        'heart_rate': heart_rate,
+        'altitude_m': series['altitude'].astype(np.float64),
+        'speed': series['speed'].astype(np.float64),
+    }
+
+    levels = {}
+    for level, width in LEVELS.items():
+        if 'seconds' in width:
+            keys = (t[:-1] // width['seconds']).astype(np.int64)
+            columns = _group(keys, int(keys[-1]) + 1, per_bucket)
+            columns['start_s'] = np.arange(len(columns['buckets']), dtype=np.float64) * width['seconds']
+            # Drop the minutes a paused session has no buckets for
+            keep = columns['buckets'] > 0
+            columns = {field: values[keep] for field, values in columns.items()}
+        else:
+            splits = split_times(t, d, width['meters'])
+            if not splits:
+                levels[level] = _empty()
+                continue
+            # Bucket readings go to the split they start in; split time and
+            # distance come from the interpolated boundaries
+            keys = np.minimum(d[:-1] // width['meters'], len(splits) - 1).astype(np.int64)
+            columns = _group(keys, len(splits), per_bucket)
+            # Unrounded, so paces derived from the stored level match split_times()
+            ends = np.minimum(np.arange(1, len(splits) + 1) * width['meters'], d[-1])
+            columns['distance_m'] = np.diff(ends, prepend=0.0)
+            columns['duration_s'] = np.diff(np.interp(ends, d, t), prepend=t[0])
+            columns['start_s'] = np.concatenate(([0.0], np.cumsum(columns['duration_s'])[:-1]))
+        levels[level] = {field: columns[field].astype(np.float32) for field in FIELDS}
+    return levels
+
+
+def pack(columns: Columns) -> bytes:
+    """Field-major little-endian float32 BLOB"""
+    return np.stack([columns[field] for field in FIELDS]).astype('<f4').tobytes()
+
+
+def unpack(data: bytes, intervals: int) -> Columns:
+    """Columns of a stored level (views over the BLOB, not copies)"""
+    values = np.frombuffer(data, dtype='<f4').reshape(len(FIELDS), intervals)
+    return dict(zip(FIELDS, values))
+
+
+# ==========================================
+# PYRAMID TABLE
+# ==========================================
+
+def has_pyramid_table(conn: sqlite3.Connection) -> bool:
+    """
+    Whether the pyramid table has been built in this database, with the
+    bucket_count column (tables built before it are rebuilt on the next
+    refresh and ignored until then)
+    """
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({PYRAMID_TABLE})")}
+    return 'bucket_count' in columns
+
+
+def load_levels(
+    conn: sqlite3.Connection,
+    client_id: int,
+    sessions: Iterable[Dict[str, Any]],
+    level: str,
+) -> Dict[int, Columns]:
+    """
+    One pyramid level for each session, keyed by cardio_id.
+
+    Args:
+        sessions: Dicts with cardio_id and distance (the session's recorded
+            distance, used when a level has to be computed live)
+        level: A key of LEVELS, usually from choose_level()
+
+    Sessions without a fresh stored row (never built, or updated_at or the
+    bucket count changed) are downsampled from their bucket series.
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown pyramid level {level!r}; expected one of {list(LEVELS)}")
+    sessions = list(sessions)
+    cardio_ids = [s['cardio_id'] for s in sessions]
+
+    levels: Dict[int, Columns] = {}
+    if cardio_ids and has_pyramid_table(conn):
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(cardio_ids), 500):
+            chunk = cardio_ids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for row in conn.execute(f"""
+                SELECT p.cardio_id, p.intervals, p.data
+                FROM {PYRAMID_TABLE} p
+                JOIN cardio c ON c.id = p.cardio_id
+                WHERE p.level = ?
+                  AND p.cardio_id IN ({placeholders})
+                  AND p.source_updated_at IS c.updated_at
+                  AND p.bucket_count = {BUCKET_COUNT_SQL}
+            """, [level] + chunk):
+                levels[row['cardio_id']] = unpack(row['data'], row['intervals'])
+
+    missing = [s for s in sessions if s['cardio_id'] not in levels]
+    series = load_series(conn, client_id, [s['cardio_id'] for s in missing])
+    for session in missing:
+        levels[session['cardio_id']] = build_levels(series[session['cardio_id']], session['distance'])[level]
+    return levels
+
+
+def refresh_pyramid(client_id: int) -> Dict[str, int]:
+    """
+    Build pyramid rows for sessions that are new or changed since the last run.
+
+    Returns:
+        Counts of sessions built, stale rows removed and bytes stored
+    """
+    with write_connection(client_id) as conn:
+        conn.execute(PYRAMID_DDL)
+        if not has_pyramid_table(conn):
+            # Built before bucket_count; NULL counts make every row stale
+            conn.execute(f"ALTER TABLE {PYRAMID_TABLE} ADD COLUMN bucket_count INTEGER")
+
+        pending = conn.execute(f"""
+            SELECT c.id AS cardio_id, c.{unit_sql(conn)['distance']} AS distance, c.updated_at, {BUCKET_COUNT_SQL} AS bucket_count
+            FROM cardio c
+            LEFT JOIN {PYRAMID_TABLE} p ON p.cardio_id = c.id AND p.level = '10s'
+            WHERE p.cardio_id IS NULL
+               OR p.source_updated_at IS NOT c.updated_at
+               OR p.bucket_count IS NOT {BUCKET_COUNT_SQL}
+        """).fetchall()
+
+        built_at = datetime.now(timezone.utc).isoformat()
+        for i in range(0, len(pending), 500):
+            batch = pending[i:i + 500]
+            series = load_series(conn, client_id, [session['cardio_id'] for session in batch])
+            for session in batch:
+                levels = build_levels(series[session['cardio_id']], session['distance'])
+                conn.executemany(f"""
+                    INSERT OR REPLACE INTO {PYRAMID_TABLE} (
+                        cardio_id, level, source_updated_at, bucket_count, intervals, data, built_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (session['cardio_id'], level, session['updated_at'], session['bucket_count'],
+                     len(columns['buckets']), pack(columns), built_at)
+                    for level, columns in levels.items()
+                ])
+
+        removed = conn.execute(f"""
+            DELETE FROM {PYRAMID_TABLE}
+            WHERE cardio_id NOT IN (SELECT id FROM cardio WHERE id IS NOT NULL)
+        """).rowcount
+        stored = conn.execute(f"SELECT COALESCE(SUM(LENGTH(data)), 0) FROM {PYRAMID_TABLE}").fetchone()[0]
+
+    return {'built': len(pending), 'removed': removed, 'bytes': stored}
+
+
+def main(argv: List[str]) -> None:
+    client_ids = [int(arg) for arg in argv] or list(DB_MAP)
+    with file_backend():
+        for client_id in client_ids:
+            counts = refresh_pyramid(client_id)
+            print(f"[session_pyramid] client {client_id}: built {counts['built']}, "
+                  f"removed {counts['removed']}, {counts['bytes'] / 1024:.0f} KiB stored")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,309 @@
+# AI Server - tools/session_rollup.py
+
+"""
+    Per-session rollup of aggregated_cardio_session_data.
+
+    The split and pacing tools need first/second-half pace, per-km split
+    times, pace variability and HR drift for each session. Deriving those
+    means walking every 10-second bucket of the session (read from the
+    mapped session stream when one is exported, see tools.session_stream),
+    so the rollup stage computes them once per session and stores one row
+    per cardio_id in cardio_session_rollup. Rows are rebuilt only for new sessions or sessions
+    whose cardio.updated_at or bucket count changed since the row was built
+    (ingest can write a session's buckets after its cardio row).
+
+    Usage:
+        python -m tools.session_rollup            # all clients in DB_MAP
+        python -m tools.session_rollup 1 3        # specific clients
+"""
+
+import bisect
+import json
+import math
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tools.db import DB_MAP, file_backend, write_connection
+from tools.session_stream import BUCKET_COUNT_SQL, Series, elapsed_seconds, load_series
+from tools.units import unit_sql
+
+BUCKET_SECONDS = 10          # aggregated_cardio_session_data bucket width
+SPLIT_METERS = 1000          # Split length for split/pacing tools
+MIN_PARTIAL_SPLIT = 100      # Shortest trailing partial split worth reporting (m)
+
+ROLLUP_TABLE = "cardio_session_rollup"
+
+ROLLUP_DDL = f"""
+CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+    cardio_id INTEGER PRIMARY KEY,
+    source_updated_at TIMESTAMP,
+    bucket_count INTEGER NOT NULL,
+    first_half_pace REAL,
+    second_half_pace REAL,
+    split_times TEXT,
+    pace_cv REAL,
+    hr_drift_pct REAL,
+    built_at TIMESTAMP
+)
+"""
+
+# ==========================================
+# SPLIT MATH
+# ==========================================
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters (scalars or NumPy arrays)"""
+    r = 6371000.0
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    dp, dl = p2 - p1, np.radians(lon2 - lon1)
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * r * np.arcsin(np.sqrt(a))
+
+
+def session_profile(series: Series, total_distance: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Elapsed seconds and cumulative meters at each bucket.
+
+    Bucket positions are sparse, so the GPS track is scaled to the session's
+    recorded distance; without positions, distance is spread evenly over time.
+    """
+    if not len(series['bucket_start_ms']):
+        return np.zeros(0), np.zeros(0)
+
+    # The last bucket still covers its own 10 seconds
+    elapsed = elapsed_seconds(series)
+    times = np.append(elapsed, elapsed[-1] + BUCKET_SECONDS)
+
+    lat, lon = series['latitude'], series['longitude']
+    has_gps = not (np.isnan(lat).any() or np.isnan(lon).any())
+    if has_gps:
+        cumulative = np.concatenate(([0.0], np.cumsum(haversine(lat[:-1], lon[:-1], lat[1:], lon[1:]))))
+        # Carry the last bucket forward at the session's average rate
+        rate = cumulative[-1] / times[-2] * BUCKET_SECONDS if times[-2] else 0.0
+        cumulative = np.append(cumulative, cumulative[-1] + rate)
+
+    if not has_gps or cumulative[-1] <= 0:
+        cumulative = times.copy()
+
+    if total_distance and cumulative[-1] > 0:
+        cumulative = cumulative * (total_distance / cumulative[-1])
+
+    return times, cumulative
+
+
+def time_at_distance(times: Sequence[float], cumulative: Sequence[float], meters: float) -> float:
+    """Linearly interpolate elapsed time at a distance along the session"""
+    i = bisect.bisect_left(cumulative, meters)
+    if i <= 0:
+        return float(times[0])
+    if i >= len(cumulative):
+        return float(times[-1])
+    d0, d1 = float(cumulative[i - 1]), float(cumulative[i])
+    t0, t1 = float(times[i - 1]), float(times[i])
+    if d1 == d0:
+        return t1
+    return t0 + (t1 - t0) * (meters - d0) / (d1 - d0)
+
+
+def split_times(
+    times: Sequence[float],
+    cumulative: Sequence[float],
+    split_m: float = SPLIT_METERS,
+) -> List[Dict[str, Any]]:
+    """Per-split distance, time and pace (sec/km)"""
+    if not len(cumulative) or cumulative[-1] <= 0:
+        return []
+
+    total = float(cumulative[-1])
+    splits = []
+    prev_d, prev_t = 0.0, float(times[0])
+    boundary = float(split_m)
+    while prev_d < total:
+        d = min(boundary, total)
+        if d < boundary and d - prev_d < MIN_PARTIAL_SPLIT:
+            break
+        t = time_at_distance(times, cumulative, d)
+        seconds = t - prev_t
+        splits.append({
+            'split': len(splits) + 1,
+            'distance_m': round(d - prev_d, 1),
+            'time_s': round(seconds, 1),
+            'pace_sec_per_km': round(seconds * 1000.0 / (d - prev_d), 1),
+        })
+        prev_d, prev_t = d, t
+        boundary += split_m
+    return splits
+
+
+def half_paces(times: Sequence[float], cumulative: Sequence[float]) -> Tuple[Optional[float], Optional[float]]:
+    """First-half and second-half pace (sec/km), split by distance"""
+    if not len(cumulative) or cumulative[-1] <= 0:
+        return None, None
+    half = float(cumulative[-1]) / 2
+    t_half = time_at_distance(times, cumulative, half)
+    km = half / 1000.0
+    return (t_half - float(times[0])) / km, (float(times[-1]) - t_half) / km
+
+
+def hr_drift(series: Series, times: np.ndarray) -> Optional[float]:
+    """Percent change in average heart rate from the first to the second half"""
+    heart_rate = series['heart_rate']
+    if not len(heart_rate):
+        return None
+    recorded = heart_rate > 0     # False for NaN too
+    in_first = times[:-1] < times[-1] / 2
+    first, second = heart_rate[recorded & in_first], heart_rate[recorded & ~in_first]
+    if not len(first) or not len(second):
+        return None
+    return float((second.astype(np.float64).mean() / first.astype(np.float64).mean() - 1) * 100)
+
+
+def coefficient_of_variation(values: List[float]) -> Optional[float]:
+    """Standard deviation / mean"""
+    if len(values) < 2:
+        return None
+    mean = sum(values) / len(values)
+    if mean == 0:
+        return None
+    variance = sum((v - mean) ** 2 for v in values) / len(values)
+    return math.sqrt(variance) / mean
+
+
+def compute_session_stats(series: Series, total_distance: Optional[float]) -> Dict[str, Any]:
+    """Derived split and pacing stats for one session's bucket series"""
+    times, cumulative = session_profile(series, total_distance)
+    splits = split_times(times, cumulative)
+    first_half, second_half = half_paces(times, cumulative)
+    full_splits = [s['pace_sec_per_km'] for s in splits if s['distance_m'] >= SPLIT_METERS - 1]
+    return {
+        'bucket_count': len(series['bucket_start_ms']),
+        'splits': splits,
+        'first_half_pace': first_half,
+        'second_half_pace': second_half,
+        'pace_cv': coefficient_of_variation(full_splits),
+        'hr_drift_pct': hr_drift(series, times),
+    }
+
+
+def _encode_splits(splits: List[Dict[str, Any]]) -> str:
+    """Store splits as compact [distance_m, time_s] pairs"""
+    return json.dumps([[s['distance_m'], s['time_s']] for s in splits], separators=(',', ':'))
+
+
+def _decode_splits(encoded: Optional[str]) -> List[Dict[str, Any]]:
+    """Rebuild split dicts from stored [distance_m, time_s] pairs"""
+    splits = []
+    for i, (distance_m, time_s) in enumerate(json.loads(encoded or '[]'), start=1):
+        splits.append({
+            'split': i,
+            'distance_m': distance_m,
+            'time_s': time_s,
+            'pace_sec_per_km': round(time_s * 1000.0 / distance_m, 1) if distance_m else None,
+        })
+    return splits
+
+
+# ==========================================
+# ROLLUP TABLE
+# ==========================================
+
+def has_rollup_table(conn: sqlite3.Connection) -> bool:
+    """Whether the rollup table has been built in this database"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (ROLLUP_TABLE,)
+    ).fetchone() is not None
+
+
+def load_rollups(conn: sqlite3.Connection, cardio_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Fresh rollup rows for the given sessions, keyed by cardio_id.
+
+    Rows built from an older version of the session (updated_at or bucket
+    count changed) are left out so callers fall back to computing them live.
+    """
+    cardio_ids = list(cardio_ids)
+    if not cardio_ids or not has_rollup_table(conn):
+        return {}
+
+    rollups = {}
+    # Stay under SQLite's bound-parameter limit
+    for i in range(0, len(cardio_ids), 500):
+        chunk = cardio_ids[i:i + 500]
+        placeholders = ','.join('?' * len(chunk))
+        for row in conn.execute(f"""
+            SELECT r.*
+            FROM {ROLLUP_TABLE} r
+            JOIN cardio c ON c.id = r.cardio_id
+            WHERE r.cardio_id IN ({placeholders})
+              AND r.source_updated_at IS c.updated_at
+              AND r.bucket_count = {BUCKET_COUNT_SQL}
+        """, chunk):
+            rollups[row['cardio_id']] = {
+                'bucket_count': row['bucket_count'],
+                'splits': _decode_splits(row['split_times']),
+                'first_half_pace': row['first_half_pace'],
+                'second_half_pace': row['second_half_pace'],
+                'pace_cv': row['pace_cv'],
+                'hr_drift_pct': row['hr_drift_pct'],
+            }
+    return rollups
+
+
+def refresh_rollups(client_id: int) -> Dict[str, int]:
+    """
+    Build rollup rows for sessions that are new or changed since the last run.
+
+    Returns:
+        Counts of sessions built and stale rows removed
+    """
+    with write_connection(client_id) as conn:
+        conn.execute(ROLLUP_DDL)
+
+        pending = conn.execute(f"""
+            SELECT c.id AS cardio_id, c.{unit_sql(conn)['distance']} AS distance, c.updated_at
+            FROM cardio c
+            LEFT JOIN {ROLLUP_TABLE} r ON r.cardio_id = c.id
+            WHERE r.cardio_id IS NULL
+               OR r.source_updated_at IS NOT c.updated_at
+               OR r.bucket_count != {BUCKET_COUNT_SQL}
+        """).fetchall()
+
+        built_at = datetime.now(timezone.utc).isoformat()
+        for i in range(0, len(pending), 500):
+            batch = pending[i:i + 500]
+            series = load_series(conn, client_id, [session['cardio_id'] for session in batch])
+            for session in batch:
+                stats = compute_session_stats(series[session['cardio_id']], session['distance'])
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO {ROLLUP_TABLE} (
+                        cardio_id, source_updated_at, bucket_count, first_half_pace,
+                        second_half_pace, split_times, pace_cv, hr_drift_pct, built_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    session['cardio_id'], session['updated_at'], stats['bucket_count'],
+                    stats['first_half_pace'], stats['second_half_pace'],
+                    _encode_splits(stats['splits']), stats['pace_cv'], stats['hr_drift_pct'], built_at,
+                ))
+
+        removed = conn.execute(f"""
+            DELETE FROM {ROLLUP_TABLE}
+            WHERE cardio_id NOT IN (SELECT id FROM cardio WHERE id IS NOT NULL)
+        """).rowcount
+
+    return {'built': len(pending), 'removed': removed}
+
+
+def main(argv: List[str]) -> None:
+    client_ids = [int(arg) for arg in argv] or list(DB_MAP)
+    with file_backend():
+        for client_id in client_ids:
+            counts = refresh_rollups(client_id)
+            print(f"[session_rollup] client {client_id}: built {counts['built']}, removed {counts['removed']}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
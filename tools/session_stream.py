@@ -0,0 +1,288 @@
+# AI Server - tools/session_stream.py
+
+"""
+    Columnar, memory-mapped copy of aggregated_cardio_session_data.
+
+    Reading a session's buckets from SQLite builds a row object per bucket
+    and parses every bucket_start string before any math can start. The
+    exporter writes each client's buckets once into a .stream file next to
+    its database; readers memory-map it and get a session's series as NumPy
+    views of the mapped pages, with no per-bucket allocation.
+
+    File layout (little-endian):
+
+        header   magic, version, field count, session count, bucket count
+        index    one (cardio_id, first bucket, bucket count, stamp) record
+                 per session, sorted by cardio_id
+        columns  one contiguous array per STREAM_FIELDS entry, holding every
+                 bucket of every session in index order
+
+    The stamp is a hash of the session's cardio.updated_at at export time;
+    load_series() only serves sessions whose stamp and bucket count still
+    match (ingest can write buckets after the cardio row, leaving updated_at
+    alone) and reads the rest (and everything, when no stream was exported)
+    from SQLite.
+
+    Usage:
+        python -m tools.session_stream            # all clients in the backend
+        python -m tools.session_stream 1 3        # specific clients
+"""
+
+import hashlib
+import os
+import sqlite3
+import struct
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from tools.db import client_ids, get_connection, sidecar_path
+
+STREAM_SUFFIX = ".stream"
+STREAM_MAGIC = b"CARDSTRM"
+STREAM_VERSION = 1
+
+# Series fields and their on-disk dtypes; 8-byte columns come first so every
+# column starts 8-byte aligned. NULL readings are stored as NaN.
+STREAM_FIELDS = (
+    ('bucket_start_ms', '<i8'),   # Bucket start, Unix epoch milliseconds
+    ('latitude', '<f8'),
+    ('longitude', '<f8'),
+    ('heart_rate', '<f4'),
+    ('pace', '<f4'),
+    ('speed', '<f4'),
+    ('altitude', '<f4'),
+)
+
+# Bucket columns read from SQLite for each series field
+SOURCE_COLUMNS = {
+    'bucket_start_ms': 'bucket_start',
+    'latitude': 'avg_latitude',
+    'longitude': 'avg_longitude',
+    'heart_rate': 'avg_heart_rate',
+    'pace': 'avg_pace',
+    'speed': 'avg_speed',
+    'altitude': 'avg_altitude',
+}
+
+HEADER = struct.Struct('<8sIIqq')
+INDEX_DTYPE = np.dtype([('cardio_id', '<i8'), ('start', '<i8'), ('count', '<i8'), ('stamp', '<i8')])
+
+Series = Dict[str, np.ndarray]
+
+# Buckets currently stored for session c.id (an index-only count on
+# idx_buckets_cardio_start); part of every freshness check, since buckets that
+# land after the cardio row leave updated_at unchanged
+BUCKET_COUNT_SQL = "(SELECT COUNT(*) FROM aggregated_cardio_session_data b WHERE b.cardio_id = c.id)"
+
+
+def _stamp(updated_at: Any) -> int:
+    """Signed 64-bit hash of a session's updated_at (0 when NULL)"""
+    if updated_at is None:
+        return 0
+    digest = hashlib.blake2b(str(updated_at).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+def _epoch_ms(bucket_start: str) -> int:
+    started = datetime.fromisoformat(bucket_start)
+    if started.tzinfo is None:
+        started = started.replace(tzinfo=timezone.utc)
+    return round(started.timestamp() * 1000)
+
+
+def elapsed_seconds(series: Series) -> np.ndarray:
+    """Seconds from the session's first bucket to each bucket"""
+    starts = series['bucket_start_ms']
+    return (starts - starts[0]) / 1000.0 if len(starts) else np.zeros(0)
+
+
+def rows_to_series(rows: List[Any]) -> Series:
+    """Series arrays from bucket rows (as selected by load_bucket_rows)"""
+    series = {}
+    for field, dtype in STREAM_FIELDS:
+        column = SOURCE_COLUMNS[field]
+        if field == 'bucket_start_ms':
+            series[field] = np.array([_epoch_ms(row[column]) for row in rows], dtype=dtype)
+        else:
+            series[field] = np.array(
+                [row[column] if row[column] is not None else np.nan for row in rows], dtype=dtype
+            )
+    return series
+
+
+def load_bucket_rows(conn: sqlite3.Connection, cardio_ids: Optional[List[int]] = None) -> List[Any]:
+    """Bucket rows of the given sessions (or all), ordered by session and time"""
+    columns = ', '.join(['cardio_id'] + list(SOURCE_COLUMNS.values()))
+    if cardio_ids is None:
+        return conn.execute(f"""
+            SELECT {columns}
+            FROM aggregated_cardio_session_data
+            ORDER BY cardio_id, bucket_start
+        """).fetchall()
+    rows = []
+    for i in range(0, len(cardio_ids), 500):
+        chunk = cardio_ids[i:i + 500]
+        rows.extend(conn.execute(f"""
+            SELECT {columns}
+            FROM aggregated_cardio_session_data
+            WHERE cardio_id IN ({','.join('?' * len(chunk))})
+            ORDER BY cardio_id, bucket_start
+        """, chunk).fetchall())
+    return rows
+
+
+def _group_rows(rows: List[Any]) -> Dict[int, List[Any]]:
+    grouped: Dict[int, List[Any]] = {}
+    for row in rows:
+        grouped.setdefault(row['cardio_id'], []).append(row)
+    return grouped
+
+
+# ==========================================
+# READER
+# ==========================================
+
+class SessionStream:
+    """Read-only, memory-mapped view of one exported stream file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, version, field_count, sessions, buckets = HEADER.unpack(self._map[:HEADER.size].tobytes())
+        if magic != STREAM_MAGIC or version != STREAM_VERSION or field_count != len(STREAM_FIELDS):
+            raise ValueError(f"{path} is not a version {STREAM_VERSION} session stream")
+
+        offset = HEADER.size
+        self.index = self._map[offset:offset + sessions * INDEX_DTYPE.itemsize].view(INDEX_DTYPE)
+        offset += sessions * INDEX_DTYPE.itemsize
+        self.columns: Dict[str, np.ndarray] = {}
+        for field, dtype in STREAM_FIELDS:
+            size = buckets * np.dtype(dtype).itemsize
+            self.columns[field] = self._map[offset:offset + size].view(dtype)
+            offset += size
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get(self, cardio_id: int, stamp: Optional[int] = None, buckets: Optional[int] = None) -> Optional[Series]:
+        """
+        A session's series as views into the mapped file.
+
+        Returns None when the session was not exported, or when stamp or
+        buckets (its current bucket count) is given and differs from the export.
+        """
+        i = int(np.searchsorted(self.index['cardio_id'], cardio_id))
+        if i >= len(self.index) or self.index['cardio_id'][i] != cardio_id:
+            return None
+        entry = self.index[i]
+        if stamp is not None and entry['stamp'] != stamp:
+            return None
+        if buckets is not None and entry['count'] != buckets:
+            return None
+        start, end = int(entry['start']), int(entry['start'] + entry['count'])
+        return {field: values[start:end] for field, values in self.columns.items()}
+
+
+_streams: Dict[str, Tuple[Tuple[int, int], SessionStream]] = {}
+_streams_lock = threading.Lock()
+
+
+def open_stream(client_id: int) -> Optional[SessionStream]:
+    """The client's exported stream (cached; re-mapped after a new export), or None"""
+    path = sidecar_path(client_id, STREAM_SUFFIX)
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    version = (info.st_mtime_ns, info.st_size)
+    with _streams_lock:
+        cached = _streams.get(path)
+        if cached is None or cached[0] != version:
+            cached = (version, SessionStream(path))
+            _streams[path] = cached
+        return cached[1]
+
+
+def load_series(conn: sqlite3.Connection, client_id: int, cardio_ids: Iterable[int]) -> Dict[int, Series]:
+    """
+    Bucket series for each session, keyed by cardio_id.
+
+    Sessions exported to the client's stream and unchanged since are mapped
+    views; the rest are read from SQLite in one query.
+    """
+    cardio_ids = list(cardio_ids)
+    series: Dict[int, Series] = {}
+    stream = open_stream(client_id) if cardio_ids else None
+    if stream is not None:
+        for i in range(0, len(cardio_ids), 500):
+            chunk = cardio_ids[i:i + 500]
+            for row in conn.execute(f"""
+                SELECT c.id, c.updated_at, {BUCKET_COUNT_SQL} AS bucket_count
+                FROM cardio c
+                WHERE c.id IN ({','.join('?' * len(chunk))})
+            """, chunk):
+                mapped = stream.get(row['id'], _stamp(row['updated_at']), row['bucket_count'])
+                if mapped is not None:
+                    series[row['id']] = mapped
+
+    missing = [cardio_id for cardio_id in cardio_ids if cardio_id not in series]
+    if missing:
+        grouped = _group_rows(load_bucket_rows(conn, missing))
+        for cardio_id in missing:
+            series[cardio_id] = rows_to_series(grouped.get(cardio_id, []))
+    return series
+
+
+# ==========================================
+# EXPORTER
+# ==========================================
+
+def export_stream(client_id: int, path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Write every session's buckets to the client's stream file.
+
+    The file is written to a temporary name and renamed into place, so
+    readers holding the previous mapping keep a consistent view.
+
+    Returns:
+        Sessions and buckets written, file size and path
+    """
+    path = path or sidecar_path(client_id, STREAM_SUFFIX)
+    with get_connection(client_id) as conn:
+        sessions = conn.execute("SELECT id, updated_at FROM cardio WHERE id IS NOT NULL ORDER BY id").fetchall()
+        grouped = _group_rows(load_bucket_rows(conn))
+
+    index = np.zeros(len(sessions), dtype=INDEX_DTYPE)
+    parts: List[Series] = []
+    start = 0
+    for i, session in enumerate(sessions):
+        series = rows_to_series(grouped.get(session['id'], []))
+        count = len(series['bucket_start_ms'])
+        index[i] = (session['id'], start, count, _stamp(session['updated_at']))
+        parts.append(series)
+        start += count
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(STREAM_MAGIC, STREAM_VERSION, len(STREAM_FIELDS), len(sessions), start))
+        f.write(index.tobytes())
+        for field, dtype in STREAM_FIELDS:
+            for series in parts:
+                f.write(series[field].astype(dtype, copy=False).tobytes())
+    os.replace(tmp_path, path)
+    return {'sessions': len(sessions), 'buckets': start, 'bytes': os.path.getsize(path), 'path': path}
+
+
+def main(argv: List[str]) -> None:
+    for client_id in [int(arg) for arg in argv] or client_ids():
+        result = export_stream(client_id)
+        print(f"[session_stream] client {client_id}: {result['sessions']} sessions, "
+              f"{result['buckets']} buckets, {result['bytes'] / 1024:.0f} KiB -> {result['path']}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
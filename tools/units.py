@@ -0,0 +1,325 @@
+# AI Server - tools/units.py
+
+"""
+    Unit normalization for the per-client cardio databases.
+
+    Clients record the same quantities in different units: avg_pace is
+    min/mile for clients 1 and 2 but sec/km for client 3 (see
+    notebooks/client_analysis.ipynb). normalize() records each database's
+    conventions in unit_conventions, adds canonical columns to cardio and
+    fills them:
+
+        distance_m, duration_s           - meters, seconds
+        pace_sec_per_km, speed_mps       - elapsed pace / speed from distance and duration
+        avg_pace_sec_per_km, avg_speed_mps - the recorded avg_pace / avg_speed, converted
+
+    Units are detected from the data, so a newly discovered client needs no
+    code change. Where detection can't tell (distance and duration, or a
+    column with no usable values) a unit can be declared; declarations are
+    stored in the client's unit_conventions table and take precedence over
+    detection on every later run.
+
+    Triggers keep the canonical columns current on every INSERT and on
+    UPDATEs of the raw columns, so rows are normalized once at ingest and
+    the tools aggregate the stored columns directly. Rescaling empties the
+    stored aggregates built from distance and duration (volume, rollups,
+    pyramid) so their next refresh rebuilds them in the new units.
+
+    Usage:
+        python -m tools.units                          # all clients in DB_MAP
+        python -m tools.units 1 3                      # specific clients
+        python -m tools.units 3 avg_pace=sec_per_km    # declare a unit, then normalize
+"""
+
+import math
+import sqlite3
+import statistics
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.log import get_logger
+from tools.db import DB_MAP, data_version, file_backend, get_connection, write_connection
+
+log = get_logger("units")
+
+UNIT_TABLE = "unit_conventions"
+
+UNIT_DDL = f"""
+CREATE TABLE IF NOT EXISTS {UNIT_TABLE} (
+    column_name TEXT PRIMARY KEY,
+    unit TEXT NOT NULL,
+    factor REAL NOT NULL,
+    source TEXT NOT NULL,
+    checked_at TIMESTAMP
+)
+"""
+
+# ==========================================
+# UNITS
+# ==========================================
+# Multiplier from each stored unit to the canonical one
+UNIT_FACTORS = {
+    'distance': {'m': 1.0, 'km': 1000.0, 'mile': 1609.344},
+    'duration': {'s': 1.0, 'min': 60.0},
+    'avg_pace': {
+        'sec_per_km': 1.0,
+        'min_per_km': 60.0,
+        'min_per_mile': 60.0 / 1.609344,
+        'sec_per_mile': 1.0 / 1.609344,
+    },
+    'avg_speed': {'m_per_s': 1.0, 'km_per_h': 1.0 / 3.6, 'mph': 0.44704},
+}
+
+# Largest relative error for a detected unit to be accepted
+DETECTION_TOLERANCE = 0.25
+PACE_SENTINEL = 9999
+
+CANONICAL_COLUMNS = [
+    'distance_m', 'duration_s', 'pace_sec_per_km', 'speed_mps', 'avg_pace_sec_per_km', 'avg_speed_mps',
+]
+
+
+def _factor(column: str) -> str:
+    return f"(SELECT factor FROM {UNIT_TABLE} WHERE column_name = '{column}')"
+
+
+# One expression per canonical column, evaluated against the row's raw columns
+NORMALIZE_SET = f"""
+    distance_m = distance * {_factor('distance')},
+    duration_s = duration * {_factor('duration')},
+    pace_sec_per_km = duration * {_factor('duration')} * 1000.0 / NULLIF(distance * {_factor('distance')}, 0),
+    speed_mps = distance * {_factor('distance')} / NULLIF(duration * {_factor('duration')}, 0),
+    avg_pace_sec_per_km = CASE WHEN avg_pace > 0 AND avg_pace < {PACE_SENTINEL}
+                               THEN avg_pace * {_factor('avg_pace')} END,
+    avg_speed_mps = CASE WHEN avg_speed > 0 THEN avg_speed * {_factor('avg_speed')} END
+"""
+
+TRIGGERS = {
+    "trg_cardio_units_insert": f"""
+        CREATE TRIGGER trg_cardio_units_insert AFTER INSERT ON cardio
+        BEGIN
+            UPDATE cardio SET {NORMALIZE_SET} WHERE rowid = NEW.rowid;
+        END
+    """,
+    "trg_cardio_units_update": f"""
+        CREATE TRIGGER trg_cardio_units_update
+        AFTER UPDATE OF distance, duration, avg_pace, avg_speed ON cardio
+        BEGIN
+            UPDATE cardio SET {NORMALIZE_SET} WHERE rowid = NEW.rowid;
+        END
+    """,
+}
+
+# What the tools read for each quantity: the canonical columns once a
+# database is normalized, the raw columns (taken as m and s) before. The
+# recorded avg_pace / avg_speed have no known unit until then.
+CANONICAL_SQL = {
+    'distance': "distance_m",
+    'duration': "duration_s",
+    'pace_sec_per_km': "pace_sec_per_km",
+    'speed_kmh': "speed_mps * 3.6",
+    'avg_pace_sec_per_km': "avg_pace_sec_per_km",
+    'avg_speed_kmh': "avg_speed_mps * 3.6",
+}
+DERIVED_SQL = {
+    'distance': "distance",
+    'duration': "duration",
+    'pace_sec_per_km': "duration * 1000.0 / NULLIF(distance, 0)",
+    'speed_kmh': "distance * 3.6 / NULLIF(duration, 0)",
+    'avg_pace_sec_per_km': "NULL",
+    'avg_speed_kmh': "NULL",
+}
+
+# Stored aggregates built from distance and duration; normalize() empties
+# them when the canonical values change so their next refresh rebuilds them
+# (tools.volume_aggregates, tools.session_rollup, tools.session_pyramid)
+UNIT_DEPENDENT_TABLES = ('cardio_volume', 'cardio_volume_sessions', 'cardio_session_rollup', 'cardio_session_pyramid')
+
+# ==========================================
+# DETECTION
+# ==========================================
+
+def _closest_unit(column: str, ratio: float) -> Tuple[str, float]:
+    """Unit whose factor is nearest the observed stored->canonical ratio (log scale)"""
+    unit, factor = min(UNIT_FACTORS[column].items(), key=lambda item: abs(math.log(ratio / item[1])))
+    return unit, abs(ratio / factor - 1)
+
+
+def detect_units(conn: sqlite3.Connection) -> Dict[str, Optional[str]]:
+    """
+    Infer the avg_pace and avg_speed units by comparing the stored values
+    with pace and speed derived from distance (m) and duration (s).
+
+    Returns:
+        column -> unit, or None when no unit fits within DETECTION_TOLERANCE
+    """
+    rows = conn.execute("""
+        SELECT distance, duration, avg_pace, avg_speed
+        FROM cardio
+        WHERE distance > 0 AND duration > 0
+    """).fetchall()
+
+    ratios = {'avg_pace': [], 'avg_speed': []}
+    for distance, duration, avg_pace, avg_speed in rows:
+        if avg_pace and 0 < avg_pace < PACE_SENTINEL:
+            ratios['avg_pace'].append((duration * 1000.0 / distance) / avg_pace)
+        if avg_speed and avg_speed > 0:
+            ratios['avg_speed'].append((distance / duration) / avg_speed)
+
+    detected = {}
+    for column, values in ratios.items():
+        if not values:
+            detected[column] = None
+            continue
+        unit, error = _closest_unit(column, statistics.median(values))
+        detected[column] = unit if error <= DETECTION_TOLERANCE else None
+    return detected
+
+
+# ==========================================
+# NORMALIZATION
+# ==========================================
+
+def declared_units(conn: sqlite3.Connection) -> Dict[str, str]:
+    """Units declared for this database in unit_conventions"""
+    return {
+        row['column_name']: row['unit']
+        for row in conn.execute(f"SELECT column_name, unit FROM {UNIT_TABLE} WHERE source = 'declared'")
+    }
+
+
+def resolve_conventions(
+    client_id: int,
+    detected: Dict[str, Optional[str]],
+    declared: Dict[str, str],
+) -> Dict[str, Dict[str, Any]]:
+    """Declared units where known, detected ones otherwise"""
+    conventions = {}
+    for column in UNIT_FACTORS:
+        unit, source = declared.get(column), 'declared'
+        if unit is None:
+            unit, source = detected.get(column), 'detected'
+        if unit is None:
+            # Canonical unit; the stored values are at least not rescaled
+            unit, source = next(iter(UNIT_FACTORS[column])), 'default'
+        if detected.get(column) and detected[column] != unit:
+            log.warning("client %d: %s declared as %s but data looks like %s", client_id, column, unit, detected[column])
+        conventions[column] = {'unit': unit, 'factor': UNIT_FACTORS[column][unit], 'source': source}
+    return conventions
+
+
+def _check_declarations(units: Dict[str, str]) -> None:
+    for column, unit in units.items():
+        if unit not in UNIT_FACTORS.get(column, {}):
+            raise ValueError(f"Unknown unit {unit!r} for {column!r}; "
+                             f"expected one of {list(UNIT_FACTORS.get(column, {}))}")
+
+
+def normalize(client_id: int, declare: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Record unit conventions, add the canonical columns and triggers, and
+    fill the canonical columns where needed.
+
+    Every row is rewritten only when the columns are new or a unit changed;
+    otherwise only rows with unfilled canonical columns are.
+
+    Args:
+        declare: Units to declare for this client (column -> unit name from
+            UNIT_FACTORS), kept in unit_conventions and preferred over
+            detection from now on
+
+    Returns:
+        Report with the conventions in force and the rows updated
+    """
+    _check_declarations(declare or {})
+    with write_connection(client_id) as conn:
+        conn.execute(UNIT_DDL)
+        previous = {row['column_name']: row['factor'] for row in conn.execute(f"SELECT * FROM {UNIT_TABLE}")}
+        declared = {**declared_units(conn), **(declare or {})}
+        conventions = resolve_conventions(client_id, detect_units(conn), declared)
+
+        checked_at = datetime.now(timezone.utc).isoformat()
+        for column, convention in conventions.items():
+            conn.execute(
+                f"INSERT OR REPLACE INTO {UNIT_TABLE} (column_name, unit, factor, source, checked_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (column, convention['unit'], convention['factor'], convention['source'], checked_at),
+            )
+
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(cardio)")}
+        added = [column for column in CANONICAL_COLUMNS if column not in existing]
+        for column in added:
+            conn.execute(f"ALTER TABLE cardio ADD COLUMN {column} REAL")
+
+        for name, ddl in TRIGGERS.items():
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(ddl)
+
+        factors_changed = previous != {column: c['factor'] for column, c in conventions.items()}
+        where = "" if added or factors_changed else \
+            "WHERE (distance_m IS NULL AND distance IS NOT NULL) OR (duration_s IS NULL AND duration IS NOT NULL)"
+        updated = conn.execute(f"UPDATE cardio SET {NORMALIZE_SET} {where}").rowcount
+
+        if added or factors_changed:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table in UNIT_DEPENDENT_TABLES:
+                if table in tables:
+                    conn.execute(f"DELETE FROM {table}")
+
+    return {'client_id': client_id, 'conventions': conventions, 'columns_added': added, 'rows_updated': updated}
+
+
+# ==========================================
+# READERS
+# ==========================================
+_column_sql_cache: Dict[int, Tuple[str, Dict[str, str]]] = {}
+
+
+def has_canonical_columns(conn: sqlite3.Connection) -> bool:
+    """Whether normalize() has filled the canonical columns for this client"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(cardio)")}
+    if not all(column in columns for column in CANONICAL_COLUMNS):
+        return False
+    # A consolidated database has the columns once any client is normalized;
+    # the client's own unit_conventions rows say whether this one was
+    return conn.execute(f"SELECT 1 FROM {UNIT_TABLE} LIMIT 1").fetchone() is not None
+
+
+def unit_sql(conn: sqlite3.Connection) -> Dict[str, str]:
+    """CANONICAL_SQL once the database behind conn is normalized, DERIVED_SQL before"""
+    return CANONICAL_SQL if has_canonical_columns(conn) else DERIVED_SQL
+
+
+def column_sql(client_id: int) -> Dict[str, str]:
+    """
+    unit_sql() for a client's database, cached per data version: SQL for
+    distance (m), duration (s), pace_sec_per_km, speed_kmh and the
+    recorded avg_pace_sec_per_km / avg_speed_kmh.
+    """
+    version = data_version(client_id)
+    cached = _column_sql_cache.get(client_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with get_connection(client_id) as conn:
+        sql = unit_sql(conn)
+    _column_sql_cache[client_id] = (version, sql)
+    return sql
+
+
+def main(argv: List[str]) -> None:
+    declarations = dict(arg.split('=', 1) for arg in argv if '=' in arg)
+    client_ids = [int(arg) for arg in argv if '=' not in arg]
+    if declarations and not client_ids:
+        raise SystemExit("Name the client(s) the units are declared for")
+    client_ids = client_ids or list(DB_MAP)
+    with file_backend():
+        for client_id in client_ids:
+            report = normalize(client_id, declarations)
+            units = ', '.join(f"{col}={c['unit']} ({c['source']})" for col, c in report['conventions'].items())
+            print(f"[units] client {client_id}: {units}; added {report['columns_added'] or 'no columns'}, "
+                  f"updated {report['rows_updated']} rows")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,322 @@
+# AI Server - tools/volume_aggregates.py
+
+"""
+    Materialized day, week and month volume per cardio_type.
+
+    The volume tools (weekly mileage, monthly volume, frequency, type
+    distribution) group a client's whole cardio table on every call. The
+    aggregate stage keeps cardio_volume instead: one row per (grain, period,
+    cardio_type) with session count and distance, duration, calorie and
+    elevation totals, so a tool reads a handful of rows.
+
+    Refreshes are incremental. cardio_volume_sessions records the day and
+    type each session was counted under and the updated_at it was counted
+    at; sessions that are new, changed or deleted since the last run mark
+    their old and new periods, and only those periods are re-aggregated.
+
+    Trailing windows start mid-week or mid-month, so volume_totals() answers
+    a window from the whole periods inside it plus the day rows of the
+    partial first period. Until the aggregates match the cardio table (every
+    session counted at its current updated_at, no deleted session still
+    counted) it aggregates cardio directly.
+
+    Usage:
+        python -m tools.volume_aggregates            # all clients in DB_MAP
+        python -m tools.volume_aggregates 1 3        # specific clients
+"""
+
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from tools.db import DB_MAP, data_version, file_backend, get_connection, write_connection
+from tools.units import unit_sql
+
+VOLUME_TABLE = "cardio_volume"
+LEDGER_TABLE = "cardio_volume_sessions"
+
+VOLUME_DDL = f"""
+CREATE TABLE IF NOT EXISTS {VOLUME_TABLE} (
+    grain TEXT NOT NULL,
+    period TEXT NOT NULL,
+    cardio_type TEXT,
+    sessions INTEGER NOT NULL,
+    distance REAL,
+    duration REAL,
+    calories REAL,
+    elevation_gain REAL,
+    PRIMARY KEY (grain, period, cardio_type)
+)
+"""
+
+LEDGER_DDL = f"""
+CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+    cardio_id INTEGER PRIMARY KEY,
+    source_updated_at TIMESTAMP,
+    day TEXT,
+    cardio_type TEXT,
+    built_at TIMESTAMP
+)
+"""
+
+# grain -> SQL expression for the period (ISO date of its first day) of cardio_date
+GRAINS = {
+    'day': "date(cardio_date)",
+    'week': "date(cardio_date, 'weekday 0', '-6 days')",
+    'month': "date(cardio_date, 'start of month')",
+}
+
+TOTALS = ('sessions', 'distance', 'duration', 'calories', 'elevation_gain')
+
+
+def _totals_sql(conn: sqlite3.Connection) -> str:
+    """TOTALS over cardio rows, distance in m and duration in s (see tools.units)"""
+    sql = unit_sql(conn)
+    return f"""
+        COUNT(*) AS sessions,
+        SUM({sql['distance']}) AS distance,
+        SUM({sql['duration']}) AS duration,
+        SUM(calories_burned) AS calories,
+        SUM(elevation_gain) AS elevation_gain
+    """
+
+
+# Sessions not yet counted at their current updated_at, and counted sessions
+# that have since been deleted: what refresh_volume() applies, so the
+# aggregates match cardio exactly when both are empty
+_CHANGED_SQL = f"""
+    FROM cardio c
+    LEFT JOIN {LEDGER_TABLE} l ON l.cardio_id = c.id
+    WHERE c.id IS NOT NULL
+      AND (l.cardio_id IS NULL OR l.source_updated_at IS NOT c.updated_at)
+"""
+_REMOVED_SQL = f"""
+    FROM {LEDGER_TABLE}
+    WHERE cardio_id NOT IN (SELECT id FROM cardio WHERE id IS NOT NULL)
+"""
+
+
+def period_start(day: str, grain: str) -> str:
+    """First day of the period containing an ISO date"""
+    d = date.fromisoformat(day[:10])
+    if grain == 'week':
+        d -= timedelta(days=d.weekday())
+    elif grain == 'month':
+        d = d.replace(day=1)
+    return d.isoformat()
+
+
+def next_period(start: str, grain: str) -> str:
+    """First day of the period after the one starting at start"""
+    d = date.fromisoformat(start)
+    if grain == 'day':
+        d += timedelta(days=1)
+    elif grain == 'week':
+        d += timedelta(weeks=1)
+    else:
+        d = date(d.year + d.month // 12, d.month % 12 + 1, 1)
+    return d.isoformat()
+
+
+# ==========================================
+# READ PATH
+# ==========================================
+
+_fresh_cache: Dict[int, Tuple[str, bool]] = {}
+_fresh_lock = threading.Lock()
+
+
+def has_volume_tables(conn: sqlite3.Connection) -> bool:
+    """Whether the aggregate tables have been built in this database"""
+    return conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?)",
+        (VOLUME_TABLE, LEDGER_TABLE),
+    ).fetchone()[0] == 2
+
+
+def _is_fresh(conn: sqlite3.Connection, client_id: int) -> bool:
+    """
+    Whether the aggregates reflect the current cardio table.
+
+    Checked once per data version: no session may be changed or removed
+    relative to the ledger. Comparing per session (an index-only pass over
+    idx_cardio_id) rather than count and latest updated_at catches a delete
+    paired with an insert of an older session.
+    """
+    version = data_version(client_id)
+    cached = _fresh_cache.get(client_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    fresh = has_volume_tables(conn) and not conn.execute(
+        f"SELECT EXISTS (SELECT 1 {_CHANGED_SQL}) OR EXISTS (SELECT 1 {_REMOVED_SQL})"
+    ).fetchone()[0]
+    with _fresh_lock:
+        _fresh_cache[client_id] = (version, fresh)
+    return fresh
+
+
+def volume_totals(
+    client_id: int,
+    grain: str,
+    since: str,
+    cardio_type: Optional[str] = None,
+    by: str = 'period',
+) -> List[Dict[str, Any]]:
+    """
+    Volume totals of the sessions on or after since, per period or per type.
+
+    Args:
+        grain: 'day', 'week' or 'month'; period is the ISO date of the
+            period's first day (the partial first period keeps its own start)
+        since: ISO date the window starts on (may fall mid-period)
+        cardio_type: Stored cardio_type to restrict to (None for all)
+        by: 'period' or 'cardio_type'
+
+    Returns:
+        Rows with the `by` column and TOTALS, ordered by it
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain {grain!r}; expected one of {list(GRAINS)}")
+    if by not in ('period', 'cardio_type'):
+        raise ValueError(f"Unknown grouping {by!r}; expected 'period' or 'cardio_type'")
+
+    type_clause, type_params = ("AND cardio_type = ?", [cardio_type]) if cardio_type else ("", [])
+    sums = ', '.join(f"SUM({name}) AS {name}" for name in TOTALS)
+    with get_connection(client_id) as conn:
+        if not _is_fresh(conn, client_id):
+            sql = f"""
+                SELECT {by}, {sums}
+                FROM (
+                    SELECT {GRAINS[grain]} AS period, cardio_type, {_totals_sql(conn)}
+                    FROM cardio
+                    WHERE cardio_date >= ? {type_clause}
+                    GROUP BY period, cardio_type
+                )
+                GROUP BY {by}
+                ORDER BY {by}
+            """
+            params = [since] + type_params
+        else:
+            # Whole periods after the partial first one, plus its days inside the window
+            first = period_start(since, grain)
+            boundary = since if first == since else next_period(first, grain)
+            sql = f"""
+                SELECT {by}, {sums}
+                FROM (
+                    SELECT period, cardio_type, {', '.join(TOTALS)}
+                    FROM {VOLUME_TABLE}
+                    WHERE grain = ? AND period >= ? {type_clause}
+                    UNION ALL
+                    SELECT ? AS period, cardio_type, {', '.join(TOTALS)}
+                    FROM {VOLUME_TABLE}
+                    WHERE grain = 'day' AND period >= ? AND period < ? {type_clause}
+                )
+                GROUP BY {by}
+                ORDER BY {by}
+            """
+            params = [grain, boundary] + type_params + [first, since, boundary] + type_params
+        return [dict(row) for row in conn.execute(sql, params)]
+
+
+def active_days(client_id: int, since: str) -> int:
+    """Distinct days with at least one session on or after since"""
+    with get_connection(client_id) as conn:
+        if _is_fresh(conn, client_id):
+            sql = f"SELECT COUNT(DISTINCT period) FROM {VOLUME_TABLE} WHERE grain = 'day' AND period >= ?"
+        else:
+            sql = f"SELECT COUNT(DISTINCT {GRAINS['day']}) FROM cardio WHERE cardio_date >= ?"
+        return conn.execute(sql, (since,)).fetchone()[0]
+
+
+# ==========================================
+# INCREMENTAL REFRESH
+# ==========================================
+
+def _reaggregate(
+    conn: sqlite3.Connection, totals_sql: str, grain: str, period: str, cardio_type: Optional[str]
+) -> None:
+    """Replace one (grain, period, cardio_type) row with a fresh aggregate of cardio"""
+    conn.execute(
+        f"DELETE FROM {VOLUME_TABLE} WHERE grain = ? AND period = ? AND cardio_type IS ?",
+        (grain, period, cardio_type),
+    )
+    # The cardio_date range keeps the scan on the date index; the period
+    # expression drops anything the string range lets through
+    conn.execute(f"""
+        INSERT INTO {VOLUME_TABLE} (grain, period, cardio_type, {', '.join(TOTALS)})
+        SELECT ?, ?, ?, {totals_sql}
+        FROM cardio
+        WHERE cardio_date >= ? AND cardio_date < ?
+          AND {GRAINS[grain]} = ?
+          AND cardio_type IS ?
+        GROUP BY cardio_type
+    """, (grain, period, cardio_type, period, next_period(period, grain), period, cardio_type))
+
+
+def refresh_volume(client_id: int) -> Dict[str, int]:
+    """
+    Re-aggregate the periods touched by sessions added, changed (updated_at)
+    or deleted since the last run.
+
+    Returns:
+        Counts of sessions changed and removed and of rows re-aggregated
+    """
+    with write_connection(client_id) as conn:
+        conn.execute(VOLUME_DDL)
+        conn.execute(LEDGER_DDL)
+
+        changed = conn.execute(f"""
+            SELECT c.id AS cardio_id, c.updated_at, date(c.cardio_date) AS day, c.cardio_type,
+                   l.day AS old_day, l.cardio_type AS old_type, l.cardio_id IS NOT NULL AS counted
+            {_CHANGED_SQL}
+        """).fetchall()
+        removed = conn.execute(f"""
+            SELECT cardio_id, day AS old_day, cardio_type AS old_type
+            {_REMOVED_SQL}
+        """).fetchall()
+
+        touched: Set[Tuple[str, Optional[str]]] = set()
+        for row in changed:
+            if row['day']:
+                touched.add((row['day'], row['cardio_type']))
+            if row['counted'] and row['old_day']:
+                touched.add((row['old_day'], row['old_type']))
+        for row in removed:
+            if row['old_day']:
+                touched.add((row['old_day'], row['old_type']))
+
+        periods = {
+            (grain, period_start(day, grain), cardio_type)
+            for day, cardio_type in touched
+            for grain in GRAINS
+        }
+        totals_sql = _totals_sql(conn)
+        for grain, period, cardio_type in sorted(periods, key=lambda p: (p[0], p[1], p[2] or '')):
+            _reaggregate(conn, totals_sql, grain, period, cardio_type)
+
+        built_at = datetime.now(timezone.utc).isoformat()
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO {LEDGER_TABLE} (cardio_id, source_updated_at, day, cardio_type, built_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(row['cardio_id'], row['updated_at'], row['day'], row['cardio_type'], built_at) for row in changed])
+        conn.executemany(
+            f"DELETE FROM {LEDGER_TABLE} WHERE cardio_id = ?", [(row['cardio_id'],) for row in removed]
+        )
+
+    return {'changed': len(changed), 'removed': len(removed), 'periods': len(periods)}
+
+
+def main(argv: List[str]) -> None:
+    client_ids = [int(arg) for arg in argv] or list(DB_MAP)
+    with file_backend():
+        for client_id in client_ids:
+            counts = refresh_volume(client_id)
+            print(f"[volume_aggregates] client {client_id}: {counts['changed']} sessions changed, "
+                  f"{counts['removed']} removed, {counts['periods']} periods re-aggregated")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])